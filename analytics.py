@@ -0,0 +1,242 @@
+import argparse
+import datetime as dt
+import json
+import os
+import time
+from array import array
+from dataclasses import asdict, dataclass
+from typing import Callable, Iterable
+
+import numpy as np
+
+from daystate import DayRecord
+from plans import WEEKDAY_TITLES, PlanSet, PlanStore
+
+# ===== АНАЛІТИКА ПО ВСІХ КОРИСТУВАЧАХ =====
+# Дні всіх користувачів згортаються в колонки NumPy (один рядок на користувача-день),
+# далі всі показники рахуються векторно за один прохід:
+#  - виконання плану за днями тижня: тренувальний день — відмічена хоч одна вправа,
+#    rest day — хоч один пункт чекліста (серед днів, де є записи);
+#  - закриті дні OK / НЕПОВНИЙ; середні спожито / спалено / нетто;
+#  - білок: частка днів із записаним білком і з білком не нижче цілі;
+#  - відтік: скільки днів минуло від останнього дня з записами.
+# Вікно (days) рахується від today; відтік — за всю історію.
+STATUS_CODES = {None: 0, "OK": 1, "INCOMPLETE": 2}
+CHURN_EDGES = (1, 7, 30)       # 0–1, 2–7, 8–30, 31+ днів без записів
+CHURN_LABELS = ("0–1 дн.", "2–7 дн.", "8–30 дн.", "31+ дн.")
+
+
+@dataclass
+class Rollups:
+    uid: np.ndarray         # int64
+    day: np.ndarray         # int32, ординал дати
+    weekday: np.ndarray     # int8, 0 = понеділок
+    workout: np.ndarray     # bool, за планом користувача це тренувальний день
+    ex_done: np.ndarray     # int16
+    rest_done: np.ndarray   # int16
+    intake: np.ndarray      # int32
+    burned: np.ndarray      # int32
+    protein: np.ndarray     # int32, -1 — не записано
+    status: np.ndarray      # int8, STATUS_CODES
+
+    def __len__(self) -> int:
+        return len(self.uid)
+
+
+class RollupBuilder:
+    # Рядки накопичуються в array.array (без об'єкта на рядок) і один раз віддаються в NumPy
+    def __init__(self, plan_for: Callable[[int], PlanSet]):
+        self.plan_for = plan_for
+        self._cols = {
+            "uid": array("q"), "day": array("i"), "weekday": array("b"), "workout": array("b"),
+            "ex_done": array("h"), "rest_done": array("h"), "intake": array("i"), "burned": array("i"),
+            "protein": array("i"), "status": array("b"),
+        }
+        self._plan_uid: int | None = None
+        self._plan: PlanSet | None = None
+
+    def add(self, uid: int, day: int, r: DayRecord) -> None:
+        if uid != self._plan_uid:
+            self._plan_uid, self._plan = uid, self.plan_for(uid)
+        weekday = dt.date.fromordinal(day).weekday()
+        c = self._cols
+        c["uid"].append(uid)
+        c["day"].append(day)
+        c["weekday"].append(weekday)
+        c["workout"].append(self._plan.days[weekday].is_workout)
+        c["ex_done"].append(r.ex_done)
+        c["rest_done"].append(r.rest_done)
+        c["intake"].append(r.intake_kcal)
+        c["burned"].append(r.burned)
+        c["protein"].append(-1 if r.protein is None else r.protein)
+        c["status"].append(STATUS_CODES.get(r.status, 0))
+
+    def add_rows(self, rows: Iterable[tuple[int, str, str]]) -> None:
+        # Рядки бекенду: (uid, "YYYY-MM-DD", JSON дня)
+        for uid, dstr, data in rows:
+            self.add(uid, dt.date.fromisoformat(dstr).toordinal(), DayRecord.from_dict(json.loads(data)))
+
+    def build(self) -> Rollups:
+        c = self._cols
+        return Rollups(
+            uid=np.frombuffer(c["uid"], dtype=np.int64),
+            day=np.frombuffer(c["day"], dtype=np.int32),
+            weekday=np.frombuffer(c["weekday"], dtype=np.int8),
+            workout=np.frombuffer(c["workout"], dtype=np.int8).astype(bool),
+            ex_done=np.frombuffer(c["ex_done"], dtype=np.int16),
+            rest_done=np.frombuffer(c["rest_done"], dtype=np.int16),
+            intake=np.frombuffer(c["intake"], dtype=np.int32),
+            burned=np.frombuffer(c["burned"], dtype=np.int32),
+            protein=np.frombuffer(c["protein"], dtype=np.int32),
+            status=np.frombuffer(c["status"], dtype=np.int8),
+        )
+
+
+@dataclass
+class CohortStats:
+    days: int
+    users: int                          # усього користувачів з записами
+    active_users: int                   # з записами у вікні
+    user_days: int                      # рядків у вікні
+    weekday: list[dict]                 # [{title, days, workout_share, adherence}]
+    workout_adherence: float
+    rest_adherence: float
+    ok_days: int
+    incomplete_days: int
+    intake_mean: float
+    burned_mean: float
+    net_mean: float
+    protein_logged: float
+    protein_target: int
+    protein_compliance: float
+    churn: list[dict]                   # [{label, users}]
+    seconds: float = 0.0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def render(self) -> str:
+        pct = lambda x: f"{x * 100:.0f}%"
+        closed = self.ok_days + self.incomplete_days
+        lines = [
+            f"🛠 <b>Статистика по всіх (ост. {self.days} днів)</b>",
+            f"Користувачів: <b>{self.active_users}</b> активних із {self.users}, днів з записами: {self.user_days}",
+            "",
+            f"Виконання плану: тренування <b>{pct(self.workout_adherence)}</b>, rest days <b>{pct(self.rest_adherence)}</b>",
+        ]
+        for w in self.weekday:
+            if w["days"]:
+                kind = "💪" if w["workout_share"] >= 0.5 else "🧘"
+                lines.append(f"  {kind} {w['title']}: {pct(w['adherence'])} ({w['days']} дн.)")
+        lines += [
+            "",
+            f"Закриті дні: OK <b>{self.ok_days}</b> / неповні <b>{self.incomplete_days}</b>"
+            + (f" ({pct(self.ok_days / closed)} OK)" if closed else ""),
+            f"Середнє за день: 🍽 {self.intake_mean:.0f} | 🔥 {self.burned_mean:.0f} | ⚖️ {self.net_mean:.0f} ккал",
+            f"Білок: записано в {pct(self.protein_logged)} днів, ≥{self.protein_target} г — {pct(self.protein_compliance)} з них",
+            "",
+            "Останній запис: " + ", ".join(f"{c['label']} — {c['users']}" for c in self.churn),
+            f"<i>Пораховано за {self.seconds * 1000:.0f} мс</i>",
+        ]
+        return "\n".join(lines)
+
+
+def _share(part, whole) -> float:
+    return float(part) / float(whole) if whole else 0.0
+
+
+def last_active(r: Rollups) -> np.ndarray:
+    # Останній день з записами на користувача. Бекенди й гарячий набір віддають рядки
+    # згрупованими за uid — тоді досить знайти межі груп; інакше спершу стабільне сортування
+    uid, day = r.uid, r.day
+    if not len(uid):
+        return np.array([], dtype=np.int32)
+    if not (np.diff(uid) >= 0).all():
+        order = np.argsort(uid, kind="stable")
+        uid, day = uid[order], day[order]
+    starts = np.flatnonzero(np.concatenate(([True], uid[1:] != uid[:-1])))
+    return np.maximum.reduceat(day, starts)
+
+
+def cohort_stats(r: Rollups, today: int, days: int = 30, protein_target: int = 120) -> CohortStats:
+    start = time.perf_counter()
+    w = r.day > today - days
+    weekday, workout = r.weekday[w], r.workout[w]
+    done = np.where(workout, r.ex_done[w] > 0, r.rest_done[w] > 0)
+    per_day = np.bincount(weekday, minlength=7)
+    per_day_done = np.bincount(weekday, weights=done, minlength=7)
+    per_day_workout = np.bincount(weekday, weights=workout, minlength=7)
+
+    status = r.status[w]
+    intake, burned, protein = r.intake[w], r.burned[w], r.protein[w]
+    ate = intake > 0
+    logged = protein > 0
+
+    last = last_active(r)
+    churn = np.bincount(np.searchsorted(CHURN_EDGES, today - last, side="left"), minlength=len(CHURN_LABELS))
+
+    return CohortStats(
+        days=days,
+        users=len(last),
+        active_users=int((last > today - days).sum()),
+        user_days=int(w.sum()),
+        weekday=[
+            {
+                "title": WEEKDAY_TITLES[i],
+                "days": int(per_day[i]),
+                "workout_share": _share(per_day_workout[i], per_day[i]),
+                "adherence": _share(per_day_done[i], per_day[i]),
+            }
+            for i in range(7)
+        ],
+        workout_adherence=_share(done[workout].sum(), workout.sum()),
+        rest_adherence=_share(done[~workout].sum(), (~workout).sum()),
+        ok_days=int((status == 1).sum()),
+        incomplete_days=int((status == 2).sum()),
+        intake_mean=float(intake[ate].mean()) if ate.any() else 0.0,
+        burned_mean=float(burned[burned > 0].mean()) if (burned > 0).any() else 0.0,
+        net_mean=float((intake[ate] - burned[ate]).mean()) if ate.any() else 0.0,
+        protein_logged=_share(logged.sum(), len(protein)),
+        protein_target=protein_target,
+        protein_compliance=_share((protein >= protein_target).sum(), logged.sum()),
+        churn=[{"label": label, "users": int(n)} for label, n in zip(CHURN_LABELS, churn)],
+        seconds=time.perf_counter() - start,
+    )
+
+
+# ===== CLI =====
+#   python analytics.py [--db state.db] [--backend sqlite|journal] [--days 30] [--protein 120] [--json]
+def cli() -> None:
+    from storage import backend_from_env
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Статистика по всіх користувачах")
+    parser.add_argument("--db", default=os.getenv("DB_PATH", "state.db"))
+    parser.add_argument("--backend", default=os.getenv("STATE_BACKEND", "sqlite"), choices=("sqlite", "journal"))
+    parser.add_argument("--plans", default=os.getenv("PLAN_PATH", os.path.join(here, "data.json")))
+    parser.add_argument("--overrides", default=os.getenv("PLAN_OVERRIDES_PATH"))
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--protein", type=int, default=int(os.getenv("PROTEIN_TARGET", "120")))
+    parser.add_argument("--today", help="YYYY-MM-DD, за замовчуванням — сьогодні")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    plans = PlanStore(args.plans, args.overrides)
+    backend = backend_from_env(args.backend, args.db, read_only=True)
+    t = time.perf_counter()
+    builder = RollupBuilder(plans.for_user)
+    builder.add_rows(backend.iter_days())
+    rollups = builder.build()
+    load = time.perf_counter() - t
+    backend.close()
+    today = dt.date.fromisoformat(args.today) if args.today else dt.date.today()
+    stats = cohort_stats(rollups, today.toordinal(), args.days, args.protein)
+    if args.json:
+        print(json.dumps({**stats.to_dict(), "rows": len(rollups), "load_seconds": load}, ensure_ascii=False, indent=2))
+    else:
+        print(f"{len(rollups):,} user-days loaded in {load:.2f}s")
+        print(stats.render().replace("<b>", "").replace("</b>", "").replace("<i>", "").replace("</i>", ""))
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,124 @@
+import json
+import os
+import re
+import zlib
+from bisect import bisect_left
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Iterable
+
+# ===== АВТОДОПОВНЕННЯ СТРАВ =====
+# Індекс за префіксами слів: "греч" знаходить "Гречка з куркою", "кур гре" — теж.
+# Джерела: історія прийомів їжі користувача (частіші — вище) і загальна таблиця foods.json.
+# Індекс користувача будується ліниво з його днів при першому запиті й тримається в LRU;
+# нові страви додаються в нього інкрементально.
+# Страва адресується в callback'ах ключем — crc32 нормалізованої назви: ключ не залежить
+# від порядку в індексі, тож кнопка переживає перебудову або витіснення індексу.
+_WORD = re.compile(r"\w+")
+
+
+def normalize(name: str) -> str:
+    return " ".join(_WORD.findall(name.lower().replace("’", "'")))
+
+
+def food_key(name: str) -> int:
+    return zlib.crc32(normalize(name).encode())
+
+
+@dataclass(slots=True)
+class Food:
+    key: int
+    name: str
+    kcal: int
+    uses: int = 0
+
+
+class FoodIndex:
+    def __init__(self):
+        self.by_key: dict[int, Food] = {}
+        self._tokens: list[tuple[str, int]] | None = None      # відсортовані (слово, ключ)
+        self._words: dict[int, tuple[str, ...]] = {}
+
+    def add(self, name: str, kcal: int, uses: int = 1) -> Food:
+        key = food_key(name)
+        food = self.by_key.get(key)
+        if food is None:
+            food = self.by_key[key] = Food(key, name.strip(), kcal)
+            self._words[key] = tuple(normalize(name).split())
+            self._tokens = None
+        else:
+            food.kcal = kcal                                    # остання відома калорійність
+        food.uses += uses
+        return food
+
+    def get(self, key: int) -> Food | None:
+        return self.by_key.get(key)
+
+    def top(self, limit: int) -> list[Food]:
+        return sorted(self.by_key.values(), key=lambda f: (-f.uses, f.name))[:limit]
+
+    def search(self, query: str, limit: int) -> list[Food]:
+        words = normalize(query).split()
+        if not words:
+            return self.top(limit)
+        if self._tokens is None:
+            self._tokens = sorted((w, key) for key, ws in self._words.items() for w in ws)
+        # Кандидати — за префіксом першого слова; решта слів запиту мають бути префіксами слів назви
+        first, rest = words[0], words[1:]
+        found: set[int] = set()
+        i = bisect_left(self._tokens, (first,))
+        while i < len(self._tokens) and self._tokens[i][0].startswith(first):
+            found.add(self._tokens[i][1])
+            i += 1
+        matches = [
+            self.by_key[key] for key in found
+            if all(any(w.startswith(q) for w in self._words[key]) for q in rest)
+        ]
+        matches.sort(key=lambda f: (-f.uses, len(f.name)))
+        return matches[:limit]
+
+
+def load_foods(path: str) -> FoodIndex:
+    index = FoodIndex()
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for name, kcal in json.load(f):
+                index.add(name, int(kcal), uses=0)
+    return index
+
+
+class MealSuggester:
+    def __init__(self, history: Callable[[int], Iterable[tuple[str, int]]], foods: FoodIndex, capacity: int = 2000):
+        self.history = history          # uid -> (назва, ккал) у хронологічному порядку
+        self.foods = foods
+        self.capacity = capacity
+        self._users: OrderedDict[int, FoodIndex] = OrderedDict()
+
+    def for_user(self, uid: int) -> FoodIndex:
+        index = self._users.get(uid)
+        if index is None:
+            index = FoodIndex()
+            for name, kcal in self.history(uid):
+                index.add(name, kcal)
+            self._users[uid] = index
+            if len(self._users) > self.capacity:
+                self._users.popitem(last=False)
+        else:
+            self._users.move_to_end(uid)
+        return index
+
+    def note(self, uid: int, name: str, kcal: int) -> None:
+        # Індекс лише оновлюємо, якщо він уже є; інакше нова страва потрапить у нього при побудові
+        index = self._users.get(uid)
+        if index is not None:
+            index.add(name, kcal)
+
+    def suggest(self, uid: int, query: str, limit: int = 6) -> list[Food]:
+        own = self.for_user(uid).search(query, limit)
+        if len(own) >= limit or not query.strip() and own:
+            return own
+        seen = {f.key for f in own}
+        return own + [f for f in self.foods.search(query, limit) if f.key not in seen][:limit - len(own)]
+
+    def resolve(self, uid: int, key: int) -> Food | None:
+        return self.for_user(uid).get(key) or self.foods.get(key)
@@ -0,0 +1,65 @@
+# Бенчмарк агрегатів по всіх користувачах (analytics.py).
+#   python benchmarks/analytics.py [--users 100000] [--days 90]
+# Збирає колонки з DayRecord через RollupBuilder (як /admin_stats для memory-бекенду)
+# і окремо міряє векторний прохід cohort_stats для вікон 7/30/90 днів.
+import argparse
+import datetime as dt
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analytics  # noqa: E402
+from daystate import DayRecord  # noqa: E402
+from plans import PlanStore  # noqa: E402
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=90)
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    plans = PlanStore(os.path.join(root, "data.json"))
+    rnd = random.Random(1)
+    today = dt.date(2026, 3, 1).toordinal()
+
+    # Різна активність: частина користувачів давно не заходила
+    records = []
+    for _ in range(200):
+        r = DayRecord()
+        r.ex_mask = rnd.getrandbits(5) if rnd.random() < 0.7 else 0
+        r.rest_mask = rnd.getrandbits(4) if rnd.random() < 0.6 else 0
+        for _ in range(rnd.randint(0, 4)):
+            r.add_meal("Омлет", rnd.randint(100, 700))
+        if rnd.random() < 0.6:
+            r.protein = rnd.randint(40, 200)
+        if rnd.random() < 0.3:
+            r.add_activity("Біг", rnd.randint(100, 600))
+        r.status = rnd.choice((None, None, "OK", "INCOMPLETE"))
+        records.append(r)
+
+    builder = analytics.RollupBuilder(plans.for_user)
+    t = time.perf_counter()
+    for uid in range(1, args.users + 1):
+        last = today - int(rnd.expovariate(1 / 10))
+        for d in range(last - rnd.randint(1, args.days) + 1, last + 1):
+            builder.add(uid, d, records[(uid * 31 + d) % len(records)])
+    rollups = builder.build()
+    build = time.perf_counter() - t
+    print(f"rollups: {len(rollups):,} user-days of {args.users:,} users built in {build:.2f}s "
+          f"({sum(a.nbytes for a in vars(rollups).values()) / 2**20:.0f} MB)")
+
+    for days in (7, 30, 90):
+        t = time.perf_counter()
+        stats = analytics.cohort_stats(rollups, today, days)
+        print(f"cohort_stats {days:>2}d: {(time.perf_counter() - t) * 1000:7.1f} ms — "
+              f"{stats.active_users:,} active, workout {stats.workout_adherence:.0%}, rest {stats.rest_adherence:.0%}, "
+              f"OK {stats.ok_days:,} / INCOMPLETE {stats.incomplete_days:,}")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,117 @@
+# Бенчмарк потокового експорту/імпорту історії (export.py) на великому дампі.
+#   python benchmarks/export_import.py [--rows 2000000] [--users 20000] [--dir /tmp]
+# Генерує синтетичний JSONL, імпортує його в нову SQLite-базу, експортує назад у JSONL і CSV
+# та імпортує CSV у другу базу. Для кожного кроку: час, рядків/с, розмір файлу, RSS —
+# RSS не має рости разом із кількістю рядків.
+import argparse
+import datetime as dt
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import export  # noqa: E402
+from storage import SQLiteBackend  # noqa: E402
+
+MEALS = ["Омлет", "Гречка з куркою", "Протеїн", "Йогурт", "Лосось з овочами", "Сир з бананом"]
+
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def synthetic_lines(rows: int, users: int, seed: int = 1):
+    rnd = random.Random(seed)
+    days_per_user = max(1, rows // users)
+    start = dt.date(2024, 1, 1).toordinal()
+    n = 0
+    for uid in range(1, users + 1):
+        for d in range(days_per_user):
+            if n >= rows:
+                return
+            day = {"ex_mask": rnd.getrandbits(7), "rest_mask": rnd.getrandbits(8)}
+            meals = [(rnd.choice(MEALS), rnd.randint(100, 700)) for _ in range(rnd.randint(0, 4))]
+            if meals:
+                day["meals"] = meals
+            if rnd.random() < 0.6:
+                day["protein"] = rnd.randint(60, 200)
+            if rnd.random() < 0.5:
+                day["status"] = rnd.choice(("OK", "INCOMPLETE"))
+            yield json.dumps({"uid": uid, "date": dt.date.fromordinal(start + d).isoformat(), **day},
+                             ensure_ascii=False) + "\n"
+            n += 1
+
+
+def step(name: str, rows: int, fn) -> None:
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<18}{elapsed:>9.1f}s{rows / elapsed:>12,.0f} rows/s   RSS {rss_mb():.0f} MB")
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--dir", default=tempfile.gettempdir())
+    args = parser.parse_args()
+
+    paths = {k: os.path.join(args.dir, f"bench_export.{k}") for k in ("src.jsonl", "a.db", "out.jsonl", "out.csv", "b.db")}
+    for p in paths.values():
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(p + suffix):
+                os.remove(p + suffix)
+    print(f"rows={args.rows:,} users={args.users:,}   RSS at start {rss_mb():.0f} MB")
+
+    def generate():
+        with open(paths["src.jsonl"], "w", encoding="utf-8") as f:
+            f.writelines(synthetic_lines(args.rows, args.users))
+
+    def import_jsonl():
+        backend = SQLiteBackend(paths["a.db"])
+        with open(paths["src.jsonl"], encoding="utf-8") as f:
+            export.import_rows(backend, export.decode(f, "jsonl"))
+        backend.close()
+
+    def export_to(fmt: str):
+        def run():
+            backend = SQLiteBackend(paths["a.db"])
+            with open(paths[f"out.{fmt}"], "wb") as f:
+                for chunk in export.encode(backend.iter_days(), fmt):
+                    f.write(chunk)
+            backend.close()
+        return run
+
+    def import_csv():
+        backend = SQLiteBackend(paths["b.db"])
+        with open(paths["out.csv"], encoding="utf-8", newline="") as f:
+            export.import_rows(backend, export.decode(f, "csv"))
+        backend.close()
+
+    step("generate jsonl", args.rows, generate)
+    step("import jsonl", args.rows, import_jsonl)
+    step("export jsonl", args.rows, export_to("jsonl"))
+    step("export csv", args.rows, export_to("csv"))
+    step("import csv", args.rows, import_csv)
+
+    for k in ("out.jsonl", "out.csv", "a.db"):
+        print(f"{k:<12}{os.path.getsize(paths[k]) / 2**20:>9.1f} MB")
+    a, b = SQLiteBackend(paths["a.db"]), SQLiteBackend(paths["b.db"])
+    same = all(x == y for x, y in zip(a.iter_days(), b.iter_days()))
+    count = a.conn.execute("SELECT COUNT(*) FROM days").fetchone()[0]
+    print(f"round trip jsonl -> db -> csv -> db: {'identical' if same else 'MISMATCH'} ({count:,} rows)")
+    a.close()
+    b.close()
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,141 @@
+# Локальна заглушка Telegram Bot API для навантажувальних тестів.
+#   python benchmarks/fake_api.py --port 8081 [--latency-ms 20] [--flood-every 500] [--blocked-every 50]
+# Бот спрямовується на неї через BOT_API_URL=http://127.0.0.1:8081
+import argparse
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter
+
+from aiohttp import web
+
+
+class FakeBotAPI:
+    def __init__(self, latency: float = 0.0, flood_every: int = 0, blocked_every: int = 0):
+        self.latency = latency
+        self.flood_every = flood_every          # кожен N-й sendMessage отримує 429 RetryAfter
+        self.blocked_every = blocked_every      # чати з id % N == 0 "заблокували" бота (403)
+        self.calls: Counter[str] = Counter()
+        self.errors: Counter[str] = Counter()
+        self.updates: asyncio.Queue[dict] = asyncio.Queue()
+        self._message_ids = itertools.count(1)
+        self._update_ids = itertools.count(1)
+        self._runner: web.AppRunner | None = None
+
+    # ----- відповіді -----
+    @staticmethod
+    def ok(result) -> web.Response:
+        return web.json_response({"ok": True, "result": result})
+
+    @staticmethod
+    def error(code: int, description: str, **params) -> web.Response:
+        body = {"ok": False, "error_code": code, "description": description}
+        if params:
+            body["parameters"] = params
+        return web.json_response(body, status=code)
+
+    def message(self, chat_id: int, text: str = "", reply_markup=None) -> dict:
+        msg = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": 1, "is_bot": True, "first_name": "Bot"},
+            "text": text,
+        }
+        if reply_markup:
+            msg["reply_markup"] = json.loads(reply_markup) if isinstance(reply_markup, str) else reply_markup
+        return msg
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        if request.content_type == "application/json":
+            data = await request.json()
+        else:
+            data = dict(await request.post())
+        self.calls[method] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if method == "getMe":
+            return self.ok({"id": 1, "is_bot": True, "first_name": "Bot", "username": "fake_bot"})
+        if method == "getUpdates":
+            return await self.get_updates(data)
+        if method == "sendMessage":
+            chat_id = int(data["chat_id"])
+            if self.blocked_every and chat_id % self.blocked_every == 0:
+                self.errors["403"] += 1
+                return self.error(403, "Forbidden: bot was blocked by the user")
+            if self.flood_every and self.calls[method] % self.flood_every == 0:
+                self.errors["429"] += 1
+                return self.error(429, "Too Many Requests: retry after 1", retry_after=1)
+            return self.ok(self.message(chat_id, data.get("text", ""), data.get("reply_markup")))
+        if method in ("editMessageReplyMarkup", "editMessageText"):
+            return self.ok(self.message(int(data.get("chat_id", 0)), "", data.get("reply_markup")))
+        if method == "sendPhoto":
+            msg = self.message(int(data["chat_id"]))
+            msg["photo"] = [{"file_id": f"photo{msg['message_id']}", "file_unique_id": f"u{msg['message_id']}", "width": 1, "height": 1}]
+            return self.ok(msg)
+        if method == "sendDocument":
+            msg = self.message(int(data["chat_id"]))
+            msg["document"] = {"file_id": f"doc{msg['message_id']}", "file_unique_id": f"u{msg['message_id']}"}
+            return self.ok(msg)
+        # answerCallbackQuery, setWebhook, deleteWebhook, answerInlineQuery, ...
+        return self.ok(True)
+
+    async def get_updates(self, data: dict) -> web.Response:
+        timeout = float(data.get("timeout", 0) or 0)
+        batch = []
+        try:
+            batch.append(await asyncio.wait_for(self.updates.get(), timeout=timeout or 0.01))
+        except asyncio.TimeoutError:
+            return self.ok([])
+        while not self.updates.empty() and len(batch) < 100:
+            batch.append(self.updates.get_nowait())
+        return self.ok(batch)
+
+    def push_update(self, update: dict) -> None:
+        # Для режиму polling: апдейт віддається боту через getUpdates
+        update.setdefault("update_id", next(self._update_ids))
+        self.updates.put_nowait(update)
+
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8081) -> None:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        app.router.add_get("/bot{token}/{method}", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+
+
+async def serve(args: argparse.Namespace) -> None:
+    api = FakeBotAPI(args.latency_ms / 1000, args.flood_every, args.blocked_every)
+    await api.start(args.host, args.port)
+    print(f"Fake Bot API on http://{args.host}:{args.port}")
+    try:
+        while True:
+            await asyncio.sleep(10)
+            print(dict(api.calls), dict(api.errors))
+    finally:
+        await api.stop()
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--flood-every", type=int, default=0)
+    parser.add_argument("--blocked-every", type=int, default=0)
+    asyncio.run(serve(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,112 @@
+# Бенчмарк журнального бекенду (journal.py): запис пакетами і відновлення після падіння.
+#   python benchmarks/journal_recovery.py [--users 100000] [--days 7] [--snapshot-mb 8] [--dir /tmp]
+# Наповнює стан users×days, робить знімок, дописує пакети по 50 днів (вечірній пік), поки
+# журнал не підійде до порога наступного знімка — найгірший випадок для replay, — і обриває
+# останній запис посередині, як при kill -9 під час write.
+# Далі: час відкриття бекенду (знімок + replay хвоста), перевірка, що стан збігається
+# з очікуваним до останнього цілого пакета, і час довантаження користувачів.
+import argparse
+import datetime as dt
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from journal import JournalBackend  # noqa: E402
+from storage import Batch  # noqa: E402
+
+MEALS = ["Омлет", "Гречка з куркою", "Протеїн", "Йогурт", "Лосось з овочами"]
+
+
+def day_json(rnd: random.Random) -> str:
+    day = {"ex_mask": rnd.getrandbits(7), "protein": rnd.randint(60, 200)}
+    meals = [(rnd.choice(MEALS), rnd.randint(100, 700)) for _ in range(rnd.randint(0, 4))]
+    if meals:
+        day["meals"] = meals
+    return json.dumps(day, ensure_ascii=False)
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--snapshot-mb", type=int, default=8, help="поріг знімка, як JOURNAL_SNAPSHOT_MB")
+    parser.add_argument("--dir", default=tempfile.gettempdir())
+    args = parser.parse_args()
+
+    directory = os.path.join(args.dir, "bench_journal")
+    shutil.rmtree(directory, ignore_errors=True)
+    rnd = random.Random(1)
+    start_day = dt.date(2026, 1, 1).toordinal()
+    expected: dict[tuple[int, str], str] = {}
+
+    limit = args.snapshot_mb << 20
+    backend = JournalBackend(directory, snapshot_bytes=1 << 62, fsync=False)
+    t = time.perf_counter()
+    for u0 in range(1, args.users + 1, 1000):
+        batch = Batch()
+        for uid in range(u0, min(u0 + 1000, args.users + 1)):
+            for d in range(args.days):
+                row = (uid, dt.date.fromordinal(start_day + d).isoformat(), day_json(rnd))
+                batch.days.append(row)
+                expected[row[:2]] = row[2]
+            batch.subs_add.append(uid)
+        backend.write_batch(batch)
+    backend.snapshot()
+    print(f"fill + snapshot: {args.users:,} users × {args.days} days in {time.perf_counter() - t:.1f}s, "
+          f"snapshot {os.path.getsize(backend._path('snapshot')) / 2**20:.1f} MB")
+
+    t = time.perf_counter()
+    backend.snapshot()
+    print(f"snapshot rewrite: {time.perf_counter() - t:.2f}s")
+
+    # Хвіст журналу з fsync на кожен пакет — як у роботі
+
+    backend.fsync = True
+    backend.snapshot_bytes = limit
+    today = dt.date.fromordinal(start_day + args.days).isoformat()
+    tail = 0
+    t = time.perf_counter()
+    while backend._journal_size < limit - (64 << 10):
+        batch = Batch(days=[(rnd.randint(1, args.users), today, day_json(rnd)) for _ in range(50)])
+        backend.write_batch(batch)
+        for uid, day, data in batch.days:
+            expected[(uid, day)] = data
+        tail += 1
+    elapsed = time.perf_counter() - t
+    print(f"tail: {tail:,} batches (fsync each) in {elapsed:.2f}s — {tail / elapsed:,.0f} commits/s, "
+          f"journal {backend._journal_size / 2**20:.1f} MB")
+    journal_path = backend._path("journal")
+    backend.close()
+
+    # Обірваний запис: заголовок і половина тіла
+    with open(journal_path, "ab") as f:
+        f.write(b"\x40\x00\x00\x00\x12\x34\x56\x78" + b'{"d":[[1,"2026-')
+
+    t = time.perf_counter()
+    recovered = JournalBackend(directory, fsync=False)
+    recovery = time.perf_counter() - t
+    print(f"recovery: {recovery * 1000:.0f} ms (snapshot + {tail:,} records, torn tail dropped)")
+
+    t = time.perf_counter()
+    got = {(uid, day): data for uid, day, data in recovered.iter_days()}
+    ok = got == expected
+    print(f"state check: {'identical' if ok else 'MISMATCH'} ({len(got):,} user-days), "
+          f"iterated in {time.perf_counter() - t:.1f}s")
+
+    sample = rnd.sample(range(1, args.users + 1), min(10_000, args.users))
+    t = time.perf_counter()
+    for uid in sample:
+        recovered.load_user(uid)
+    print(f"hydrate: {(time.perf_counter() - t) / len(sample) * 1e6:.1f} µs/user")
+    recovered.close()
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,45 @@
+# Мікробенчмарк: CPU на один toggle: з кешем клавіатур і без нього.
+#   python benchmarks/keyboards.py [--toggles 20000]
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("BOT_TOKEN", "123456:BENCH")
+os.environ.setdefault("STATE_BACKEND", "memory")
+
+import main  # noqa: E402
+
+
+def run(toggles: int, build) -> float:
+    # Один користувач клацає по вправах понеділка: мутація + побудова + серіалізація markup
+    mask = 0
+    d = main.dt.date(2026, 1, 5)
+    day = d.toordinal()
+    plan = main.plans.plans.workout(d)
+    n = len(plan.exercises)
+    start = time.process_time()
+    for t in range(toggles):
+        mask ^= 1 << (t * 3 % n)
+        kb = build(day, plan, mask)
+        kb.model_dump_json(exclude_none=True)
+    return (time.process_time() - start) / toggles * 1e6
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--toggles", type=int, default=20000)
+    args = parser.parse_args()
+
+    uncached = run(args.toggles, main.build_exercises_keyboard.__wrapped__)
+    main.build_exercises_keyboard.cache_clear()
+    cached = run(args.toggles, main.build_exercises_keyboard)
+    info = main.build_exercises_keyboard.cache_info()
+    print(f"toggles:  {args.toggles}")
+    print(f"uncached: {uncached:8.1f} µs/toggle")
+    print(f"cached:   {cached:8.1f} µs/toggle  ({uncached / cached:.1f}x, hits={info.hits} misses={info.misses})")
+
+
+if __name__ == "__main__":
+    cli()
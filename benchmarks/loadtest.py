@@ -0,0 +1,242 @@
+# Навантажувальний тест: віртуальні користувачі проганяються через справжні хендлери
+# main.py, а всі виклики Bot API йдуть у локальну заглушку (benchmarks/fake_api.py).
+#   python benchmarks/loadtest.py [--users 2000] [--concurrency 200] [--toggles 10] [--json out.json]
+# Фази: /start, шторм toggle, FSM AddMeal (послідовно й одночасними апдейтами), вечірній пінг, day:close, stats, пінг після закриття.
+# Для кожної фази: p50/p95/p99 латентності хендлера, виклики API на дію, апдейтів/с, приріст RSS.
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_api import FakeBotAPI  # noqa: E402
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+class LoadTest:
+    def __init__(self, main, api: FakeBotAPI, users: int, concurrency: int, first_uid: int = 10_000):
+        self.main = main
+        self.api = api
+        self.uids = list(range(first_uid, first_uid + users))
+        self.concurrency = concurrency
+        self.results: list[dict] = []
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1_000_000)
+        self._latencies: list[float] = []
+        self._updates = 0
+
+    # ----- конструктори апдейтів -----
+    def _user(self, uid: int) -> dict:
+        return {"id": uid, "is_bot": False, "first_name": f"u{uid}", "language_code": "uk"}
+
+    def message(self, uid: int, text: str) -> dict:
+        msg = {
+            "message_id": next(self._message_ids), "date": int(time.time()),
+            "chat": {"id": uid, "type": "private"}, "from": self._user(uid), "text": text,
+        }
+        if text.startswith("/"):
+            msg["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return {"update_id": next(self._update_ids), "message": msg}
+
+    def callback(self, uid: int, data: str, message_id: int | None = None, markup=None) -> dict:
+        msg = {
+            "message_id": message_id or next(self._message_ids), "date": int(time.time()),
+            "chat": {"id": uid, "type": "private"}, "from": {"id": 1, "is_bot": True, "first_name": "Bot"},
+            "text": "…",
+        }
+        if markup is not None:
+            msg["reply_markup"] = markup.model_dump(exclude_none=True)
+        return {"update_id": next(self._update_ids), "callback_query": {
+            "id": str(next(self._update_ids)), "from": self._user(uid), "chat_instance": str(uid),
+            "data": data, "message": msg,
+        }}
+
+    async def feed(self, raw: dict) -> None:
+        # Як у polling: повернутий хендлером метод виконується окремим запитом
+        from aiogram.methods import TelegramMethod
+        from aiogram.types import Update
+
+        bot, dp = self.main.bot, self.main.dp
+        update = Update.model_validate(raw, context={"bot": bot})
+        start = time.perf_counter()
+        result = await dp.feed_update(bot, update)
+        if isinstance(result, TelegramMethod):
+            await bot(result)
+        self._latencies.append((time.perf_counter() - start) * 1000)
+        self._updates += 1
+
+    # ----- сценарії на одного користувача -----
+    async def do_start(self, uid: int) -> None:
+        await self.feed(self.message(uid, "/start"))
+
+    async def do_toggles(self, uid: int, toggles: int) -> None:
+        _, kb = self.main.render_workout_today(uid)
+        buttons = [b.callback_data for row in kb.inline_keyboard for b in row if b.callback_data != self.main.cbs.pack("back")]
+        message_id = next(self._message_ids)
+        for t in range(toggles):
+            await self.feed(self.callback(uid, buttons[t * 3 % len(buttons)], message_id, kb))
+
+    async def do_add_meal(self, uid: int) -> None:
+        await self.feed(self.callback(uid, self.main.cbs.pack("nut:add_meal")))
+        await self.feed(self.message(uid, "Омлет з 3 яєць"))
+        await self.feed(self.message(uid, "360"))
+
+    async def do_add_meal_burst(self, uid: int) -> None:
+        # Усі три апдейти діалогу надходять одночасно — порядок тримає черга користувача (ordering.py)
+        await asyncio.gather(
+            self.feed(self.callback(uid, self.main.cbs.pack("nut:add_meal"))),
+            self.feed(self.message(uid, "Гречка з куркою")),
+            self.feed(self.message(uid, "520")),
+        )
+
+    async def do_close(self, uid: int) -> None:
+        await self.feed(self.callback(uid, self.main.cbs.pack("day:close")))
+
+    async def do_stats(self, uid: int) -> None:
+        await self.feed(self.callback(uid, self.main.cbs.pack("stats")))
+
+    # ----- фази -----
+    async def phase(self, name: str, scenario, actions_per_user: int = 1, settle: float = 0.0) -> dict:
+        self._latencies = []
+        self._updates = 0
+        calls_before = self.api.total_calls()
+        rss_before = rss_mb()
+        sem = asyncio.Semaphore(self.concurrency)
+
+        async def run_user(uid: int) -> None:
+            async with sem:
+                await scenario(uid)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(run_user(uid) for uid in self.uids))
+        elapsed = time.perf_counter() - start
+        if settle:
+            # Відкладені дії (напр. об'єднані редагування клавіатури) теж рахуються у виклики API
+            await asyncio.sleep(settle)
+        actions = len(self.uids) * actions_per_user
+        result = {
+            "phase": name,
+            "updates": self._updates,
+            "actions": actions,
+            "seconds": round(elapsed, 3),
+            "updates_per_sec": round(self._updates / elapsed, 1) if elapsed else 0.0,
+            "p50_ms": round(percentile(self._latencies, 50), 3),
+            "p95_ms": round(percentile(self._latencies, 95), 3),
+            "p99_ms": round(percentile(self._latencies, 99), 3),
+            "api_calls_per_action": round((self.api.total_calls() - calls_before) / actions, 2),
+            "rss_growth_mb": round(rss_mb() - rss_before, 1),
+        }
+        self.results.append(result)
+        return result
+
+    async def ping_phase(self, name: str = "nutrition_ping") -> dict:
+        main = self.main
+        calls_before = self.api.total_calls()
+        rss_before = rss_mb()
+        start = time.perf_counter()
+        for tz in list(main.tz_buckets):
+            await main.daily_nutrition_ping(tz)
+        elapsed = time.perf_counter() - start
+        sent = self.api.total_calls() - calls_before
+        result = {
+            "phase": name,
+            "updates": 0,
+            "actions": len(main.subscribers),
+            "seconds": round(elapsed, 3),
+            "updates_per_sec": 0.0,
+            "messages_per_sec": round(sent / elapsed, 1) if elapsed else 0.0,
+            "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0,
+            "api_calls_per_action": round(sent / max(1, len(main.subscribers)), 2),
+            "rss_growth_mb": round(rss_mb() - rss_before, 1),
+        }
+        self.results.append(result)
+        return result
+
+
+def print_table(results: list[dict]) -> None:
+    header = f"{'phase':<16}{'updates':>9}{'upd/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'api/act':>9}{'ΔRSS MB':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['phase']:<16}{r['updates']:>9}{r['updates_per_sec']:>9}{r['p50_ms']:>9}"
+            f"{r['p95_ms']:>9}{r['p99_ms']:>9}{r['api_calls_per_action']:>9}{r['rss_growth_mb']:>9}"
+        )
+
+
+async def run(args: argparse.Namespace) -> None:
+    api = FakeBotAPI(latency=args.api_latency_ms / 1000)
+    await api.start(port=args.port)
+    import main  # після налаштування оточення
+
+    rss_start = rss_mb()
+    await main.on_startup()
+    test = LoadTest(main, api, args.users, args.concurrency)
+    try:
+        await test.phase("start", test.do_start)
+        await test.phase("toggle_storm", lambda uid: test.do_toggles(uid, args.toggles),
+                         actions_per_user=args.toggles, settle=main.edits.delay * 2 + 0.2)
+        await test.phase("add_meal_fsm", test.do_add_meal)
+        await test.phase("add_meal_burst", test.do_add_meal_burst)
+        await test.ping_phase("ping_open")        # день ще відкритий: пінг з переліком пропущеного
+        await test.phase("day_close", test.do_close)
+        await test.phase("stats", test.do_stats)
+        await test.ping_phase("ping_settled")     # усі закрили день — пінг нікому не шлеться
+    finally:
+        await main.on_shutdown()
+        await main.bot.session.close()
+        await api.stop()
+
+    print(f"users={args.users} concurrency={args.concurrency} toggles/user={args.toggles}")
+    print_table(test.results)
+    print(f"RSS: {rss_start:.1f} MB -> {rss_mb():.1f} MB; API calls: {dict(api.calls)}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": test.results, "api_calls": dict(api.calls)}, f, indent=2)
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--toggles", type=int, default=10)
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--api-latency-ms", type=float, default=0.0)
+    parser.add_argument("--json", help="зберегти результати для порівняння між релізами")
+    args = parser.parse_args()
+
+    os.environ["BOT_API_URL"] = f"http://127.0.0.1:{args.port}"
+    os.environ.setdefault("BOT_TOKEN", "123456:LOADTEST")
+    os.environ.setdefault("STATE_BACKEND", "memory")
+    os.environ.setdefault("FSM_STORAGE", "memory")
+    os.environ.setdefault("BROADCAST_RATE", "100000")
+    os.environ.setdefault("BROADCAST_CONCURRENCY", "100")
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    cli()
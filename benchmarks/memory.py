@@ -0,0 +1,106 @@
+# Бенчмарк пам'яті: старий словниковий стан (user_progress / user_rest / user_nutrition
+# з ISO-датами) проти компактного DayRecord з ординалами.
+#   python benchmarks/memory.py [--users 100000] [--days 365] [--sample 1000]
+# Будується вибірка з --sample користувачів, результат екстраполюється на --users
+# (повний прогін: --sample 100000, потребує багато RAM для старого формату).
+import argparse
+import datetime as dt
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from daystate import DayRecord  # noqa: E402
+
+MEALS = ["Омлет", "Гречка з куркою", "Протеїн", "Йогурт", "Лосось з овочами", "Сир з бананом"]
+
+
+def day_profile(rnd: random.Random) -> dict:
+    # Типовий день: кілька прийомів їжі, білок, частина вправ, інколи активність і закриття
+    return {
+        "meals": [(f"{rnd.choice(MEALS)}", rnd.randint(100, 700)) for _ in range(rnd.randint(0, 4))],
+        "protein": rnd.choice((None, rnd.randint(60, 200))),
+        "ex": {i for i in range(7) if rnd.random() < 0.5},
+        "rest": {i for i in range(8) if rnd.random() < 0.3},
+        "acts": [("Біг 5 км", 300)] if rnd.random() < 0.2 else [],
+        "status": rnd.choice((None, "OK", "INCOMPLETE")),
+    }
+
+
+def build_legacy(users: int, days: int, seed: int) -> tuple:
+    rnd = random.Random(seed)
+    start = dt.date(2025, 1, 1)
+    user_progress, user_rest, user_nutrition = {}, {}, {}
+    for uid in range(users):
+        for k in range(days):
+            p = day_profile(rnd)
+            dstr = (start + dt.timedelta(days=k)).isoformat()
+            if p["ex"]:
+                user_progress.setdefault(uid, {})[dstr] = set(p["ex"])
+            if p["rest"]:
+                user_rest.setdefault(uid, {})[dstr] = set(p["rest"])
+            nd = {
+                "meals": [{"name": n, "kcal": c} for n, c in p["meals"]],
+                "activities": [{"name": n, "kcal": c} for n, c in p["acts"]],
+                "kcal_add": 0,
+                "burned_kcal": sum(c for _, c in p["acts"]),
+                "day_status": p["status"],
+                "closed": p["status"] is not None,
+            }
+            if p["protein"] is not None:
+                nd["protein_g"] = p["protein"]
+            user_nutrition.setdefault(uid, {})[dstr] = nd
+    return user_progress, user_rest, user_nutrition
+
+
+def build_compact(users: int, days: int, seed: int) -> dict:
+    rnd = random.Random(seed)
+    start = dt.date(2025, 1, 1).toordinal()
+    user_days = {}
+    for uid in range(users):
+        records = user_days[uid] = {}
+        for k in range(days):
+            p = day_profile(rnd)
+            r = records[start + k] = DayRecord()
+            for i in p["ex"]:
+                r.toggle_ex(i)
+            for i in p["rest"]:
+                r.toggle_rest(i)
+            for n, c in p["meals"]:
+                r.add_meal(n, c)
+            for n, c in p["acts"]:
+                r.add_activity(n, c)
+            r.protein = p["protein"]
+            r.status = p["status"]
+    return user_days
+
+
+def measure(build, users: int, days: int) -> int:
+    tracemalloc.start()
+    state = build(users, days, seed=42)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del state
+    return size
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--sample", type=int, default=1000)
+    args = parser.parse_args()
+
+    sample = min(args.sample, args.users)
+    user_days = sample * args.days
+    scale = args.users / sample
+    print(f"sample: {sample} users x {args.days} days = {user_days} user-days (x{scale:g} -> {args.users} users)")
+    for name, build in (("legacy dicts", build_legacy), ("DayRecord", build_compact)):
+        size = measure(build, sample, args.days)
+        print(f"{name:>12}: {size / user_days:7.1f} B/user-day, projected {size * scale / 2**30:6.2f} GiB")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,64 @@
+# Бенчмарк купи нагадувань (reminders.py): старт і пік, коли в одну хвилину настає
+# нагадування в усіх користувачів.
+#   python benchmarks/reminders.py [--users 100000]
+# Користувачі в кількох поясах, половина — з увімкненим тренуванням. Міряється побудова купи
+# зі збережених налаштувань, розбір усього, що настало о 08:30 за Києвом (пакетами, як у run()),
+# і розмір купи після перепланування.
+import argparse
+import datetime as dt
+import json
+import os
+import sys
+import time
+from zoneinfo import ZoneInfo
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import reminders as rem  # noqa: E402
+from plans import PlanStore  # noqa: E402
+
+ZONES = [ZoneInfo(z) for z in ("Europe/Kyiv", "Europe/Kyiv", "Europe/Warsaw", "Europe/London")]
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100_000)
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    plans = PlanStore(os.path.join(root, "data.json"))
+    kyiv = ZONES[0]
+    clock = [dt.datetime(2026, 1, 5, 6, 0, tzinfo=kyiv).timestamp()]      # понеділок
+    engine = rem.ReminderEngine(
+        plan_for=lambda uid, d: plans.for_user(uid).for_date(d),
+        tz_for=lambda uid: ZONES[uid % len(ZONES)],
+        send=None, persist=lambda uid, data: None, clock=lambda: clock[0],
+    )
+    stored = {
+        uid: json.dumps({"on": rem.MEALS | (rem.WORKOUT if uid % 2 else 0)})
+        for uid in range(1, args.users + 1)
+    }
+
+    t = time.perf_counter()
+    engine.load(stored)
+    print(f"load: {args.users:,} users, heap {len(engine):,} in {time.perf_counter() - t:.2f}s")
+
+    clock[0] = dt.datetime(2026, 1, 5, 8, 30, tzinfo=kyiv).timestamp()
+    t = time.perf_counter()
+    due, calls, worst = 0, 0, 0.0
+    while True:
+        c = time.perf_counter()
+        groups = engine.pop_due(clock[0])
+        worst = max(worst, time.perf_counter() - c)
+        if not groups:
+            break
+        calls += 1
+        due += sum(map(len, groups.values()))
+    elapsed = time.perf_counter() - t
+    print(f"08:30 Kyiv: {due:,} reminders due, popped + rescheduled in {elapsed:.2f}s "
+          f"({elapsed / max(due, 1) * 1e6:.1f} µs each), {calls} batches, longest loop stall {worst * 1000:.0f} ms")
+    print(f"heap after: {len(engine):,} entries")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,69 @@
+# Мікробенчмарк кешу текстів дня (rendercache.py): екран харчування й підсумок закриття
+# для користувачів з довгими списками страв.
+#   python benchmarks/render_cache.py [--users 2000] [--meals 60] [--views 20]
+# Кожен користувач відкриває екран харчування views разів поспіль (повторні перегляди без змін),
+# потім додає страву й відкриває знову. Порівняння: без кешу / з кешем, мкс на перегляд.
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("BOT_TOKEN", "123456:BENCH")
+os.environ.setdefault("STATE_BACKEND", "memory")
+
+import main  # noqa: E402
+
+MEALS = ["Омлет", "Гречка з куркою", "Протеїн", "Йогурт", "Лосось з овочами", "Банан", "Горіхи"]
+
+
+def fill(users: int, meals: int) -> list[int]:
+    rnd = random.Random(1)
+    uids = list(range(50_000, 50_000 + users))
+    for uid in uids:
+        day = main.today_day(uid)
+        nd = main.ensure_day(uid, day)
+        for _ in range(rnd.randint(meals // 2, meals)):
+            nd.add_meal(rnd.choice(MEALS), rnd.randint(50, 700))
+        for _ in range(rnd.randint(0, 5)):
+            nd.add_activity("Біг", rnd.randint(100, 500))
+        nd.protein = rnd.randint(60, 200)
+        main.touch_day(uid, day)
+    return uids
+
+
+def run(uids: list[int], views: int, render) -> float:
+    start = time.process_time()
+    for uid in uids:
+        for _ in range(views):
+            render(uid)
+        main.add_meal_today(uid, "Яблуко", 80)
+        render(uid)
+    return (time.process_time() - start) / (len(uids) * (views + 1)) * 1e6
+
+
+def uncached(uid: int) -> str:
+    d = main.user_today(uid)
+    return main.format_nutrition(d, main.get_day(uid, d.toordinal()))
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--meals", type=int, default=60)
+    parser.add_argument("--views", type=int, default=20)
+    args = parser.parse_args()
+
+    uids = fill(args.users, args.meals)
+    base = run(uids, args.views, uncached)
+    cached = run(uids, args.views, main.render_nutrition_today)
+    hits, misses = main.day_texts.hits, main.day_texts.misses
+    print(f"users: {args.users:,}, up to {args.meals} meals each, {args.views} views + 1 after a change")
+    print(f"uncached: {base:8.1f} µs/view")
+    print(f"cached:   {cached:8.1f} µs/view  ({base / cached:.1f}x, hits={hits:,} misses={misses:,}, "
+          f"entries={len(main.day_texts):,})")
+
+
+if __name__ == "__main__":
+    cli()
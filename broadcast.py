@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+
+log = logging.getLogger(__name__)
+
+# ===== ЛІМІТИ =====
+# Telegram: ~30 повідомлень/с глобально і ~1 повідомлення/с в один чат.
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)     # менше 1 — токен не набереться ніколи
+        self._tokens = self.capacity
+        self._stamp = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        # RetryAfter стосується всього бота, тож зупиняємо всіх відправників
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass
+class BroadcastReport:
+    total: int = 0
+    sent: int = 0
+    blocked: int = 0
+    failed: int = 0
+    retry_after_hits: int = 0
+    started: float = field(default_factory=time.monotonic)
+    finished: float | None = None
+
+    @property
+    def done(self) -> int:
+        return self.sent + self.blocked + self.failed
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def throughput(self) -> float:
+        return self.sent / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.done}/{self.total} done: sent={self.sent} blocked={self.blocked} "
+            f"failed={self.failed} retry_after={self.retry_after_hits} "
+            f"in {self.elapsed:.1f}s ({self.throughput:.1f} msg/s)"
+        )
+
+
+# ===== РОЗСИЛКА =====
+class Broadcaster:
+    def __init__(
+        self,
+        bot: Bot,
+        rate: float = 25.0,
+        concurrency: int = 20,
+        per_chat_interval: float = 1.0,
+        max_retries: int = 3,
+        on_blocked: Callable[[int], None] | None = None,
+        progress_interval: float = 10.0,
+    ):
+        self.bot = bot
+        self.bucket = TokenBucket(rate)
+        self.concurrency = concurrency
+        self.per_chat_interval = per_chat_interval
+        self.max_retries = max_retries
+        self.on_blocked = on_blocked
+        self.progress_interval = progress_interval
+        self._chat_next: dict[int, float] = {}
+
+    async def _chat_slot(self, chat_id: int) -> None:
+        now = time.monotonic()
+        start = max(now, self._chat_next.get(chat_id, 0.0))
+        self._chat_next[chat_id] = start + self.per_chat_interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    def _prune_chats(self) -> None:
+        # Розклад чатів спільний для одночасних розсилок (пінг кількома групами, нагадування),
+        # тож прибираємо лише ті чати, чий наступний слот уже минув — решту ще пасують інші run()
+        now = time.monotonic()
+        for chat_id in [c for c, at in self._chat_next.items() if at <= now]:
+            del self._chat_next[chat_id]
+
+    async def send(self, chat_id: int, text: str, report: BroadcastReport, **kwargs: Any) -> bool:
+        attempt = 0
+        while True:
+            await self.bucket.acquire()
+            await self._chat_slot(chat_id)
+            try:
+                await self.bot.send_message(chat_id, text, **kwargs)
+                report.sent += 1
+                return True
+            except TelegramRetryAfter as e:
+                # Не рахуємо як спробу: це лише прохання зачекати
+                report.retry_after_hits += 1
+                self.bucket.pause(e.retry_after)
+            except TelegramForbiddenError:
+                report.blocked += 1
+                if self.on_blocked:
+                    self.on_blocked(chat_id)
+                return False
+            except (TelegramNetworkError, TelegramServerError) as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    log.warning("Broadcast to %s failed after %s retries: %s", chat_id, self.max_retries, e)
+                    report.failed += 1
+                    return False
+                await asyncio.sleep(min(30.0, 0.5 * 2 ** attempt) * (1 + random.random() * 0.2))
+            except Exception as e:
+                log.warning("Broadcast to %s failed: %s", chat_id, e)
+                report.failed += 1
+                return False
+
+    async def _progress(self, label: str, report: BroadcastReport) -> None:
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            log.info("Broadcast %s: %s", label, report)
+
+    async def run(self, chat_ids: Iterable[int], text: str, label: str = "broadcast", **kwargs: Any) -> BroadcastReport:
+        queue: asyncio.Queue[int] = asyncio.Queue()
+        for chat_id in chat_ids:
+            queue.put_nowait(chat_id)
+        report = BroadcastReport(total=queue.qsize())
+
+        async def worker() -> None:
+            while True:
+                try:
+                    chat_id = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                await self.send(chat_id, text, report, **kwargs)
+
+        progress = asyncio.create_task(self._progress(label, report))
+        try:
+            await asyncio.gather(*(worker() for _ in range(min(self.concurrency, report.total))))
+        finally:
+            progress.cancel()
+            report.finished = time.monotonic()
+            self._prune_chats()
+        log.info("Broadcast %s finished: %s", label, report)
+        return report
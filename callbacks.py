@@ -0,0 +1,124 @@
+import inspect
+from typing import Any, Awaitable, Callable, NamedTuple
+
+from aiogram.fsm.context import FSMContext
+from aiogram.types import CallbackQuery
+
+# ===== CALLBACK-ДАНІ =====
+# Компактний формат: "<версія><код>[.<аргумент base36>...]", напр. "1x.fuh2.0.5" —
+# відмітити вправу №5 плану 0 за день з ordinal 739550. Усі callback'и йдуть через одну
+# таблицю код -> хендлер замість ланцюжка фільтрів. Нова версія формату додається в
+# decoders, попередні лишаються — кнопки зі старих повідомлень і далі працюють.
+# Кнопки до появи кодека ("toggle:2024-05-06:monday:3", "nut:add_meal", ...) розбирають
+# legacy-парсери; прості назви дій збігаються зі старими рядками й розпізнаються як є.
+VERSION = "1"
+MAX_BYTES = 64  # ліміт Telegram на callback_data
+
+_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+def b36(n: int) -> str:
+    if n < 0:
+        raise ValueError("callback args must be non-negative")
+    out = ""
+    while True:
+        n, r = divmod(n, 36)
+        out = _DIGITS[r] + out
+        if not n:
+            return out
+
+
+class Callback(NamedTuple):
+    action: str
+    args: tuple[int, ...] = ()
+
+
+Handler = Callable[..., Awaitable[Any]]
+LegacyParser = Callable[[list[str]], Callback]
+
+
+class CallbackRouter:
+    def __init__(self, codes: dict[str, str]):
+        self.codes = codes                                    # дія -> код
+        self.actions = {code: action for action, code in codes.items()}
+        if len(self.actions) != len(codes):
+            raise ValueError("duplicate callback codes")
+        self.handlers: dict[str, tuple[Handler, inspect.Signature]] = {}
+        self.legacy_parsers: dict[str, LegacyParser] = {}
+        self.decoders: dict[str, Callable[[str], Callback | None]] = {VERSION: self._decode_v1}
+
+    # ----- реєстрація -----
+    def action(self, name: str):
+        # Хендлер: async def h(cb, state, *args) — args приходять уже як int
+        if name not in self.codes:
+            raise KeyError(f"unknown callback action: {name}")
+
+        def register(fn: Handler) -> Handler:
+            self.handlers[name] = (fn, inspect.signature(fn))
+            return fn
+        return register
+
+    def legacy(self, prefix: str):
+        # Парсер старого формату "prefix:a:b": отримує ["a", "b"], повертає Callback
+        def register(fn: LegacyParser) -> LegacyParser:
+            self.legacy_parsers[prefix] = fn
+            return fn
+        return register
+
+    # ----- кодек -----
+    def pack(self, action: str, *args: int) -> str:
+        data = VERSION + self.codes[action] + "".join("." + b36(a) for a in args)
+        if len(data) > MAX_BYTES:
+            raise ValueError(f"callback data too long: {data}")
+        return data
+
+    def unpack(self, data: str | None) -> Callback | None:
+        # callback_data приходить від клієнта: аргументи — лише невід'ємні числа,
+        # хендлери перевіряють тільки верхню межу
+        if not data:
+            return None
+        decoder = self.decoders.get(data[0])
+        cb = decoder(data[1:]) if decoder is not None else self._decode_legacy(data)
+        if cb is None or any(a < 0 for a in cb.args):
+            return None
+        return cb
+
+    def _decode_v1(self, body: str) -> Callback | None:
+        code, *raw = body.split(".")
+        action = self.actions.get(code)
+        if action is None:
+            return None
+        # int(a, 36) пропускає знак, пробіли й "_" — беремо лише цифри base36
+        if not all(a.isascii() and a.isalnum() for a in raw):
+            return None
+        return Callback(action, tuple(int(a, 36) for a in raw))
+
+    def _decode_legacy(self, data: str) -> Callback | None:
+        if data in self.codes:
+            return Callback(data)
+        head, sep, rest = data.partition(":")
+        parser = self.legacy_parsers.get(head)
+        if parser is None or not sep:
+            return None
+        try:
+            return parser(rest.split(":"))
+        except (ValueError, KeyError, IndexError):
+            return None
+
+    def route_name(self, data: str | None) -> str:
+        cb = self.unpack(data)
+        return cb.action if cb else "unknown"
+
+    # ----- диспетчеризація -----
+    async def dispatch(self, query: CallbackQuery, state: FSMContext):
+        cb = self.unpack(query.data)
+        entry = self.handlers.get(cb.action) if cb else None
+        if entry is not None:
+            handler, sig = entry
+            try:
+                sig.bind(query, state, *cb.args)
+            except TypeError:
+                entry = None
+        if entry is None:
+            return query.answer("Кнопка застаріла — відкрий меню ще раз")
+        return await handler(query, state, *cb.args)
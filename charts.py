@@ -0,0 +1,138 @@
+import asyncio
+import datetime as dt
+import hashlib
+import io
+import logging
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+from aiogram.types import BufferedInputFile, Message
+
+log = logging.getLogger(__name__)
+
+# ===== ГРАФІКИ ПРОГРЕСУ =====
+# PNG до статистики: спожито / спалено / нетто і білок (верхній графік), виконання плану
+# за днями (нижній). Малює matplotlib в окремих процесах, тож event loop не блокується.
+# Картинка адресується хешем своїх даних: той самий графік не малюється і не вивантажується
+# вдруге — Telegram отримує file_id вже надісланого фото (file_id бота дійсний у будь-якому чаті).
+# Пул — fork: spawn/forkserver виконали б у кожному процесі верхній рівень main.py (бот,
+# сховище, планувальник). Тому start() викликається на самому початку старту, поки в процесі
+# ще немає потоків сховища, і одразу імпортує matplotlib у робочих процесах.
+CHART_VERSION = 1       # змінювати разом із виглядом графіка — старі file_id стануть неактуальні
+
+
+class ChartDay(NamedTuple):
+    day: int                # ординал дати
+    intake: int
+    burned: int
+    protein: int            # 0 — не записано
+    done: float             # частка виконаного плану дня, 0..1
+    workout: bool
+
+
+class ChartData(NamedTuple):
+    title: str
+    days: tuple[ChartDay, ...]
+
+    def key(self) -> str:
+        return hashlib.sha1(repr((CHART_VERSION, self)).encode()).hexdigest()
+
+
+def warm() -> None:
+    import matplotlib.backends.backend_agg  # noqa: F401
+    import matplotlib.figure  # noqa: F401
+
+
+def render_png(data: ChartData) -> bytes:
+    # Виконується в процесі пулу. Об'єктний API (без pyplot) — без глобального стану фігур
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    dates = [dt.date.fromordinal(d.day) for d in data.days]
+    x = range(len(dates))
+    fig = Figure(figsize=(8, 5), dpi=100)
+    FigureCanvasAgg(fig)
+    top, bottom = fig.subplots(2, 1, sharex=True, gridspec_kw={"height_ratios": (3, 1)})
+
+    top.plot(x, [d.intake for d in data.days], marker="o", color="#e67e22", label="Спожито")
+    top.plot(x, [d.burned for d in data.days], marker="o", color="#c0392b", label="Спалено")
+    top.plot(x, [d.intake - d.burned for d in data.days], color="#2c3e50", linestyle="--", label="Нетто")
+    top.set_ylabel("ккал")
+    top.grid(alpha=0.3)
+    protein = top.twinx()
+    protein.plot(
+        [i for i, d in zip(x, data.days) if d.protein],
+        [d.protein for d in data.days if d.protein],
+        marker="s", markersize=3, color="#27ae60", label="Білок",
+    )
+    protein.set_ylabel("білок, г")
+    protein.set_ylim(bottom=0)
+    lines = top.get_legend_handles_labels()
+    extra = protein.get_legend_handles_labels()
+    top.legend(lines[0] + extra[0], lines[1] + extra[1], loc="upper left", fontsize=8, ncol=4)
+    top.set_title(data.title)
+
+    bottom.bar(
+        x, [d.done * 100 for d in data.days],
+        color=["#2980b9" if d.workout else "#95a5a6" for d in data.days],
+    )
+    bottom.set_ylim(0, 100)
+    bottom.set_ylabel("план, %")
+    step = max(1, len(dates) // 14)
+    bottom.set_xticks(list(x)[::step])
+    bottom.set_xticklabels([d.strftime("%d.%m") for d in dates][::step], fontsize=8)
+
+    fig.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png")
+    return buf.getvalue()
+
+
+class ChartRenderer:
+    def __init__(self, workers: int = 1, capacity: int = 10000):
+        self.workers = workers
+        self.capacity = capacity
+        self._pool: ProcessPoolExecutor | None = None
+        self._file_ids: OrderedDict[str, str] = OrderedDict()      # хеш даних -> file_id
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    def start(self) -> None:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("fork"))
+            for _ in range(self.workers):
+                self._pool.submit(warm)
+
+    def _executor(self) -> ProcessPoolExecutor:
+        self.start()
+        return self._pool
+
+    async def photo(self, data: ChartData) -> tuple[str, str | BufferedInputFile]:
+        # -> (ключ, file_id або PNG для завантаження); після відправки — remember(ключ, повідомлення)
+        key = data.key()
+        file_id = self._file_ids.get(key)
+        if file_id is not None:
+            self._file_ids.move_to_end(key)
+            return key, file_id
+        fut = self._inflight.get(key)
+        if fut is None:
+            fut = self._inflight[key] = asyncio.ensure_future(
+                asyncio.get_running_loop().run_in_executor(self._executor(), render_png, data)
+            )
+            fut.add_done_callback(lambda _: self._inflight.pop(key, None))
+        png = await asyncio.shield(fut)
+        return key, BufferedInputFile(png, filename="progress.png")
+
+    def remember(self, key: str, message: Message) -> None:
+        if not message.photo:
+            return
+        self._file_ids[key] = message.photo[-1].file_id
+        self._file_ids.move_to_end(key)
+        if len(self._file_ids) > self.capacity:
+            self._file_ids.popitem(last=False)
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
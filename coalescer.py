@@ -0,0 +1,67 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Callable
+
+from aiogram.exceptions import TelegramAPIError, TelegramBadRequest
+from aiogram.types import InlineKeyboardMarkup, Message
+
+log = logging.getLogger(__name__)
+
+# ===== ОБ'ЄДНАННЯ РЕДАГУВАНЬ КЛАВІАТУРИ =====
+# Швидкі кліки по одному повідомленню зливаються в одне edit_reply_markup:
+# перший клік відкриває вікно, по його завершенні рендериться останній стан.
+# Якщо markup не змінився (наприклад, два кліки скасували один одного) — запиту немає.
+class EditCoalescer:
+    def __init__(self, delay: float = 0.4, max_tracked: int = 10000):
+        self.delay = delay
+        self.max_tracked = max_tracked
+        self._pending: dict[tuple[int, int], asyncio.Task] = {}
+        self._render: dict[tuple[int, int], Callable[[], InlineKeyboardMarkup]] = {}
+        self._shown: OrderedDict[tuple[int, int], InlineKeyboardMarkup] = OrderedDict()
+
+    def schedule(self, message: Message, render: Callable[[], InlineKeyboardMarkup]) -> None:
+        key = (message.chat.id, message.message_id)
+        self._render[key] = render
+        if key not in self._pending:
+            current = getattr(message, "reply_markup", None)
+            if key not in self._shown and current is not None:
+                self._remember(key, current)
+            self._pending[key] = asyncio.create_task(self._fire(message, key))
+
+    def _remember(self, key: tuple[int, int], markup: InlineKeyboardMarkup) -> None:
+        self._shown[key] = markup
+        self._shown.move_to_end(key)
+        while len(self._shown) > self.max_tracked:
+            self._shown.popitem(last=False)
+
+    async def _fire(self, message: Message, key: tuple[int, int]) -> None:
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            del self._pending[key]
+            render = self._render.pop(key)
+        # Задача фонова — ніхто не чекає на її результат, тож усі помилки гасимо тут
+        try:
+            markup = render()
+            shown = self._shown.get(key)
+            if shown is markup or shown == markup:
+                return
+            await message.edit_reply_markup(reply_markup=markup)
+        except TelegramBadRequest as e:
+            if "message is not modified" not in str(e):
+                log.warning("edit_reply_markup failed for %s: %s", key, e)
+                return
+        except TelegramAPIError as e:
+            # RetryAfter, мережа, 5xx: наступний клік запланує редагування знову
+            log.warning("edit_reply_markup failed for %s: %s", key, e)
+            return
+        except Exception:
+            log.exception("edit_reply_markup failed for %s", key)
+            return
+        self._remember(key, markup)
+
+    async def close(self) -> None:
+        # Доводимо відкладені редагування до кінця перед зупинкою
+        if self._pending:
+            await asyncio.gather(*self._pending.values(), return_exceptions=True)
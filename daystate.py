@@ -0,0 +1,167 @@
+# ===== КОМПАКТНИЙ СТАН ДНЯ =====
+# Один запис на (користувач, день) замість чотирьох словників:
+#  - виконані вправи / пункти rest-чекліста — бітові маски (int);
+#  - прийоми їжі та активності — кортежі (назва, ккал), список створюється лише за потреби;
+#  - сума ккал прийомів їжі підтримується інкрементально;
+#  - version — лічильник змін (bump() після кожної зміни), ключ кешу відрендерених текстів.
+# Дні в пам'яті адресуються ординалом дати (dt.date.toordinal()).
+
+
+class DayRecord:
+    __slots__ = (
+        "ex_mask", "rest_mask", "meals", "meals_kcal", "kcal_add", "total_manual",
+        "protein", "activities", "burned", "cardio", "status", "version",
+    )
+
+    def __init__(self):
+        self.ex_mask = 0
+        self.rest_mask = 0
+        self.meals: list[tuple[str, int]] | None = None
+        self.meals_kcal = 0
+        self.kcal_add = 0                           # ручні інкременти (+360 і т.д.)
+        self.total_manual: int | None = None        # якщо ввів готовий підсумок
+        self.protein: int | None = None
+        self.activities: list[tuple[str, int]] | None = None
+        self.burned = 0                             # сумарно спалено за день (з активностей)
+        self.cardio: list[str] | None = None        # активності-мітки
+        self.status: str | None = None              # "OK" / "INCOMPLETE" / None
+        self.version = 0                            # не серіалізується
+
+    @property
+    def closed(self) -> bool:
+        return self.status is not None
+
+    @property
+    def intake_kcal(self) -> int:
+        # Готовий підсумок, якщо введено, інакше прийоми їжі + ручні інкременти
+        if self.total_manual is not None:
+            return self.total_manual
+        return self.meals_kcal + self.kcal_add
+
+    @property
+    def ex_done(self) -> int:
+        return self.ex_mask.bit_count()
+
+    @property
+    def rest_done(self) -> int:
+        return self.rest_mask.bit_count()
+
+    def bump(self) -> None:
+        self.version += 1
+
+    def add_meal(self, name: str, kcal: int) -> None:
+        if self.meals is None:
+            self.meals = []
+        self.meals.append((name, kcal))
+        self.meals_kcal += kcal
+
+    def add_activity(self, name: str, kcal: int) -> None:
+        if self.activities is None:
+            self.activities = []
+        self.activities.append((name, kcal))
+        self.burned += kcal
+
+    def drop_meals(self, start: int, stop: int) -> None:
+        # Прибрати прийоми їжі [start, stop) — скасування швидкого вводу
+        removed = self.meals[start:stop]
+        del self.meals[start:stop]
+        self.meals_kcal -= sum(kcal for _, kcal in removed)
+        if not self.meals:
+            self.meals = None
+
+    def drop_activities(self, start: int, stop: int) -> None:
+        removed = self.activities[start:stop]
+        del self.activities[start:stop]
+        self.burned -= sum(kcal for _, kcal in removed)
+        if not self.activities:
+            self.activities = None
+
+    def toggle_ex(self, i: int) -> None:
+        self.ex_mask ^= 1 << i
+
+    def toggle_rest(self, i: int) -> None:
+        self.rest_mask ^= 1 << i
+
+    def compact(self) -> bool:
+        # Старий день згортається до підсумків: суми ккал лишаються, списки страв/активностей — ні.
+        # Статистиці цього досить. Повертає True, якщо було що згортати.
+        if self.meals is None and self.activities is None:
+            return False
+        self.meals = None
+        self.activities = None
+        return True
+
+    # ----- серіалізація (значення за замовчуванням не пишемо) -----
+    def to_dict(self) -> dict:
+        data = {}
+        if self.ex_mask:
+            data["ex_mask"] = self.ex_mask
+        if self.rest_mask:
+            data["rest_mask"] = self.rest_mask
+        if self.meals:
+            data["meals"] = self.meals
+        elif self.meals_kcal:
+            data["meals_kcal"] = self.meals_kcal        # згорнутий день
+        if self.kcal_add:
+            data["kcal_add"] = self.kcal_add
+        if self.total_manual is not None:
+            data["total_manual"] = self.total_manual
+        if self.protein is not None:
+            data["protein"] = self.protein
+        if self.activities:
+            data["activities"] = self.activities
+        if self.burned:
+            data["burned"] = self.burned
+        if self.cardio:
+            data["cardio"] = self.cardio
+        if self.status is not None:
+            data["status"] = self.status
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "DayRecord":
+        if "nutrition" in data or "progress" in data:
+            return cls._from_legacy(data)
+        r = cls()
+        r.ex_mask = data.get("ex_mask", 0)
+        r.rest_mask = data.get("rest_mask", 0)
+        for name, kcal in data.get("meals", ()):
+            r.add_meal(name, kcal)
+        if "meals_kcal" in data and not r.meals:
+            r.meals_kcal = data["meals_kcal"]
+        r.kcal_add = data.get("kcal_add", 0)
+        r.total_manual = data.get("total_manual")
+        r.protein = data.get("protein")
+        if data.get("activities"):
+            r.activities = [(name, kcal) for name, kcal in data["activities"]]
+        r.burned = data.get("burned", 0)
+        r.cardio = list(data["cardio"]) if data.get("cardio") else None
+        r.status = data.get("status")
+        return r
+
+    @classmethod
+    def _from_legacy(cls, data: dict) -> "DayRecord":
+        # Формат рядків до компактного стану: {"progress", "rest", "cardio", "nutrition"}
+        r = cls()
+        for i in data.get("progress", ()):
+            r.ex_mask |= 1 << i
+        for i in data.get("rest", ()):
+            r.rest_mask |= 1 << i
+        r.cardio = list(data["cardio"]) if data.get("cardio") else None
+        nd = data.get("nutrition") or {}
+        for m in nd.get("meals", ()):
+            r.add_meal(m["name"], int(m["kcal"]))
+        r.kcal_add = int(nd.get("kcal_add", 0))
+        manual = nd.get("total_kcal_manual")
+        r.total_manual = manual if isinstance(manual, int) else None
+        protein = nd.get("protein_g")
+        r.protein = protein if isinstance(protein, int) else None
+        if nd.get("activities"):
+            r.activities = [(a["name"], int(a["kcal"])) for a in nd["activities"]]
+        r.burned = int(nd.get("burned_kcal", 0))
+        r.status = nd.get("day_status")
+        return r
+
+
+# Спільний порожній запис для читання відсутніх днів — не змінювати!
+EMPTY_DAY = DayRecord()
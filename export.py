@@ -0,0 +1,171 @@
+import argparse
+import csv
+import datetime as dt
+import io
+import json
+import sys
+from typing import AsyncGenerator, BinaryIO, Callable, Iterable, Iterator
+
+from aiogram.types import InputFile
+
+from daystate import DayRecord
+from storage import Batch, SQLiteBackend, StateBackend
+
+# ===== ЕКСПОРТ / ІМПОРТ ІСТОРІЇ =====
+# Рядок історії — (uid, "YYYY-MM-DD", JSON дня у форматі DayRecord.to_dict()), як у таблиці days.
+# Усе потокове: рядки йдуть генератором, кодуються шматками по CHUNK_SIZE байтів і одразу
+# віддаються у файл або в multipart-завантаження — в пам'яті ніколи немає всього дампу.
+#  - JSONL — без втрат: {"uid": 1, "date": "2024-05-06", ...поля дня}
+#  - CSV — зручний для таблиць: зведені колонки + колонка data з JSON дня (для імпорту)
+# Імпорт пише пакетами по IMPORT_BATCH рядків в одній транзакції. Запускати при зупиненому
+# боті (або в нову базу) — гарячий стан працюючого процесу імпорт не бачить.
+FORMATS = ("jsonl", "csv")
+CHUNK_SIZE = 64 * 1024
+IMPORT_BATCH = 10_000
+CSV_FIELDS = (
+    "uid", "date", "status", "meals_kcal", "kcal_add", "total_manual",
+    "protein", "burned", "ex_done", "rest_done", "data",
+)
+
+Row = tuple[int, str, str]
+
+
+def csv_row(uid: int, day: str, data: str) -> list:
+    d = json.loads(data)
+    return [
+        uid, day, d.get("status", ""), d.get("meals_kcal") or sum(k for _, k in d.get("meals", ())), d.get("kcal_add", 0),
+        d.get("total_manual", ""), d.get("protein", ""), d.get("burned", 0),
+        d.get("ex_mask", 0).bit_count(), d.get("rest_mask", 0).bit_count(), data,
+    ]
+
+
+def encode(rows: Iterable[Row], fmt: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    buf = io.StringIO()
+    if fmt == "csv":
+        writer = csv.writer(buf)
+        writer.writerow(CSV_FIELDS)
+        for uid, day, data in rows:
+            writer.writerow(csv_row(uid, day, data))
+            if buf.tell() >= chunk_size:
+                yield buf.getvalue().encode()
+                buf.seek(0)
+                buf.truncate()
+    elif fmt == "jsonl":
+        for uid, day, data in rows:
+            # Склеюємо рядок без повторного розбору JSON дня
+            buf.write(f'{{"uid": {uid}, "date": "{day}"')
+            buf.write(", " + data[1:] if len(data) > 2 else "}")
+            buf.write("\n")
+            if buf.tell() >= chunk_size:
+                yield buf.getvalue().encode()
+                buf.seek(0)
+                buf.truncate()
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+    if buf.tell():
+        yield buf.getvalue().encode()
+
+
+def decode(lines: Iterable[str], fmt: str) -> Iterator[Row]:
+    # Кожен день проходить через DayRecord: старі формати нормалізуються, сміття відсіюється
+    if fmt == "csv":
+        for rec in csv.DictReader(lines):
+            yield normalize(int(rec["uid"]), rec["date"], json.loads(rec["data"] or "{}"))
+    elif fmt == "jsonl":
+        for line in lines:
+            if not line.strip():
+                continue
+            obj = json.loads(line)
+            uid = int(obj.pop("uid"))
+            yield normalize(uid, obj.pop("date"), obj)
+    else:
+        raise ValueError(f"Unknown import format: {fmt}")
+
+
+def normalize(uid: int, day: str, data: dict) -> Row:
+    day = dt.date.fromisoformat(day).isoformat()
+    return uid, day, json.dumps(DayRecord.from_dict(data).to_dict(), ensure_ascii=False)
+
+
+def import_rows(backend: StateBackend, rows: Iterable[Row], batch_size: int = IMPORT_BATCH) -> int:
+    total = 0
+    batch = Batch()
+    for row in rows:
+        batch.days.append(row)
+        if len(batch.days) >= batch_size:
+            backend.write_batch(batch)
+            total += len(batch.days)
+            batch = Batch()
+    if batch.days:
+        backend.write_batch(batch)
+        total += len(batch.days)
+    return total
+
+
+def format_from_name(name: str, default: str = "jsonl") -> str:
+    ext = name.rsplit(".", 1)[-1].lower() if "." in name else ""
+    return ext if ext in FORMATS else default
+
+
+# ===== ЗАВАНТАЖЕННЯ В TELEGRAM =====
+class StreamInputFile(InputFile):
+    # Файл, який генерується під час відправки: aiohttp шле шматки як chunked-тіло.
+    # make_chunks викликається на кожну спробу відправки, тож повтор після помилки
+    # отримає свіжий генератор.
+    def __init__(self, make_chunks: Callable[[], Iterable[bytes]], filename: str):
+        super().__init__(filename=filename)
+        self.make_chunks = make_chunks
+
+    async def read(self, bot) -> AsyncGenerator[bytes, None]:
+        for chunk in self.make_chunks():
+            yield chunk
+
+
+# ===== CLI =====
+#   python export.py export --db state.db [--uid 123] [--format csv] [--out dump.csv]
+#   python export.py import --db new.db --in dump.jsonl
+def open_out(path: str) -> BinaryIO:
+    return sys.stdout.buffer if path == "-" else open(path, "wb")
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(description="Streaming export/import of day history")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    exp = sub.add_parser("export")
+    exp.add_argument("--db", default="state.db")
+    exp.add_argument("--uid", type=int, help="лише один користувач")
+    exp.add_argument("--format", choices=FORMATS, help="за замовчуванням — з розширення --out, інакше jsonl")
+    exp.add_argument("--out", default="-")
+    imp = sub.add_parser("import")
+    imp.add_argument("--db", default="state.db")
+    imp.add_argument("--in", dest="src", default="-")
+    imp.add_argument("--format", choices=FORMATS)
+    imp.add_argument("--batch", type=int, default=IMPORT_BATCH)
+    args = parser.parse_args()
+
+    backend = SQLiteBackend(args.db)
+    try:
+        if args.cmd == "export":
+            fmt = args.format or format_from_name(args.out)
+            out = open_out(args.out)
+            try:
+                for chunk in encode(backend.iter_days(args.uid), fmt):
+                    out.write(chunk)
+            finally:
+                if out is not sys.stdout.buffer:
+                    out.close()
+        else:
+            fmt = args.format or format_from_name(args.src)
+            src = sys.stdin if args.src == "-" else open(args.src, encoding="utf-8", newline="")
+            try:
+                n = import_rows(backend, decode(src, fmt), args.batch)
+            finally:
+                if src is not sys.stdin:
+                    src.close()
+            print(f"Imported {n} days into {args.db}", file=sys.stderr)
+    finally:
+        backend.close()
+
+
+if __name__ == "__main__":
+    cli()
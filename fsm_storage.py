@@ -0,0 +1,132 @@
+import asyncio
+import json
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+# ===== FSM-СХОВИЩЕ, СПІЛЬНЕ ДЛЯ ПРОЦЕСІВ =====
+# Незавершені діалоги (AddMeal, AddActivity, ...) живуть у SQLite (WAL), тож наступний
+# апдейт може обробити будь-який воркер, а рестарт не губить розмову.
+# На відміну від стану днів, пишемо одразу: інший процес має побачити зміну.
+class SQLiteFSMStorage(BaseStorage):
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10.0)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS fsm ("
+            " key TEXT PRIMARY KEY, state TEXT, data TEXT NOT NULL DEFAULT '{}', updated REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS fsm_by_updated ON fsm (updated)")
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fsm")
+
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        return f"{key.bot_id}:{key.chat_id}:{key.user_id}:{key.thread_id or ''}:{key.destiny}"
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _set_state(self, key: str, state: str | None) -> None:
+        self.conn.execute(
+            "INSERT INTO fsm (key, state, updated) VALUES (?, ?, ?)"
+            " ON CONFLICT(key) DO UPDATE SET state = excluded.state, updated = excluded.updated",
+            (key, state, time.time()),
+        )
+
+    def _set_data(self, key: str, data: str) -> None:
+        self.conn.execute(
+            "INSERT INTO fsm (key, data, updated) VALUES (?, ?, ?)"
+            " ON CONFLICT(key) DO UPDATE SET data = excluded.data, updated = excluded.updated",
+            (key, data, time.time()),
+        )
+
+    def _get(self, key: str, column: str) -> Any:
+        row = self.conn.execute(f"SELECT {column} FROM fsm WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        value = state.state if isinstance(state, State) else state
+        await self._run(self._set_state, self._key(key), value)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        return await self._run(self._get, self._key(key), "state")
+
+    async def set_data(self, key: StorageKey, data: dict[str, Any]) -> None:
+        await self._run(self._set_data, self._key(key), json.dumps(data, ensure_ascii=False))
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        raw = await self._run(self._get, self._key(key), "data")
+        return json.loads(raw) if raw else {}
+
+    def _expire(self, older_than: float, limit: int) -> int:
+        cur = self.conn.execute(
+            "DELETE FROM fsm WHERE key IN (SELECT key FROM fsm WHERE updated < ? LIMIT ?)",
+            (older_than, limit),
+        )
+        return cur.rowcount
+
+    async def expire(self, older_than: float, limit: int = 500) -> int:
+        # Покинуті діалоги (напр. назва страви без калорій) — видаляємо порціями
+        return await self._run(self._expire, older_than, limit)
+
+    async def close(self) -> None:
+        await self._run(self.conn.close)
+        self._executor.shutdown(wait=True)
+
+
+# MemoryStorage з aiogram створює запис на кожне читання й ніколи їх не видаляє.
+# Тут читання нічого не створює, очищений діалог видаляється одразу, а updated
+# упорядкований за часом останнього запису — прострочені знімаються з голови.
+class TTLMemoryStorage(MemoryStorage):
+    def __init__(self) -> None:
+        super().__init__()
+        self.updated: dict[StorageKey, float] = {}
+
+    def _touch(self, key: StorageKey) -> None:
+        record = self.storage.get(key)
+        self.updated.pop(key, None)
+        if record is None or (record.state is None and not record.data):
+            self.storage.pop(key, None)
+        else:
+            self.updated[key] = time.time()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await super().set_state(key, state)
+        self._touch(key)
+
+    async def set_data(self, key: StorageKey, data: dict[str, Any]) -> None:
+        await super().set_data(key, data)
+        self._touch(key)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        record = self.storage.get(key)
+        return record.state if record else None
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        record = self.storage.get(key)
+        return record.data.copy() if record else {}
+
+    async def expire(self, older_than: float, limit: int = 500) -> int:
+        removed = 0
+        while self.updated and removed < limit:
+            key, ts = next(iter(self.updated.items()))
+            if ts >= older_than:
+                break
+            del self.updated[key]
+            self.storage.pop(key, None)
+            removed += 1
+        return removed
+
+
+def fsm_storage_from_env(kind: str, path: str) -> BaseStorage:
+    if kind == "memory":
+        return TTLMemoryStorage()
+    if kind == "sqlite":
+        return SQLiteFSMStorage(path)
+    raise ValueError(f"Unknown FSM_STORAGE: {kind}")
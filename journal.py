@@ -0,0 +1,299 @@
+import json
+import logging
+import os
+import struct
+import time
+import zlib
+from typing import Iterator
+
+from metrics import registry
+from storage import Batch, StateBackend
+
+log = logging.getLogger(__name__)
+
+# ===== ЖУРНАЛ ЗМІН + ЗНІМКИ =====
+# Бекенд STATE_BACKEND=journal: стан на диску — знімок snapshot.<N> і журнал journal.<N>
+# із записами, зробленими після нього.
+#  - Кожен пакет Storage (усі дні, змінені за flush_interval, підписки, пояси, нагадування) — один запис
+#    журналу: [довжина u32][crc32 u32][JSON]. Один write + один fsync на пакет (group commit).
+#    Запис дня — його повний стан після змін, тож повторне застосування нешкідливе.
+#  - Коли журнал виростає за snapshot_bytes, пишеться знімок N+1 (tmp + fsync + rename),
+#    після чого починається journal.<N+1>, а старі файли видаляються.
+#  - Відновлення: останній знімок + свій журнал. Обірваний хвіст (падіння посеред запису)
+#    відрізається по останньому цілому запису. Битий запис посередині пропускається (лог +
+#    лічильник), читання продовжується з наступного цілого заголовка; після такого
+#    відновлення одразу пишеться знімок, щоб битий запис не лишався в журналі.
+#  - read_only=True — читач для офлайн-звітів поруч із живим ботом: те саме відновлення, але
+#    без обрізання хвоста, знімків і відкриття журналу на запис (хвіст, який бот саме дописує,
+#    просто не читається). Якщо бот тим часом зробив знімок і видалив старі файли — читаємо заново.
+# Увесь стан тримається в пам'яті бекенду сирими JSON-рядками: при старті знімок лише
+# розбивається на рядки користувачів (байти як є), JSON розбирається при довантаженні
+# користувача. Час старту ~ розмір знімка + розмір журналу, тож snapshot_bytes тримаємо малим.
+HEADER = struct.Struct("<II")
+registry.help["bot_journal_skipped_records_total"] = "Corrupt journal records skipped during recovery"
+SNAPSHOT_MAGIC = b"smartdaily-snapshot 2"          # 2: + рядок нагадувань після поясів
+SNAPSHOT_MAGIC_V1 = b"smartdaily-snapshot 1"
+
+
+def _record_at(data: bytes, pos: int) -> tuple[dict, int] | None:
+    # -> (запис, зсув його кінця), якщо з pos починається цілий запис
+    if pos + HEADER.size > len(data):
+        return None
+    length, crc = HEADER.unpack_from(data, pos)
+    start = pos + HEADER.size
+    payload = data[start:start + length]
+    if len(payload) < length or zlib.crc32(payload) != crc:
+        return None
+    try:
+        return json.loads(payload), start + length
+    except ValueError:
+        return None
+
+
+def read_records(path: str) -> tuple[list[dict], int, int, int]:
+    # -> (записи, зсув кінця останнього цілого запису, розмір файлу, пропущено битих)
+    records: list[dict] = []
+    good = skipped = 0
+    with open(path, "rb") as f:
+        data = f.read()
+    size = len(data)
+    pos = 0
+    while pos < size:
+        found = _record_at(data, pos)
+        if found is None:
+            # Шукаємо наступний цілий запис (тіло — JSON-об'єкт, тож "{" після заголовка);
+            # не знайшли — це обірваний хвіст
+            nxt = data.find(b"{", pos + HEADER.size + 1)
+            while nxt != -1 and (found := _record_at(data, nxt - HEADER.size)) is None:
+                nxt = data.find(b"{", nxt + 1)
+            if found is None:
+                break
+            skipped += 1
+            log.warning("Journal %s: skipping %s corrupt bytes at offset %s", path, nxt - HEADER.size - pos, pos)
+        record, pos = found
+        records.append(record)
+        good = pos
+    return records, good, size, skipped
+
+
+def frame(record: dict) -> bytes:
+    payload = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode()
+    return HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+class JournalBackend(StateBackend):
+    persistent = True
+
+    def __init__(self, directory: str, snapshot_bytes: int = 8 << 20, fsync: bool = True, read_only: bool = False):
+        self.directory = directory
+        self.snapshot_bytes = snapshot_bytes
+        self.fsync = fsync
+        self.read_only = read_only
+        if read_only:
+            for attempt in range(3):
+                self._reset()
+                try:
+                    self.generation = self._recover()
+                    if self._latest() == self.generation:
+                        return
+                except FileNotFoundError:
+                    pass
+            raise RuntimeError(f"journal {directory} kept changing while being read, try again")
+        self._reset()
+        os.makedirs(directory, exist_ok=True)
+        self.generation = self._recover()
+        self._journal = open(self._path("journal"), "ab")
+        self._journal_size = self._journal.tell()
+        if self.skipped_records:
+            self.snapshot()
+
+    def _reset(self) -> None:
+        # uid -> рядок знімка b"uid\t{день: JSON дня}" (ще не розібраний) або {день: JSON дня}
+        self.users: dict[int, bytes | dict[str, str]] = {}
+        # Дні з журналу для ще не розібраних користувачів — зливаються при першому читанні
+        self._overlay: dict[int, dict[str, str]] = {}
+        self.subscribers: set[int] = set()
+        self.timezones: dict[int, str] = {}
+        self.reminders: dict[int, str] = {}
+        self._journal = None
+
+    def _path(self, kind: str, generation: int | None = None) -> str:
+        return os.path.join(self.directory, f"{kind}.{self.generation if generation is None else generation}")
+
+    # ----- відновлення -----
+    def _latest(self) -> int:
+        return max((
+            int(name.split(".", 1)[1]) for name in os.listdir(self.directory)
+            if name.startswith("snapshot.") and name.split(".", 1)[1].isdigit()
+        ), default=0)
+
+    def _recover(self) -> int:
+        start = time.perf_counter()
+        generation = self._latest()
+        if generation:
+            self._load_snapshot(os.path.join(self.directory, f"snapshot.{generation}"))
+        path = os.path.join(self.directory, f"journal.{generation}")
+        replayed = 0
+        self.skipped_records = 0
+        if os.path.exists(path):
+            records, good, size, skipped = read_records(path)
+            for record in records:
+                self._apply(record)
+            replayed = len(records)
+            if skipped:
+                self.skipped_records = skipped
+                registry.inc("bot_journal_skipped_records_total", (), skipped)
+                log.error("Journal %s: %s corrupt records skipped, their changes are lost", path, skipped)
+            if good < size and not self.read_only:
+                log.warning("Journal %s: dropping %s bytes of torn/corrupt tail", path, size - good)
+                with open(path, "r+b") as f:
+                    f.truncate(good)
+        log.info(
+            "Journal recovered: snapshot %s, %s records replayed, %s users in %.3fs",
+            generation, replayed, len(self.users), time.perf_counter() - start,
+        )
+        return generation
+
+    def _load_snapshot(self, path: str) -> None:
+        with open(path, "rb") as f:
+            lines = f.read().split(b"\n")
+        if lines[0] not in (SNAPSHOT_MAGIC, SNAPSHOT_MAGIC_V1):
+            raise ValueError(f"not a snapshot: {path}")
+        self.subscribers = set(json.loads(lines[1]))
+        self.timezones = {int(uid): tz for uid, tz in json.loads(lines[2]).items()}
+        first = 3
+        if lines[0] == SNAPSHOT_MAGIC:
+            self.reminders = {int(uid): data for uid, data in json.loads(lines[3]).items()}
+            first = 4
+        users = self.users
+        for line in lines[first:]:
+            if line:
+                users[int(line[:line.index(b"\t")])] = line
+
+    def _days(self, uid: int) -> dict[str, str]:
+        days = self.users.get(uid)
+        if isinstance(days, bytes):
+            days = self.users[uid] = json.loads(days[days.index(b"\t") + 1:])
+            days.update(self._overlay.pop(uid, ()))
+        elif days is None:
+            days = self.users[uid] = {}
+        return days
+
+    def _apply(self, record: dict) -> None:
+        users, overlay = self.users, self._overlay
+        for uid, day, data in record.get("d", ()):
+            days = users.get(uid)
+            if days is None:
+                users[uid] = {day: data}
+            elif isinstance(days, bytes):
+                overlay.setdefault(uid, {})[day] = data
+            else:
+                days[day] = data
+        self.subscribers.update(record.get("sa", ()))
+        self.subscribers.difference_update(record.get("sd", ()))
+        for uid, tz in record.get("tz", ()):
+            self.timezones[uid] = tz
+        for uid, data in record.get("rm", ()):
+            if data is None:
+                self.reminders.pop(uid, None)
+            else:
+                self.reminders[uid] = data
+
+    # ----- читання -----
+    def load_user(self, uid: int) -> dict[str, dict]:
+        if uid not in self.users:
+            return {}
+        return {day: json.loads(data) for day, data in self._days(uid).items()}
+
+    def load_subscribers(self) -> set[int]:
+        return set(self.subscribers)
+
+    def load_timezones(self) -> dict[int, str]:
+        return dict(self.timezones)
+
+    def load_reminders(self) -> dict[int, str]:
+        return dict(self.reminders)
+
+    def load_day_rows(self, day: str, uids: set[int]) -> dict[int, dict]:
+        out = {}
+        for uid in uids:
+            if uid in self.users and (data := self._days(uid).get(day)) is not None:
+                out[uid] = json.loads(data)
+        return out
+
+    def iter_days(self, uid: int | None = None) -> Iterator[tuple[int, str, str]]:
+        for u in sorted(self.users) if uid is None else (uid,):
+            if u in self.users:
+                days = self._days(u)
+                for day in sorted(days):
+                    yield u, day, days[day]
+
+    # ----- запис -----
+    def write_batch(self, batch: Batch) -> None:
+        if self.read_only:
+            raise RuntimeError(f"journal {self.directory} is opened read-only")
+        record = {}
+        if batch.days:
+            record["d"] = batch.days
+        if batch.subs_add:
+            record["sa"] = batch.subs_add
+        if batch.subs_del:
+            record["sd"] = batch.subs_del
+        if batch.timezones:
+            record["tz"] = batch.timezones
+        if batch.reminders:
+            record["rm"] = batch.reminders
+        if not record:
+            return
+        data = frame(record)
+        self._journal.write(data)
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+        self._journal_size += len(data)
+        self._apply(record)
+        if self._journal_size >= self.snapshot_bytes:
+            self.snapshot()
+
+    def snapshot(self) -> None:
+        start = time.perf_counter()
+        generation = self.generation + 1
+        path = self._path("snapshot", generation)
+        with open(path + ".tmp", "wb") as f:
+            f.write(SNAPSHOT_MAGIC + b"\n")
+            f.write(json.dumps(sorted(self.subscribers)).encode() + b"\n")
+            f.write(json.dumps({str(uid): tz for uid, tz in self.timezones.items()}).encode() + b"\n")
+            f.write(json.dumps({str(uid): data for uid, data in self.reminders.items()}, ensure_ascii=False).encode() + b"\n")
+            users = self.users
+            for uid in users:
+                days = self._days(uid) if uid in self._overlay else users[uid]
+                if not isinstance(days, bytes):
+                    # Назад у рядок знімка: компактніше в пам'яті, наступний знімок пише як є
+                    days = users[uid] = f"{uid}\t{json.dumps(days, ensure_ascii=False, separators=(',', ':'))}".encode()
+                f.write(days + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        self._sync_dir()
+        old = self.generation
+        self._journal.close()
+        self.generation = generation
+        self._journal = open(self._path("journal"), "ab")
+        self._journal_size = 0
+        for kind in ("journal", "snapshot"):
+            try:
+                os.remove(self._path(kind, old))
+            except FileNotFoundError:
+                pass
+        log.info("Journal snapshot %s: %s users in %.3fs", generation, len(self.users), time.perf_counter() - start)
+
+    def _sync_dir(self) -> None:
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def close(self) -> None:
+        if self._journal is not None:
+            self._journal.close()
@@ -1,174 +1,281 @@
 import os
+import re
+import html
+import json
 import asyncio
+import logging
+import time
+import zlib
 import datetime as dt
-from zoneinfo import ZoneInfo
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 from aiogram import Bot, Dispatcher, types, F
 from aiogram.enums import ParseMode
-from aiogram.filters import CommandStart
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.filters import CommandStart, Command, CommandObject, StateFilter
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, InlineQueryResultArticle, InputTextMessageContent
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.fsm.context import FSMContext
-from aiogram.fsm.storage.memory import MemoryStorage
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from dotenv import load_dotenv
 
+import analytics
+from autocomplete import MealSuggester, food_key, load_foods
+from broadcast import Broadcaster
+from callbacks import Callback, CallbackRouter
+from charts import ChartData, ChartDay, ChartRenderer
+from coalescer import EditCoalescer
+from daystate import DayRecord, EMPTY_DAY
+import export
+from fsm_storage import fsm_storage_from_env
+from plans import WEEKDAYS, Checklist, DayPlan, PlanStore
+import reminders as rem
+from rendercache import RenderCache
+from retention import Retention
+import metrics
+from ordering import UserOrderingMiddleware
+import quickentry
+from storage import Storage, backend_from_env
+import webhook
+
 load_dotenv()
 
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 if not BOT_TOKEN:
     raise ValueError("BOT_TOKEN is not set")
 
-bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
-dp = Dispatcher(storage=MemoryStorage())
-scheduler = AsyncIOScheduler(timezone=ZoneInfo("Europe/Kyiv"))
-
-# --- Тренування ---
-WORKOUTS = {
-    "monday": {
-        "title": "🔴 Понеділок – ГРУДИ + ТРІЦЕПС + ПЕРЕДНЯ ДЕЛЬТА",
-        "exercises": [
-            ("Жим штанги лежачи", "4×8"),
-            ("Жим гантелей під кутом", "3×10"),
-            ("Кросовер", "3×12"),
-            ("Віджимання на брусах", "3×макс"),
-            ("Жим вниз на тріцепс (канат)", "3×12"),
-            ("Французький жим", "3×10"),
-            ("Фронтальні підйоми гантелей", "3×15")
-        ]
-    },
-    "wednesday": {
-        "title": "🔵 Середа – СПИНА + БІЦЕПС + ЗАДНЯ ДЕЛЬТА",
-        "exercises": [
-            ("Тяга верхнього блоку", "4×10"),
-            ("Тяга штанги в нахилі", "3×10"),
-            ("Підтягування / нижня тяга", "3×макс"),
-            ("Підйом штанги на біцепс", "3×12"),
-            ("Молотки", "3×12"),
-            ("Зворотні махи в нахилі", "3×15")
-        ]
-    },
-    "friday": {
-        "title": "🟢 П’ятниця – НОГИ + ПРЕС + БІЧНА ДЕЛЬТА",
-        "exercises": [
-            ("Жим ногами / Присідання", "4×10"),
-            ("Румунська тяга", "3×12"),
-            ("Випади", "3×10 на ногу"),
-            ("Прес", "3×15"),
-            ("Бічні махи гантелями стоячи", "3×15"),
-            ("Бічні махи у тренажері", "3×15")
-        ]
-    }
-}
-
-# --- Rest Day чекліст ---
-REST_TODO = [
-    "Zone 2 — 30–40 хв",
-    "10 000 кроків",
-    "Мобільність — 12 хв",
-    "Core — 8 хв",
-    "Дихання — 5 хв",
-    "Ролер/масаж — 5–7 хв",
-    "Гідрація/харчування виконано",
-    "Сон — план на ніч"
-]
+# BOT_API_URL дозволяє направити бота на локальний Bot API сервер (або фейковий для тестів)
+BOT_API_URL = os.getenv("BOT_API_URL")
+session = AiohttpSession(api=TelegramAPIServer.from_base(BOT_API_URL)) if BOT_API_URL else None
+bot = Bot(token=BOT_TOKEN, session=session, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+# Режими: polling (за замовчуванням), webhook (WEB_WORKERS>1 — балансувальник + воркери), worker
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", "1"))
+WORKER_ID = int(os.getenv("WORKER_ID", "0"))
+DB_PATH = os.getenv("DB_PATH", "state.db")
+
+dp = Dispatcher(storage=fsm_storage_from_env(os.getenv("FSM_STORAGE", "sqlite"), os.getenv("FSM_DB_PATH", DB_PATH)))
+DEFAULT_TZ = os.getenv("DEFAULT_TZ", "Europe/Kyiv")
+scheduler = AsyncIOScheduler(timezone=ZoneInfo(DEFAULT_TZ))
+
+# Коди callback-дій (формат — див. callbacks.py). Назви простих дій збігаються зі старими
+# callback_data, тож кнопки зі старих повідомлень розпізнаються. Коди не перевикористовувати.
+cbs = CallbackRouter({
+    "workout_today": "w",
+    "ex": "x",              # день, план (номер дня тижня), вправа
+    "rest": "r",            # день, пункт чекліста
+    "nutrition_menu": "n",
+    "nut:show_today": "ns",
+    "nut:add_meal": "nm",
+    "nut:add_protein": "np",
+    "nut:add_kcal": "nk",
+    "nut:add_total": "nt",
+    "act:add": "a",
+    "day:close": "c",
+    "stats": "s",           # [вікно, днів]
+    "meal": "m",            # ключ страви (crc32 назви), ккал
+    "quick:undo": "u",      # день, страви [від, до), активності [від, до), білок, білок після, crc32 записаного
+    "rem:settings": "R",
+    "rem:toggle": "Rt",     # вид (reminders.MEALS / WORKOUT)
+    "rem:snooze": "Rs",     # хвилин
+    "back": "b",
+})
+
+# Метрики (METRICS_ENABLED=1): час хендлерів за маршрутом, виклики Bot API, тривалість задач.
+# Вимкнені — middleware не реєструються, тож гарячий шлях нічого не платить.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "0") == "1"
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9090"))                  # /metrics у режимі polling
+METRICS_LOG_INTERVAL = float(os.getenv("METRICS_LOG_INTERVAL", "0"))   # зведення в лог, сек (0 — вимкнено)
+if METRICS_ENABLED:
+    bot.session.middleware(metrics.APIMetricsMiddleware())
+    dp.message.outer_middleware(metrics.HandlerMetricsMiddleware(cbs.route_name, lambda: metrics.registered_commands(dp)))
+    dp.callback_query.outer_middleware(metrics.HandlerMetricsMiddleware(cbs.route_name))
+    dp.inline_query.outer_middleware(metrics.HandlerMetricsMiddleware(cbs.route_name))
+
+def job(name: str, fn):
+    return metrics.timed_job(name, fn) if METRICS_ENABLED else fn
+
+# --- Плани тренувань, харчування та rest-чекліст (data.json, перечитується на льоту) ---
+plans = PlanStore(
+    os.getenv("PLAN_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data.json")),
+    os.getenv("PLAN_OVERRIDES_PATH") or None,
+)
+PLAN_RELOAD_INTERVAL = float(os.getenv("PLAN_RELOAD_INTERVAL", "5"))
 
 # ===== ЗБЕРІГАННЯ СТАНУ =====
-user_progress: dict[int, dict[str, set[int]]] = {}          # тренування: {uid: {date: set(ex_idx)}}
-user_rest: dict[int, dict[str, set[int]]] = {}              # rest чекліст: {uid: {date: set(item_idx)}}
-user_cardio: dict[int, dict[str, list[str]]] = {}           # активності-мітки: {uid: {date: [labels...]}}
-# Харчування / активності / статус дня
-# user_nutrition[uid][date] = {
-#   "meals":[{"name","kcal"}],
-#   "protein_g": int,
-#   "kcal_add": int,                   # ручні інкременти (+360 і т.д.)
-#   "total_kcal_manual": int,          # якщо ввів готовий підсумок
-#   "burned_kcal": int,                # сумарно спалено за день (з активностей)
-#   "activities":[{"name","kcal"}],    # список активностей зі спаленими ккал
-#   "day_status": "OK"/"INCOMPLETE"/None,
-#   "closed": bool
-# }
-user_nutrition: dict[int, dict[str, dict]] = {}
+# Стан дня (тренування, rest-чекліст, харчування, активності, статус) — див. daystate.DayRecord
+user_days: dict[int, dict[int, DayRecord]] = {}             # {uid: {date.toordinal(): DayRecord}}
 subscribers: set[int] = set()
+user_tz: dict[int, str] = {}                                # часовий пояс: {uid: "Europe/Kyiv"}
+tz_buckets: dict[str, set[int]] = {}                        # підписники за поясом: {tz: {uid...}}
+settled_days: dict[int, set[int]] = {}                      # індекс для пінгу: {день: {uid із закритим/повним днем}}
+# Тексти екрана харчування й закриття дня за версією запису дня (див. rendercache.py)
+day_texts = RenderCache(("nutrition", "close"), int(os.getenv("RENDER_CACHE_SIZE", "20000")))
+if METRICS_ENABLED:
+    metrics.registry.collect(day_texts.metrics)
+
+# ===== ПЕРСИСТЕНТНІСТЬ =====
+def dump_day(uid: int, day: int) -> dict:
+    return user_days.get(uid, {}).get(day, EMPTY_DAY).to_dict()
+
+def load_day(uid: int, day: int, data: dict) -> None:
+    user_days.setdefault(uid, {})[day] = DayRecord.from_dict(data)
+    day_texts.forget(uid, day)
+
+storage = Storage(
+    backend_from_env(os.getenv("STATE_BACKEND", "sqlite"), DB_PATH),
+    dump_day=dump_day,
+    load_day=load_day,
+    flush_interval=float(os.getenv("STATE_FLUSH_INTERVAL", "0.5")),
+)
+
+# Апдейти одного користувача — строго по черзі, різних — паралельно (див. ordering.py).
+# FSM-middleware читає стан діалогу на вході, тож черга має стояти перед ним: інакше
+# наступне повідомлення побачить стан до завершення попереднього хендлера.
+# Довантаження стану нижче теж іде вже в черзі користувача
+dp.update.outer_middleware.unregister(dp.fsm)
+dp.update.outer_middleware(UserOrderingMiddleware(
+    max_pending=int(os.getenv("USER_QUEUE_MAX", "8")),
+    max_concurrency=int(os.getenv("HANDLER_CONCURRENCY", "256")),
+))
+dp.update.outer_middleware(dp.fsm)
+
+# Довантажуємо стан користувача до того, як його побачать хендлери
+@dp.update.outer_middleware()
+async def hydrate_user_state(handler, event, data):
+    user = data.get("event_from_user")
+    if user is not None:
+        await storage.hydrate(user.id)
+    return await handler(event, data)
 
 # ===== ДАТИ / ДНІ =====
-def today_str() -> str:
-    return dt.date.today().isoformat()
+def user_today(uid: int) -> dt.date:
+    return dt.datetime.now(ZoneInfo(user_tz.get(uid, DEFAULT_TZ))).date()
+
+def today_day(uid: int) -> int:
+    return user_today(uid).toordinal()
 
-def weekday_key_by_date(d: dt.date) -> str | None:
-    return {0: "monday", 2: "wednesday", 4: "friday"}.get(d.weekday())
+# День у callback-даних приходить від клієнта: приймаємо лише дні поруч із сьогоднішнім
+# (кнопки старих повідомлень, зміна поясу). Інакше підроблена кнопка створить запис
+# неіснуючої дати — touch_day впаде на fromordinal, а ключ застрягне в черзі запису
+CALLBACK_DAY_WINDOW = int(os.getenv("CALLBACK_DAY_WINDOW", "7"))
+
+def callback_day_ok(uid: int, day: int) -> bool:
+    return abs(day - today_day(uid)) <= CALLBACK_DAY_WINDOW
 
 def weekday_short_ua(d: dt.date) -> str:
     return ["Пн","Вт","Ср","Чт","Пт","Сб","Нд"][d.weekday()]
 
 # ===== ОБЧИСЛЕННЯ КАЛОРІЙ =====
-def calc_intake_kcal(nd: dict) -> int:
-    meals_sum = sum(int(m["kcal"]) for m in nd.get("meals", [])) if nd.get("meals") else 0
-    increments = int(nd.get("kcal_add", 0))
-    manual = nd.get("total_kcal_manual", None)
-    if isinstance(manual, int):
-        return manual
-    return meals_sum + increments
-
-def calc_burned_kcal(nd: dict) -> int:
-    return int(nd.get("burned_kcal", 0))
-
-def ensure_day(uid: int, dstr: str) -> dict:
-    user_nutrition.setdefault(uid, {}).setdefault(dstr, {})
-    nd = user_nutrition[uid][dstr]
-    nd.setdefault("meals", [])
-    nd.setdefault("activities", [])
-    nd.setdefault("kcal_add", 0)
-    nd.setdefault("burned_kcal", 0)
-    nd.setdefault("day_status", None)
-    nd.setdefault("closed", False)
+def calc_intake_kcal(nd: DayRecord) -> int:
+    return nd.intake_kcal
+
+def calc_burned_kcal(nd: DayRecord) -> int:
+    return nd.burned
+
+def get_day(uid: int, day: int) -> DayRecord:
+    # Лише читання: відсутній день — спільний порожній запис
+    return user_days.get(uid, {}).get(day, EMPTY_DAY)
+
+def ensure_day(uid: int, day: int) -> DayRecord:
+    days = user_days.setdefault(uid, {})
+    nd = days.get(day)
+    if nd is None:
+        nd = days[day] = DayRecord()
     return nd
 
+def touch_day(uid: int, day: int) -> None:
+    # Викликається після кожної зміни дня користувача
+    nd = get_day(uid, day)
+    if nd is EMPTY_DAY:
+        return          # запису дня немає — змін теж немає, а спільний запис не чіпаємо
+    nd.bump()
+    storage.mark_dirty(uid, day)
+    settled = settled_days.setdefault(day, set())
+    if day_settled(uid, dt.date.fromordinal(day), nd):
+        settled.add(uid)
+    else:
+        settled.discard(uid)
+
+# ===== ПЕРЕВІРКИ ДНЯ =====
+# Спільні для day:close і вечірнього пінгу
+def day_missing(uid: int, d: dt.date, nd: DayRecord) -> list[str]:
+    missing = []
+    if calc_intake_kcal(nd) == 0:
+        missing.append("калорії")
+    if nd.protein is None or nd.protein <= 0:
+        missing.append("білок")
+    if plans.for_user(uid).workout(d):
+        if nd.ex_done == 0:
+            missing.append("тренування")
+    else:
+        if nd.rest_done == 0:
+            missing.append("rest‑чекліст")
+    return missing
+
+def day_settled(uid: int, d: dt.date, nd: DayRecord) -> bool:
+    # Закритий (з будь-яким статусом) або вже повний день — пінгувати нема про що
+    return nd.closed or not day_missing(uid, d, nd)
+
 # ===== КНОПКИ =====
 def main_menu():
     return InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="💪 Тренування", callback_data="workout_today")],
-        [InlineKeyboardButton(text="🍽 Харчування", callback_data="nutrition_menu")],
-        [InlineKeyboardButton(text="🏃 Додати активність", callback_data="act:add")],
-        [InlineKeyboardButton(text="✅ Закрити день", callback_data="day:close")],
-        [InlineKeyboardButton(text="📊 Статистика", callback_data="stats")]
+        [InlineKeyboardButton(text="💪 Тренування", callback_data=cbs.pack("workout_today"))],
+        [InlineKeyboardButton(text="🍽 Харчування", callback_data=cbs.pack("nutrition_menu"))],
+        [InlineKeyboardButton(text="🏃 Додати активність", callback_data=cbs.pack("act:add"))],
+        [InlineKeyboardButton(text="✅ Закрити день", callback_data=cbs.pack("day:close"))],
+        [InlineKeyboardButton(text="📊 Статистика", callback_data=cbs.pack("stats"))],
+        [InlineKeyboardButton(text="⏰ Нагадування", callback_data=cbs.pack("rem:settings"))],
     ])
 
-def exercises_keyboard(date_str: str, day_key: str, uid: int):
-    done = user_progress.get(uid, {}).get(date_str, set())
+# Клавіатур на день небагато (2^кількість пунктів), тож готові markup кешуються
+# за (день, план, бітова маска виконаного). План — незмінний об'єкт з PlanStore, тож
+# після перезавантаження data.json ключі змінюються самі. Markup спільні — не змінювати!
+KEYBOARD_CACHE_SIZE = int(os.getenv("KEYBOARD_CACHE_SIZE", "4096"))
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def build_exercises_keyboard(day: int, plan: DayPlan, mask: int) -> InlineKeyboardMarkup:
     rows = []
-    for i, (exercise, reps) in enumerate(WORKOUTS[day_key]["exercises"]):
-        mark = "✅" if i in done else "⬜️"
+    for i, label in enumerate(plan.labels):
+        mark = "✅" if mask >> i & 1 else "⬜️"
         rows.append([InlineKeyboardButton(
-            text=f"{mark} {exercise} ({reps})",
-            callback_data=f"toggle:{date_str}:{day_key}:{i}"
+            text=f"{mark} {label}",
+            callback_data=cbs.pack("ex", day, plan.weekday, i)
         )])
-    rows.append([InlineKeyboardButton(text="⬅️ Назад", callback_data="back")])
+    rows.append([InlineKeyboardButton(text="⬅️ Назад", callback_data=cbs.pack("back"))])
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
-def rest_keyboard(date_str: str, uid: int):
-    done = user_rest.get(uid, {}).get(date_str, set())
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def build_rest_keyboard(day: int, checklist: Checklist, mask: int) -> InlineKeyboardMarkup:
     rows = []
-    for i, item in enumerate(REST_TODO):
-        mark = "✅" if i in done else "⬜️"
+    for i, item in enumerate(checklist.items):
+        mark = "✅" if mask >> i & 1 else "⬜️"
         rows.append([InlineKeyboardButton(
             text=f"{mark} {item}",
-            callback_data=f"rtoggle:{date_str}:{i}"
+            callback_data=cbs.pack("rest", day, i)
         )])
-    rows.append([InlineKeyboardButton(text="⬅️ Назад", callback_data="back")])
+    rows.append([InlineKeyboardButton(text="⬅️ Назад", callback_data=cbs.pack("back"))])
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
+def exercises_keyboard(day: int, plan: DayPlan, uid: int):
+    return build_exercises_keyboard(day, plan, get_day(uid, day).ex_mask)
+
+def rest_keyboard(day: int, uid: int):
+    return build_rest_keyboard(day, plans.for_user(uid).rest, get_day(uid, day).rest_mask)
+
 def nutrition_keyboard():
     return InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="➕ Додати прийом їжі", callback_data="nut:add_meal")],
-        [InlineKeyboardButton(text="🍗 Додати білок (г/день)", callback_data="nut:add_protein")],
-        [InlineKeyboardButton(text="➕ Додати калорії числом", callback_data="nut:add_kcal")],
-        [InlineKeyboardButton(text="🧮 Ввести підсумок калорій", callback_data="nut:add_total")],
-        [InlineKeyboardButton(text="📄 Показати записи сьогодні", callback_data="nut:show_today")],
-        [InlineKeyboardButton(text="⬅️ Назад", callback_data="back")]
+        [InlineKeyboardButton(text="➕ Додати прийом їжі", callback_data=cbs.pack("nut:add_meal"))],
+        [InlineKeyboardButton(text="🍗 Додати білок (г/день)", callback_data=cbs.pack("nut:add_protein"))],
+        [InlineKeyboardButton(text="➕ Додати калорії числом", callback_data=cbs.pack("nut:add_kcal"))],
+        [InlineKeyboardButton(text="🧮 Ввести підсумок калорій", callback_data=cbs.pack("nut:add_total"))],
+        [InlineKeyboardButton(text="📄 Показати записи сьогодні", callback_data=cbs.pack("nut:show_today"))],
+        [InlineKeyboardButton(text="⬅️ Назад", callback_data=cbs.pack("back"))]
     ])
 
 # ===== FSM =====
@@ -191,33 +298,38 @@ class AddActivity(StatesGroup):
 
 # ===== РЕНДЕР =====
 def render_workout_today(uid: int) -> tuple[str, InlineKeyboardMarkup]:
-    d = dt.date.today()
-    dstr = d.isoformat()
-    day_key = weekday_key_by_date(d)
-    if not day_key:
-        text = "<b>Rest Day</b>\nЛегкий день відновлення. Відмічай виконане 👇"
-        return text, rest_keyboard(dstr, uid)
-    title = WORKOUTS[day_key]["title"]
-    text = f"<b>{title}</b>\nОбирай вправи та відмічай виконане:"
-    return text, exercises_keyboard(dstr, day_key, uid)
+    d = user_today(uid)
+    day = d.toordinal()
+    plan = plans.for_user(uid).for_date(d)
+    if not plan.is_workout:
+        return plan.header, rest_keyboard(day, uid)
+    return plan.header, exercises_keyboard(day, plan, uid)
 
 def render_nutrition_today(uid: int) -> str:
-    dstr = today_str()
-    nd = ensure_day(uid, dstr)
-    meals = nd.get("meals", [])
-    protein = nd.get("protein_g", 0)
+    d = user_today(uid)
+    day = d.toordinal()
+    nd = get_day(uid, day)
+    text = day_texts.get("nutrition", uid, day, nd.version)
+    if text is None:
+        text = day_texts.put("nutrition", uid, day, nd.version, format_nutrition(d, nd))
+    return text
+
+def format_nutrition(d: dt.date, nd: DayRecord) -> str:
+    dstr = d.isoformat()
+    meals = nd.meals
+    protein = nd.protein or 0
     intake = calc_intake_kcal(nd)
     burned = calc_burned_kcal(nd)
     net = intake - burned
     if meals:
-        meals_lines = "\n".join([f"• {m['name']} — {m['kcal']} ккал" for m in meals])
+        meals_lines = "\n".join([f"• {html.escape(name)} — {kcal} ккал" for name, kcal in meals])
     else:
         meals_lines = "—"
-    acts = nd.get("activities", [])
-    acts_lines = "\n".join([f"• {a['name']} — {a['kcal']} ккал 🔥" for a in acts]) if acts else "—"
-    inc = nd.get("kcal_add", 0)
-    manual = nd.get("total_kcal_manual", None)
-    manual_str = f"{manual} ккал (введено вручну)" if isinstance(manual, int) else "—"
+    acts = nd.activities
+    acts_lines = "\n".join([f"• {html.escape(name)} — {kcal} ккал 🔥" for name, kcal in acts]) if acts else "—"
+    inc = nd.kcal_add
+    manual = nd.total_manual
+    manual_str = f"{manual} ккал (введено вручну)" if manual is not None else "—"
     return (
         f"🍽 <b>Харчування {dstr}</b>\n"
         f"{meals_lines}\n"
@@ -235,64 +347,225 @@ def render_nutrition_today(uid: int) -> str:
 # ===== /start =====
 @dp.message(CommandStart())
 async def start_handler(message: types.Message):
-    subscribers.add(message.from_user.id)
+    add_subscriber(message.from_user.id)
     await message.answer("Привіт! Обери дію:", reply_markup=main_menu())
 
+# ===== ЧАСОВИЙ ПОЯС =====
+@dp.message(Command("tz"))
+async def set_timezone(message: types.Message, command: CommandObject):
+    uid = message.from_user.id
+    tz = (command.args or "").strip()
+    if not tz:
+        await message.answer(
+            f"Твій часовий пояс: <b>{user_tz.get(uid, DEFAULT_TZ)}</b>\n"
+            f"Змінити: <code>/tz Europe/Warsaw</code>"
+        )
+        return
+    try:
+        ZoneInfo(tz)
+    except (ZoneInfoNotFoundError, ValueError):
+        await message.answer("Невідомий часовий пояс. Приклад: <code>/tz Europe/Kyiv</code>")
+        return
+    move_to_bucket(uid, tz)
+    user_tz[uid] = tz
+    storage.set_timezone(uid, tz)
+    reminders.reschedule(uid)
+    await message.answer(f"✅ Часовий пояс: <b>{tz}</b>", reply_markup=main_menu())
+
+# ===== ЕКСПОРТ ІСТОРІЇ =====
+@dp.message(Command("export"))
+async def export_history(message: types.Message, command: CommandObject):
+    uid = message.from_user.id
+    fmt = (command.args or "jsonl").strip().lower()
+    if fmt not in export.FORMATS:
+        await message.answer("Формат: <code>/export</code> (JSONL) або <code>/export csv</code>")
+        return
+    days = user_days.get(uid)
+    if not days:
+        await message.answer("Поки що немає записів для експорту.")
+        return
+    order = sorted(days)    # знімок ключів: файл генерується під час відправки
+
+    def rows():
+        for day in order:
+            yield uid, dt.date.fromordinal(day).isoformat(), json.dumps(get_day(uid, day).to_dict(), ensure_ascii=False)
+
+    doc = export.StreamInputFile(lambda: export.encode(rows(), fmt), filename=f"history_{uid}.{fmt}")
+    await message.answer_document(doc, caption=f"📦 Історія: {len(order)} дн.")
+
+# ===== СТАТИСТИКА ПО ВСІХ (адміни) =====
+# /admin_stats [днів] — агрегати по всіх користувачах (analytics.py). Результат кешується,
+# доки жоден день не змінився (storage.generation). generation бачить лише записи свого
+# процесу — зміни інших воркерів у спільній базі до нього не доходять, тож кеш ще й
+# живе не довше ADMIN_STATS_TTL секунд.
+ADMIN_IDS = {int(x) for x in os.getenv("ADMIN_IDS", "").replace(" ", "").split(",") if x}
+PROTEIN_TARGET = int(os.getenv("PROTEIN_TARGET", "120"))
+ADMIN_STATS_TTL = float(os.getenv("ADMIN_STATS_TTL", "300"))
+admin_stats_cache: dict[int, tuple[int, float, str]] = {}   # {вікно: (generation, час побудови, текст)}
+
+async def load_rollups() -> analytics.Rollups:
+    builder = analytics.RollupBuilder(plans.for_user)
+    if storage.backend.persistent:
+        # Після flush бекенд містить усе, включно з вивантаженими користувачами
+        await storage.flush()
+        await storage.read(lambda backend: builder.add_rows(backend.iter_days()))
+    else:
+        for i, (uid, days) in enumerate(list(user_days.items()), 1):
+            for day, r in list(days.items()):
+                builder.add(uid, day, r)
+            if i % 1000 == 0:
+                await asyncio.sleep(0)
+    return builder.build()
+
+@dp.message(Command("admin_stats"))
+async def admin_stats(message: types.Message, command: CommandObject):
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    arg = (command.args or "30").strip()
+    days = int(arg) if arg.isdigit() else 30
+    days = min(max(days, 1), 365)
+    generation = storage.generation
+    cached = admin_stats_cache.get(days)
+    if cached is None or cached[0] != generation or time.monotonic() - cached[1] > ADMIN_STATS_TTL:
+        rollups = await load_rollups()
+        today = dt.datetime.now(ZoneInfo(DEFAULT_TZ)).date().toordinal()
+        stats = await asyncio.to_thread(analytics.cohort_stats, rollups, today, days, PROTEIN_TARGET)
+        cached = admin_stats_cache[days] = (generation, time.monotonic(), stats.render())
+    await message.answer(cached[2])
+
 # ===== ТРЕНУВАННЯ / REST =====
-@dp.callback_query(F.data == "workout_today")
-async def workout_today(cb: types.CallbackQuery):
+# Клавіатура оновлюється відкладено й одним запитом на серію швидких кліків
+edits = EditCoalescer(delay=float(os.getenv("EDIT_COALESCE_DELAY", "0.4")))
+
+@cbs.action("workout_today")
+async def workout_today(cb: types.CallbackQuery, state: FSMContext):
     text, kb = render_workout_today(cb.from_user.id)
     await cb.message.answer(text, reply_markup=kb)
-    await cb.answer()
+    return cb.answer()
+
+# Кнопки до кодека: toggle:YYYY-MM-DD:day_key:index та rtoggle:YYYY-MM-DD:index
+@cbs.legacy("toggle")
+def legacy_toggle(parts: list[str]) -> Callback:
+    dstr, day_key, idx = parts
+    return Callback("ex", (dt.date.fromisoformat(dstr).toordinal(), WEEKDAYS.index(day_key), int(idx)))
 
-@dp.callback_query(F.data.startswith("toggle:"))
-async def toggle_exercise(cb: types.CallbackQuery):
-    # toggle:YYYY-MM-DD:day_key:index
-    _, dstr, day_key, idx = cb.data.split(":")
-    i = int(idx)
+@cbs.legacy("rtoggle")
+def legacy_rtoggle(parts: list[str]) -> Callback:
+    dstr, idx = parts
+    return Callback("rest", (dt.date.fromisoformat(dstr).toordinal(), int(idx)))
+
+@cbs.legacy("stats")
+def legacy_stats(parts: list[str]) -> Callback:
+    return Callback("stats", (int(parts[0]),))
+
+@cbs.action("ex")
+async def toggle_exercise(cb: types.CallbackQuery, state: FSMContext, day: int, plan: int, idx: int):
     uid = cb.from_user.id
-    user_progress.setdefault(uid, {}).setdefault(dstr, set())
-    if i in user_progress[uid][dstr]:
-        user_progress[uid][dstr].remove(i)
-    else:
-        user_progress[uid][dstr].add(i)
-    kb = exercises_keyboard(dstr, day_key, uid)
-    await cb.message.edit_reply_markup(reply_markup=kb)
-    await cb.answer("Оновлено ✅")
-
-@dp.callback_query(F.data.startswith("rtoggle:"))
-async def toggle_rest(cb: types.CallbackQuery):
-    # rtoggle:YYYY-MM-DD:index
-    _, dstr, idx = cb.data.split(":")
-    i = int(idx)
+    days = plans.for_user(uid).days
+    if not callback_day_ok(uid, day) or plan >= len(days) or idx >= len(days[plan].exercises):
+        return cb.answer("Кнопка застаріла — відкрий меню ще раз")
+    ensure_day(uid, day).toggle_ex(idx)
+    touch_day(uid, day)
+    # План беремо в момент рендеру — якщо data.json оновився, клавіатура буде вже нова
+    edits.schedule(cb.message, lambda: exercises_keyboard(day, plans.for_user(uid).days[plan], uid))
+    return cb.answer("Оновлено ✅")
+
+@cbs.action("rest")
+async def toggle_rest(cb: types.CallbackQuery, state: FSMContext, day: int, idx: int):
     uid = cb.from_user.id
-    user_rest.setdefault(uid, {}).setdefault(dstr, set())
-    if i in user_rest[uid][dstr]:
-        user_rest[uid][dstr].remove(i)
-    else:
-        user_rest[uid][dstr].add(i)
-    kb = rest_keyboard(dstr, uid)
-    await cb.message.edit_reply_markup(reply_markup=kb)
-    await cb.answer("Оновлено ✅")
+    if not callback_day_ok(uid, day) or idx >= len(plans.for_user(uid).rest.items):
+        return cb.answer("Кнопка застаріла — відкрий меню ще раз")
+    ensure_day(uid, day).toggle_rest(idx)
+    touch_day(uid, day)
+    edits.schedule(cb.message, lambda: rest_keyboard(day, uid))
+    return cb.answer("Оновлено ✅")
 
 # ===== ХАРЧУВАННЯ =====
-@dp.callback_query(F.data == "nutrition_menu")
-async def nutrition_menu(cb: types.CallbackQuery):
+@cbs.action("nutrition_menu")
+async def nutrition_menu(cb: types.CallbackQuery, state: FSMContext):
     await cb.message.answer(render_nutrition_today(cb.from_user.id), reply_markup=nutrition_keyboard())
-    await cb.answer()
+    return cb.answer()
 
-@dp.callback_query(F.data == "nut:show_today")
-async def nutrition_show_today(cb: types.CallbackQuery):
+@cbs.action("nut:show_today")
+async def nutrition_show_today(cb: types.CallbackQuery, state: FSMContext):
     await cb.message.answer(render_nutrition_today(cb.from_user.id), reply_markup=nutrition_keyboard())
-    await cb.answer()
+    return cb.answer()
+
+# ----- Автодоповнення страв: історія користувача + foods.json -----
+def meal_history(uid: int):
+    days = user_days.get(uid, {})
+    for day in sorted(days):
+        yield from days[day].meals or ()
+
+meals_ac = MealSuggester(
+    meal_history,
+    load_foods(os.getenv("FOODS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "foods.json"))),
+    capacity=int(os.getenv("MEAL_INDEX_USERS", "2000")),
+)
+MEAL_SUGGESTIONS = 6
+
+def meal_suggestions_keyboard(uid: int, query: str = "") -> InlineKeyboardMarkup:
+    rows = [
+        [InlineKeyboardButton(text=f"{f.name} — {f.kcal} ккал", callback_data=cbs.pack("meal", f.key, f.kcal))]
+        for f in meals_ac.suggest(uid, query, MEAL_SUGGESTIONS)
+    ]
+    rows.append([InlineKeyboardButton(text="🔎 Пошук страви", switch_inline_query_current_chat=query)])
+    rows.append([InlineKeyboardButton(text="⬅️ Скасувати", callback_data=cbs.pack("back"))])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+def add_meal_today(uid: int, name: str, kcal: int) -> None:
+    day = today_day(uid)
+    ensure_day(uid, day).add_meal(name, kcal)
+    touch_day(uid, day)
+    meals_ac.note(uid, name, kcal)
 
 # Додати прийом їжі (назва + ккал)
-@dp.callback_query(F.data == "nut:add_meal")
+@cbs.action("nut:add_meal")
 async def nut_add_meal(cb: types.CallbackQuery, state: FSMContext):
     await state.set_state(AddMeal.waiting_name)
     await state.update_data(tmp_meal={})
-    await cb.message.answer("Введи <b>назву страви</b>:", reply_markup=InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="⬅️ Скасувати", callback_data="back")]]))
-    await cb.answer()
+    await cb.message.answer(
+        "Введи <b>назву страви</b> або обери з частих:",
+        reply_markup=meal_suggestions_keyboard(cb.from_user.id),
+    )
+    return cb.answer()
+
+# Один тап: назва й калорії з підказки
+@cbs.action("meal")
+async def meal_pick(cb: types.CallbackQuery, state: FSMContext, key: int, kcal: int):
+    uid = cb.from_user.id
+    food = meals_ac.resolve(uid, key)
+    if food is None:
+        return cb.answer("Кнопка застаріла — відкрий меню ще раз")
+    add_meal_today(uid, food.name, kcal)
+    await state.clear()
+    await cb.message.answer(f"✅ Додано: <b>{html.escape(food.name)}</b> — {kcal} ккал", reply_markup=nutrition_keyboard())
+    return cb.answer()
+
+# Inline-режим (@bot омлет): результат надсилає в чат "🍽 назва — N ккал", бот його записує
+INLINE_MEAL_RE = re.compile(r"^🍽 (.+) — (\d+) ккал$")
+
+@dp.inline_query()
+async def meal_inline(query: types.InlineQuery):
+    results = [
+        InlineQueryResultArticle(
+            id=f"{f.key}:{f.kcal}",
+            title=f.name,
+            description=f"{f.kcal} ккал",
+            input_message_content=InputTextMessageContent(message_text=f"🍽 {f.name} — {f.kcal} ккал", parse_mode=None),
+        )
+        for f in meals_ac.suggest(query.from_user.id, query.query, 20)
+    ]
+    return query.answer(results, cache_time=0, is_personal=True)
+
+@dp.message(F.via_bot, F.text.regexp(INLINE_MEAL_RE))
+async def meal_from_inline(msg: types.Message, state: FSMContext):
+    if msg.via_bot.id != bot.id:
+        return
+    name, kcal = INLINE_MEAL_RE.match(msg.text).groups()
+    add_meal_today(msg.from_user.id, name, int(kcal))
+    await state.clear()
+    await msg.answer(f"✅ Додано: <b>{html.escape(name)}</b> — {kcal} ккал", reply_markup=nutrition_keyboard())
 
 @dp.message(AddMeal.waiting_name)
 async def nut_meal_got_name(msg: types.Message, state: FSMContext):
@@ -300,6 +573,13 @@ async def nut_meal_got_name(msg: types.Message, state: FSMContext):
     tmp["name"] = msg.text.strip()
     await state.update_data(tmp_meal=tmp)
     await state.set_state(AddMeal.waiting_kcal)
+    uid = msg.from_user.id
+    if meals_ac.suggest(uid, tmp["name"], 1):
+        await msg.answer(
+            "Тепер введи <b>калорії</b> цієї страви числом (наприклад: 360) або обери схожу:",
+            reply_markup=meal_suggestions_keyboard(uid, tmp["name"]),
+        )
+        return
     await msg.answer("Тепер введи <b>калорії</b> цієї страви числом (наприклад: 360):")
 
 @dp.message(AddMeal.waiting_kcal)
@@ -310,20 +590,18 @@ async def nut_meal_got_kcal(msg: types.Message, state: FSMContext):
         return
     kcal = int(float(text))
     uid = msg.from_user.id
-    dstr = today_str()
     data = await state.get_data()
     name = data.get("tmp_meal", {}).get("name", "Без назви")
-    nd = ensure_day(uid, dstr)
-    nd["meals"].append({"name": name, "kcal": kcal})
+    add_meal_today(uid, name, kcal)
     await state.clear()
-    await msg.answer(f"✅ Додано: <b>{name}</b> — {kcal} ккал", reply_markup=nutrition_keyboard())
+    await msg.answer(f"✅ Додано: <b>{html.escape(name)}</b> — {kcal} ккал", reply_markup=nutrition_keyboard())
 
 # Додати білок (г)
-@dp.callback_query(F.data == "nut:add_protein")
+@cbs.action("nut:add_protein")
 async def nut_add_protein(cb: types.CallbackQuery, state: FSMContext):
     await state.set_state(AddProtein.waiting_value)
-    await cb.message.answer("Введи <b>загальний білок за день</b> у грамах (наприклад: 150):", reply_markup=InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="⬅️ Скасувати", callback_data="back")]]))
-    await cb.answer()
+    await cb.message.answer("Введи <b>загальний білок за день</b> у грамах (наприклад: 150):", reply_markup=InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="⬅️ Скасувати", callback_data=cbs.pack("back"))]]))
+    return cb.answer()
 
 @dp.message(AddProtein.waiting_value)
 async def nut_protein_value(msg: types.Message, state: FSMContext):
@@ -333,18 +611,18 @@ async def nut_protein_value(msg: types.Message, state: FSMContext):
         return
     grams = int(v)
     uid = msg.from_user.id
-    dstr = today_str()
-    nd = ensure_day(uid, dstr)
-    nd["protein_g"] = grams
+    day = today_day(uid)
+    ensure_day(uid, day).protein = grams
+    touch_day(uid, day)
     await state.clear()
     await msg.answer(f"✅ Записано білок: {grams} г", reply_markup=nutrition_keyboard())
 
 # Додати калорії числом (ручний інкремент)
-@dp.callback_query(F.data == "nut:add_kcal")
+@cbs.action("nut:add_kcal")
 async def nut_add_kcal(cb: types.CallbackQuery, state: FSMContext):
     await state.set_state(AddKcal.waiting_value)
-    await cb.message.answer("Введи число калорій (можна з «+» або «-», напр. <b>+360</b> або <b>-120</b>):", reply_markup=InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="⬅️ Скасувати", callback_data="back")]]))
-    await cb.answer()
+    await cb.message.answer("Введи число калорій (можна з «+» або «-», напр. <b>+360</b> або <b>-120</b>):", reply_markup=InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="⬅️ Скасувати", callback_data=cbs.pack("back"))]]))
+    return cb.answer()
 
 @dp.message(AddKcal.waiting_value)
 async def nut_kcal_value(msg: types.Message, state: FSMContext):
@@ -360,18 +638,18 @@ async def nut_kcal_value(msg: types.Message, state: FSMContext):
         return
     delta = int(float(raw)) * sign
     uid = msg.from_user.id
-    dstr = today_str()
-    nd = ensure_day(uid, dstr)
-    nd["kcal_add"] = int(nd.get("kcal_add", 0)) + delta
+    day = today_day(uid)
+    ensure_day(uid, day).kcal_add += delta
+    touch_day(uid, day)
     await state.clear()
     await msg.answer(f"✅ Зміна калорій: {('+' if delta>=0 else '')}{delta} ккал", reply_markup=nutrition_keyboard())
 
 # Ввести підсумок калорій вручну
-@dp.callback_query(F.data == "nut:add_total")
+@cbs.action("nut:add_total")
 async def nut_add_total(cb: types.CallbackQuery, state: FSMContext):
     await state.set_state(AddTotal.waiting_value)
-    await cb.message.answer("Введи <b>підсумок калорій за день</b> (числом, напр. 1650):", reply_markup=InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="⬅️ Скасувати", callback_data="back")]]))
-    await cb.answer()
+    await cb.message.answer("Введи <b>підсумок калорій за день</b> (числом, напр. 1650):", reply_markup=InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="⬅️ Скасувати", callback_data=cbs.pack("back"))]]))
+    return cb.answer()
 
 @dp.message(AddTotal.waiting_value)
 async def nut_total_value(msg: types.Message, state: FSMContext):
@@ -381,18 +659,18 @@ async def nut_total_value(msg: types.Message, state: FSMContext):
         return
     total = int(float(v))
     uid = msg.from_user.id
-    dstr = today_str()
-    nd = ensure_day(uid, dstr)
-    nd["total_kcal_manual"] = total
+    day = today_day(uid)
+    ensure_day(uid, day).total_manual = total
+    touch_day(uid, day)
     await state.clear()
     await msg.answer(f"✅ Підсумок дня: {total} ккал", reply_markup=nutrition_keyboard())
 
 # ===== АКТИВНОСТІ (ручний ввід назви + спалені ккал) =====
-@dp.callback_query(F.data == "act:add")
+@cbs.action("act:add")
 async def act_add(cb: types.CallbackQuery, state: FSMContext):
     await state.set_state(AddActivity.waiting_name)
-    await cb.message.answer("Введи <b>назву активності</b> (напр. «Біг 5 км»):", reply_markup=InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="⬅️ Скасувати", callback_data="back")]]))
-    await cb.answer()
+    await cb.message.answer("Введи <b>назву активності</b> (напр. «Біг 5 км»):", reply_markup=InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="⬅️ Скасувати", callback_data=cbs.pack("back"))]]))
+    return cb.answer()
 
 @dp.message(AddActivity.waiting_name)
 async def act_got_name(msg: types.Message, state: FSMContext):
@@ -408,66 +686,177 @@ async def act_got_kcal(msg: types.Message, state: FSMContext):
         return
     kcal = int(float(v))
     uid = msg.from_user.id
-    dstr = today_str()
-    nd = ensure_day(uid, dstr)
     name = (await state.get_data()).get("act_name", "Активність")
-    nd["activities"].append({"name": name, "kcal": kcal})
-    nd["burned_kcal"] = int(nd.get("burned_kcal", 0)) + kcal
+    day = today_day(uid)
+    ensure_day(uid, day).add_activity(name, kcal)
+    touch_day(uid, day)
     await state.clear()
-    await msg.answer(f"✅ Додано активність: <b>{name}</b> — {kcal} ккал 🔥", reply_markup=main_menu())
+    await msg.answer(f"✅ Додано активність: <b>{html.escape(name)}</b> — {kcal} ккал 🔥", reply_markup=main_menu())
+
+# ===== ШВИДКИЙ ВВІД: "омлет 360; гречка 200; протеїн 120 б30", "біг 5 км 300" =====
+# Будь-який текст поза діалогами розбирається quickentry; усе записується одним оновленням
+# дня й підтверджується одним повідомленням з кнопкою скасування.
+def quick_kcal(uid: int, name: str) -> int | None:
+    # Страва без калорій — лише точний збіг з історії/foods.json. Схожі за префіксом не беремо:
+    # випадкове "я" чи "п" записало б чиюсь страву з реальними калоріями
+    food = meals_ac.resolve(uid, food_key(name))
+    return food.kcal if food else None
+
+@dp.message(StateFilter(None), F.text, ~F.text.startswith("/"))
+async def quick_entry(msg: types.Message):
+    uid = msg.from_user.id
+    try:
+        items = quickentry.parse(msg.text)
+    except quickentry.ParseError as e:
+        await msg.answer(
+            f"Не зрозумів: <b>{html.escape(e.args[0])}</b>\n"
+            "Формат: <code>омлет 360; гречка 200; протеїн 120 б30</code> або <code>біг 5 км 300</code>",
+            reply_markup=main_menu(),
+        )
+        return
+    for item in items:
+        if item.kind == "meal" and item.kcal is None:
+            item.kcal = quick_kcal(uid, item.name)
+            if item.kcal is None:
+                await msg.answer(
+                    f"Не знаю калорій для <b>{html.escape(item.name)}</b> — допиши число, "
+                    f"напр. <code>{html.escape(item.name.lower())} 300</code>\n"
+                    "Формат: <code>омлет 360; гречка 200; протеїн 120 б30</code> або <code>біг 5 км 300</code>",
+                    reply_markup=main_menu(),
+                )
+                return
+    if not items:
+        return
 
-# ===== ЗАКРИТИ ДЕНЬ =====
-@dp.callback_query(F.data == "day:close")
-async def close_day(cb: types.CallbackQuery):
-    uid = cb.from_user.id
-    d = dt.date.today()
-    dstr = d.isoformat()
-    nd = ensure_day(uid, dstr)
+    day = today_day(uid)
+    nd = ensure_day(uid, day)
+    meals_from = len(nd.meals or ())
+    acts_from = len(nd.activities or ())
+    protein = 0
+    lines = []
+    for item in items:
+        if item.kind == "meal":
+            nd.add_meal(item.name, item.kcal)
+            meals_ac.note(uid, item.name, item.kcal)
+            lines.append(f"🍽 {html.escape(item.name)} — {item.kcal} ккал" + (f", білок {item.protein} г" if item.protein else ""))
+        elif item.kind == "activity":
+            nd.add_activity(item.name, item.kcal)
+            lines.append(f"🔥 {html.escape(item.name)} — {item.kcal} ккал")
+        else:
+            lines.append(f"🍗 Білок +{item.protein} г")
+        protein += item.protein
+    if protein:
+        nd.protein = (nd.protein or 0) + protein
+    touch_day(uid, day)
+
+    meals_to, acts_to = len(nd.meals or ()), len(nd.activities or ())
+    undo = cbs.pack(
+        "quick:undo", day, meals_from, meals_to, acts_from, acts_to, protein, nd.protein or 0,
+        quick_digest(nd, meals_from, meals_to, acts_from, acts_to),
+    )
+    await msg.answer(
+        "✅ Записано:\n" + "\n".join(lines) + f"\n\nЗа день: 🍽 {calc_intake_kcal(nd)} | 🔥 {calc_burned_kcal(nd)} ккал",
+        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+            [InlineKeyboardButton(text="↩️ Скасувати", callback_data=undo)],
+            [InlineKeyboardButton(text="⬅️ Меню", callback_data=cbs.pack("back"))],
+        ]),
+    )
 
-    # Перевірки
-    intake = calc_intake_kcal(nd)
-    protein = nd.get("protein_g", None)
-    day_key = weekday_key_by_date(d)
+def quick_digest(nd: DayRecord, meals_from: int, meals_to: int, acts_from: int, acts_to: int) -> int:
+    # Відбиток саме записаних позицій: скасування перевіряє, що на цих місцях досі вони
+    meals = (nd.meals or [])[meals_from:meals_to]
+    acts = (nd.activities or [])[acts_from:acts_to]
+    return zlib.crc32(json.dumps([meals, acts], ensure_ascii=False).encode())
+
+@cbs.action("quick:undo")
+async def quick_undo(
+    cb: types.CallbackQuery, state: FSMContext, day: int, meals_from: int, meals_to: int,
+    acts_from: int, acts_to: int, protein: int, protein_after: int, digest: int,
+):
+    uid = cb.from_user.id
+    nd = user_days.get(uid, {}).get(day)
+    if nd is None or not callback_day_ok(uid, day):
+        # Без запису дня скасовувати нічого; спільний EMPTY_DAY змінювати не можна
+        return cb.answer("Кнопка застаріла — відкрий меню ще раз")
+    # Скасовуємо лише незмінений запис: ті самі страви/активності на тих самих місцях
+    # і білок, якого відтоді ніхто не чіпав (міг бути введений заново числом)
+    if (
+        len(nd.meals or ()) < meals_to or len(nd.activities or ()) < acts_to
+        or quick_digest(nd, meals_from, meals_to, acts_from, acts_to) != digest
+        or (protein and (nd.protein or 0) != protein_after)
+    ):
+        return cb.answer("Вже скасовано")
+    if meals_to > meals_from:
+        nd.drop_meals(meals_from, meals_to)
+    if acts_to > acts_from:
+        nd.drop_activities(acts_from, acts_to)
+    if protein:
+        nd.protein = nd.protein - protein if nd.protein > protein else None
+    touch_day(uid, day)
+    await cb.message.edit_text("↩️ Скасовано", reply_markup=main_menu())
+    return cb.answer()
 
-    missing = []
-    if intake == 0:
-        missing.append("калорії")
-    if not isinstance(protein, int) or protein <= 0:
-        missing.append("білок")
-    if day_key:
-        total_ex = len(WORKOUTS[day_key]["exercises"])
-        done_ex = len(user_progress.get(uid, {}).get(dstr, set()))
-        if done_ex == 0:
-            missing.append("тренування")
-    else:
-        done_cnt = len(user_rest.get(uid, {}).get(dstr, set()))
-        if done_cnt == 0:
-            missing.append("rest‑чекліст")
+# ===== ЗАКРИТИ ДЕНЬ =====
+@cbs.action("day:close")
+async def close_day(cb: types.CallbackQuery, state: FSMContext):
+    uid = cb.from_user.id
+    d = user_today(uid)
+    day = d.toordinal()
+    nd = ensure_day(uid, day)
+
+    # Повторне закриття без змін не чіпає запис — текст береться з кешу.
+    # Список відсутнього залежить ще й від плану, тому входить у відмітку разом з версією
+    missing = tuple(day_missing(uid, d, nd))
+    status = "INCOMPLETE" if missing else "OK"
+    if nd.status != status:
+        nd.status = status
+        touch_day(uid, day)
+    stamp = (nd.version, missing)
+    text = day_texts.get("close", uid, day, stamp)
+    if text is None:
+        text = day_texts.put("close", uid, day, stamp, format_close_day(nd, missing))
+    await cb.message.answer(text, reply_markup=main_menu())
+    return cb.answer()
 
+def format_close_day(nd: DayRecord, missing: tuple[str, ...]) -> str:
     if missing:
-        nd["day_status"] = "INCOMPLETE"
-        nd["closed"] = True
         text = "🔒 День закрито з статусом: <b>НЕПОВНИЙ</b>\nНе вистачає: " + ", ".join(missing)
     else:
-        nd["day_status"] = "OK"
-        nd["closed"] = True
         text = "✅ День закрито: <b>OK</b>. Красиво!"
-
     intake = calc_intake_kcal(nd)
     burned = calc_burned_kcal(nd)
-    net = intake - burned
-    text += f"\n\nПідсумок: 🍽 {intake} | 🔥 {burned} | ⚖️ {net} ккал"
-    await cb.message.answer(text, reply_markup=main_menu())
-    await cb.answer()
+    return text + f"\n\nПідсумок: 🍽 {intake} | 🔥 {burned} | ⚖️ {intake - burned} ккал"
 
-# ===== СТАТИСТИКА (14 днів) =====
-@dp.callback_query(F.data == "stats")
-async def show_statistics(cb: types.CallbackQuery):
-    uid = cb.from_user.id
-    today = dt.date.today()
-    start = today - dt.timedelta(days=13)
+# ===== СТАТИСТИКА (7–365 днів) =====
+STATS_WINDOWS = (7, 14, 30, 90, 365)
+STATS_DAILY_LINES_MAX = 14      # довші вікна — лише підсумок, щоб вміститись у повідомлення
+
+def stats_keyboard(days: int):
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=(f"· {w}д ·" if w == days else f"{w}д"), callback_data=cbs.pack("stats", w)) for w in STATS_WINDOWS],
+        [InlineKeyboardButton(text="⬅️ Назад", callback_data=cbs.pack("back"))]
+    ])
 
-    lines = ["📊 <b>Статистика (ост. 14 днів)</b>"]
+def ok_streak(days: dict[int, DayRecord], today: int) -> int:
+    # Поточна серія днів, закритих з OK; сьогоднішній ще відкритий день серію не рве
+    day = today
+    if days.get(day, EMPTY_DAY).status != "OK":
+        day -= 1
+    streak = 0
+    while days.get(day, EMPTY_DAY).status == "OK":
+        streak += 1
+        day -= 1
+    return streak
+
+def render_statistics(uid: int, days: int) -> str:
+    today = user_today(uid)
+    start = today - dt.timedelta(days=days - 1)
+    records = user_days.get(uid, {})
+    daily = days <= STATS_DAILY_LINES_MAX
+    plan_set = plans.for_user(uid)
+    rest_total = len(plan_set.rest.items)
+
+    lines = [f"📊 <b>Статистика (ост. {days} днів)</b>"]
     sessions_done = 0
     sessions_total = 0
     rest_done_days = 0
@@ -477,18 +866,20 @@ async def show_statistics(cb: types.CallbackQuery):
     kcal_burn_sum = 0
     days_for_intake = 0
     days_for_burn = 0
-
-    for i in range(14):
+    protein_sum = 0
+    days_for_protein = 0
+    ok_days = 0
+    closed_days = 0
+    best_streak = 0
+    streak = 0
+
+    for i in range(days):
         day = start + dt.timedelta(days=i)
-        dstr = day.isoformat()
-        dshort = weekday_short_ua(day)
-        day_key = weekday_key_by_date(day)
-
-        nd = user_nutrition.get(uid, {}).get(dstr, {})
-        intake = calc_intake_kcal(nd) if nd else 0
-        burned = calc_burned_kcal(nd) if nd else 0
-        net = intake - burned
-        status = nd.get("day_status") if nd else None
+        workout = plan_set.workout(day)
+        r = records.get(day.toordinal(), EMPTY_DAY)
+        intake = calc_intake_kcal(r)
+        burned = calc_burned_kcal(r)
+        cardio_cnt = len(r.cardio) if r.cardio else 0
 
         if intake:
             kcal_intake_sum += intake
@@ -496,24 +887,37 @@ async def show_statistics(cb: types.CallbackQuery):
         if burned:
             kcal_burn_sum += burned
             days_for_burn += 1
-
-        cardio_cnt = len(user_cardio.get(uid, {}).get(dstr, []))
+        if r.protein:
+            protein_sum += r.protein
+            days_for_protein += 1
         cardio_total += cardio_cnt
+        if r.status:
+            closed_days += 1
+        if r.status == "OK":
+            ok_days += 1
+            streak += 1
+            best_streak = max(best_streak, streak)
+        else:
+            streak = 0
 
-        if day_key:
-            total_ex = len(WORKOUTS[day_key]["exercises"])
-            done_ex = len(user_progress.get(uid, {}).get(dstr, set()))
-            if total_ex > 0:
-                sessions_total += 1
-                if done_ex == total_ex:
-                    sessions_done += 1
-            line = f"{dshort} {dstr} — {WORKOUTS[day_key]['title']} | {done_ex}/{total_ex}"
+        if workout:
+            total_ex = len(workout.exercises)
+            sessions_total += 1
+            if r.ex_done == total_ex:
+                sessions_done += 1
         else:
             rest_total_days += 1
-            done_cnt = len(user_rest.get(uid, {}).get(dstr, set()))
-            if done_cnt == len(REST_TODO) and len(REST_TODO) > 0:
+            if r.rest_done == rest_total and rest_total > 0:
                 rest_done_days += 1
-            line = f"{dshort} {dstr} — Rest Day | {done_cnt}/{len(REST_TODO)}"
+
+        if not daily:
+            continue
+        dstr = day.isoformat()
+        dshort = weekday_short_ua(day)
+        if workout:
+            line = f"{dshort} {dstr} — {workout.title} | {r.ex_done}/{total_ex}"
+        else:
+            line = f"{dshort} {dstr} — Rest Day | {r.rest_done}/{rest_total}"
 
         # Додаткові показники
         if cardio_cnt:
@@ -523,9 +927,9 @@ async def show_statistics(cb: types.CallbackQuery):
         if burned:
             line += f" | 🔥 {burned}"
         if intake or burned:
-            line += f" | ⚖️ {net}"
-        if status:
-            line += f" | Статус: {('OK' if status=='OK' else 'НЕПОВНИЙ')}"
+            line += f" | ⚖️ {intake - burned}"
+        if r.status:
+            line += f" | Статус: {('OK' if r.status=='OK' else 'НЕПОВНИЙ')}"
 
         lines.append(line)
 
@@ -534,43 +938,323 @@ async def show_statistics(cb: types.CallbackQuery):
     avg_burn = f"{(kcal_burn_sum / days_for_burn):.0f}" if days_for_burn else "—"
     avg_net = (kcal_intake_sum - kcal_burn_sum)
     avg_net = f"{(avg_net / max(1, max(days_for_intake, days_for_burn))):.0f}"
+    avg_protein = f"{(protein_sum / days_for_protein):.0f}" if days_for_protein else "—"
 
-    lines.append("\n<b>Підсумок за 14 днів</b>")
+    lines.append(f"\n<b>Підсумок за {days} днів</b>")
     lines.append(f"• Повністю виконаних тренувань: {sessions_done}/{sessions_total} ({rate})")
     lines.append(f"• Rest Days повністю закриті: {rest_done_days}/{rest_total_days}")
     lines.append(f"• Середній інтейк/день: {avg_intake} ккал")
     lines.append(f"• Середнє спалено/день: {avg_burn} ккал")
     lines.append(f"• Середнє нетто/день: {avg_net} ккал")
+    lines.append(f"• Середній білок/день: {avg_protein} г")
+    if cardio_total:
+        lines.append(f"• Активностей: {cardio_total}")
+    lines.append(f"• Дні з OK: {ok_days}/{closed_days} закритих")
+    lines.append(f"• Серія OK: {ok_streak(records, today.toordinal())} (найкраща за період: {best_streak})")
+    return "\n".join(lines)
+
+@cbs.action("stats")
+async def show_statistics(cb: types.CallbackQuery, state: FSMContext, days: int = 14):
+    if days not in STATS_WINDOWS:
+        days = 14
+    uid = cb.from_user.id
+    if CHARTS_ENABLED:
+        await send_chart(cb.message, chart_data(uid, days))
+    await cb.message.answer(render_statistics(uid, days), reply_markup=stats_keyboard(days))
+    return cb.answer()
+
+# ----- Графік до статистики (charts.py): малюється в пулі процесів, повтори — за file_id -----
+CHARTS_ENABLED = os.getenv("CHARTS_ENABLED", "1") == "1"
+charts = ChartRenderer(workers=int(os.getenv("CHART_WORKERS", "1")))
+
+def chart_data(uid: int, days: int) -> ChartData:
+    today = user_today(uid)
+    start = today - dt.timedelta(days=days - 1)
+    records = user_days.get(uid, {})
+    plan_set = plans.for_user(uid)
+    rest_total = len(plan_set.rest.items)
+    points = []
+    for i in range(days):
+        d = start + dt.timedelta(days=i)
+        r = records.get(d.toordinal(), EMPTY_DAY)
+        plan = plan_set.for_date(d)
+        if plan.is_workout:
+            done = r.ex_done / len(plan.exercises)
+        else:
+            done = r.rest_done / rest_total if rest_total else 0.0
+        points.append(ChartDay(d.toordinal(), calc_intake_kcal(r), calc_burned_kcal(r), r.protein or 0, min(done, 1.0), plan.is_workout))
+    return ChartData(f"Останні {days} днів", tuple(points))
+
+async def send_chart(message: types.Message, data: ChartData) -> None:
+    try:
+        key, photo = await charts.photo(data)
+        sent = await message.answer_photo(photo)
+    except Exception:
+        # Графік — доповнення: без нього статистика все одно надсилається
+        logging.exception("Chart failed")
+        return
+    charts.remember(key, sent)
 
-    await cb.message.answer("\n".join(lines), reply_markup=main_menu())
-    await cb.answer()
-
-# ===== ЩОДЕННИЙ ПІНГ 21:30 =====
-async def daily_nutrition_ping():
-    text = (
-        "⏰ <b>Кінець дня</b>\n"
-        "Скинь, будь ласка, що їв сьогодні та калорії/білок.\n"
-        "Можеш додати прийоми їжі, ручні калорії або активності тут:"
+# ===== ЩОДЕННИЙ ПІНГ 21:30 (окремо для кожного часового поясу) =====
+def schedule_bucket(tz: str) -> None:
+    scheduler.add_job(
+        job("nutrition_ping", daily_nutrition_ping), "cron", hour=21, minute=30, timezone=ZoneInfo(tz),
+        args=[tz], id=f"ping:{tz}", replace_existing=True,
     )
-    for uid in list(subscribers):
-        try:
-            await bot.send_message(uid, text, reply_markup=nutrition_keyboard())
-        except Exception:
-            pass
 
+def bucket_add(uid: int, tz: str) -> None:
+    bucket = tz_buckets.get(tz)
+    if bucket is None:
+        bucket = tz_buckets[tz] = set()
+        schedule_bucket(tz)
+    bucket.add(uid)
+
+def bucket_remove(uid: int, tz: str) -> None:
+    bucket = tz_buckets.get(tz)
+    if bucket is None:
+        return
+    bucket.discard(uid)
+    if not bucket:
+        del tz_buckets[tz]
+        scheduler.remove_job(f"ping:{tz}")
+
+def move_to_bucket(uid: int, tz: str) -> None:
+    if uid in subscribers:
+        bucket_remove(uid, user_tz.get(uid, DEFAULT_TZ))
+        bucket_add(uid, tz)
+
+def add_subscriber(uid: int) -> None:
+    if uid not in subscribers:
+        subscribers.add(uid)
+        bucket_add(uid, user_tz.get(uid, DEFAULT_TZ))
+    storage.subscribe(uid)
+
+def drop_subscriber(uid: int) -> None:
+    # Користувач заблокував бота (403) — більше не пінгуємо
+    if uid in subscribers:
+        subscribers.discard(uid)
+        bucket_remove(uid, user_tz.get(uid, DEFAULT_TZ))
+    storage.unsubscribe(uid)
+    reminders.forget(uid)
+
+# BROADCAST_RATE — ліміт на всього бота: кожен воркер розсилає своїм користувачам (owns_user)
+# зі своїм відром токенів, тож у режимі воркерів ліміт ділиться між ними порівну
+broadcaster = Broadcaster(
+    bot,
+    rate=float(os.getenv("BROADCAST_RATE", "25")) / WEB_WORKERS,
+    concurrency=int(os.getenv("BROADCAST_CONCURRENCY", "20")),
+    on_blocked=drop_subscriber,
+)
+
+def ping_text(missing: tuple[str, ...]) -> str:
+    text = "⏰ <b>Кінець дня</b>\nЩе не внесено: " + ", ".join(missing) + "."
+    if "калорії" in missing or "білок" in missing:
+        return text + "\nМожеш додати прийоми їжі, ручні калорії або білок тут:"
+    return text + "\nВідміть виконане й закрий день у меню:"
+
+async def daily_nutrition_ping(tz: str = DEFAULT_TZ):
+    d = dt.datetime.now(ZoneInfo(tz)).date()
+    day = d.toordinal()
+    for old in [k for k in settled_days if k < day - 1]:
+        del settled_days[old]
+    # Закриті/повні дні відсіює індекс; решту перевіряємо тими ж правилами, що й day:close
+    pending = tz_buckets.get(tz, set()) - settled_days.get(day, set())
+    cold = {uid for uid in pending if not storage.is_loaded(uid)}
+    stored = await storage.load_day_rows(day, cold) if cold else {}
+    groups: dict[tuple[str, ...], list[int]] = {}
+    for uid in pending:
+        if uid in cold:
+            nd = DayRecord.from_dict(stored[uid]) if uid in stored else EMPTY_DAY
+        else:
+            nd = get_day(uid, day)
+        if nd.closed:
+            continue
+        missing = day_missing(uid, d, nd)
+        if missing:
+            groups.setdefault(tuple(missing), []).append(uid)
+    to_send = sum(map(len, groups.values()))
+    logging.info("Nutrition ping %s: %s to send, %s settled", tz, to_send, len(tz_buckets.get(tz, ())) - to_send)
+    await asyncio.gather(*(
+        broadcaster.run(
+            chat_ids, ping_text(missing), label=f"nutrition_ping:{tz}:{'+'.join(missing)}",
+            reply_markup=nutrition_keyboard() if {"калорії", "білок"} & set(missing) else main_menu(),
+        )
+        for missing, chat_ids in groups.items()
+    ))
+
+# ===== НАГАДУВАННЯ ЗА ПЛАНОМ (час їжі й тренування з data.json, за бажанням) =====
+# Одна купа найближчих нагадувань на воркер (див. reminders.py), розсилка — через broadcaster
+REMINDER_SNOOZE = (15, 60)                  # хвилин, кнопки під нагадуванням
+
+def reminder_keyboard() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [
+            InlineKeyboardButton(text=f"⏰ +{m} хв" if m < 60 else f"⏰ +{m // 60} год", callback_data=cbs.pack("rem:snooze", m))
+            for m in REMINDER_SNOOZE
+        ],
+        [InlineKeyboardButton(text="⚙️ Налаштування нагадувань", callback_data=cbs.pack("rem:settings"))],
+    ])
+
+async def send_reminders(text: str, uids: list[int]) -> None:
+    await broadcaster.run(uids, text, label="reminder", reply_markup=reminder_keyboard())
+
+reminders = rem.ReminderEngine(
+    plan_for=lambda uid, d: plans.for_user(uid).for_date(d),
+    tz_for=lambda uid: ZoneInfo(user_tz.get(uid, DEFAULT_TZ)),
+    send=send_reminders,
+    persist=storage.set_reminders,
+    batch_window=float(os.getenv("REMINDER_BATCH_WINDOW", "1")),
+)
+
+def render_reminders(uid: int) -> tuple[str, InlineKeyboardMarkup]:
+    mask = reminders.mask(uid)
+    state = lambda kind: "✅ увімкнено" if mask & kind else "▫️ вимкнено"
+    lines = [
+        "⏰ <b>Нагадування за планом</b>",
+        f"🍽 Прийоми їжі — {state(rem.MEALS)}",
+        f"💪 Тренування — {state(rem.WORKOUT)}",
+    ]
+    nxt = reminders.next_fire(uid, time.time())
+    if nxt is not None:
+        at = dt.datetime.fromtimestamp(nxt[0], ZoneInfo(user_tz.get(uid, DEFAULT_TZ)))
+        lines.append(f"\nНайближче: {weekday_short_ua(at.date())} {at:%H:%M}")
+    lines.append(f"Час — за планом і твоїм поясом ({user_tz.get(uid, DEFAULT_TZ)}, змінити: /tz)")
+    kb = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=("🔕 Їжа" if mask & rem.MEALS else "🔔 Їжа"), callback_data=cbs.pack("rem:toggle", rem.MEALS))],
+        [InlineKeyboardButton(text=("🔕 Тренування" if mask & rem.WORKOUT else "🔔 Тренування"), callback_data=cbs.pack("rem:toggle", rem.WORKOUT))],
+        [InlineKeyboardButton(text="⬅️ Меню", callback_data=cbs.pack("back"))],
+    ])
+    return "\n".join(lines), kb
+
+@dp.message(Command("reminders"))
+async def reminders_command(message: types.Message):
+    text, kb = render_reminders(message.from_user.id)
+    await message.answer(text, reply_markup=kb)
+
+@cbs.action("rem:settings")
+async def reminders_settings(cb: types.CallbackQuery, state: FSMContext):
+    text, kb = render_reminders(cb.from_user.id)
+    await cb.message.answer(text, reply_markup=kb)
+    return cb.answer()
+
+@cbs.action("rem:toggle")
+async def reminders_toggle(cb: types.CallbackQuery, state: FSMContext, kind: int):
+    if kind not in rem.KINDS:
+        return cb.answer()
+    reminders.toggle(cb.from_user.id, kind)
+    text, kb = render_reminders(cb.from_user.id)
+    await cb.message.edit_text(text, reply_markup=kb)
+    return cb.answer()
+
+@cbs.action("rem:snooze")
+async def reminders_snooze(cb: types.CallbackQuery, state: FSMContext, minutes: int):
+    uid = cb.from_user.id
+    if minutes not in REMINDER_SNOOZE or not cb.message.text:
+        return cb.answer()
+    ts = reminders.snooze(uid, cb.message.html_text, minutes)
+    at = dt.datetime.fromtimestamp(ts, ZoneInfo(user_tz.get(uid, DEFAULT_TZ)))
+    await cb.message.edit_reply_markup(reply_markup=None)
+    return cb.answer(f"⏰ Нагадаю о {at:%H:%M}")
+
+def owns_user(uid: int) -> bool:
+    # Воркер відповідає лише за своїх користувачів (балансувальник шардить за user_id)
+    return uid % WEB_WORKERS == WORKER_ID
+
+# Згортання старих днів, вивантаження неактивних користувачів, прострочені FSM-діалоги
+retention = Retention(
+    user_days, storage, dp.storage, today=today_day, touch=storage.mark_dirty,
+    keep_days=int(os.getenv("RETENTION_DAYS", "90")),                       # старші дні — лише підсумки
+    idle_seconds=float(os.getenv("IDLE_EVICT_MINUTES", "60")) * 60,
+    fsm_ttl=float(os.getenv("FSM_TTL_HOURS", "24")) * 3600,
+    interval=float(os.getenv("RETENTION_INTERVAL", "300")),
+)
+
+background_tasks: list[asyncio.Task] = []
+
+@dp.startup()
 async def on_startup():
-    scheduler.add_job(daily_nutrition_ping, "cron", hour=21, minute=30)
+    if CHARTS_ENABLED:
+        charts.start()      # першим: процеси графіків форкаються, поки немає інших потоків
+    subs, tzs = await storage.start()
+    user_tz.update(tzs)
+    for uid in subs:
+        if owns_user(uid):
+            subscribers.add(uid)
+            bucket_add(uid, user_tz.get(uid, DEFAULT_TZ))
+    reminders.load(await storage.load_reminders(), owns_user)
     scheduler.start()
-
-@dp.callback_query(F.data == "back")
+    background_tasks.append(asyncio.create_task(reminders.run()))
+    background_tasks.append(asyncio.create_task(plans.watch(PLAN_RELOAD_INTERVAL)))
+    background_tasks.append(asyncio.create_task(retention.run()))
+    if METRICS_ENABLED and METRICS_LOG_INTERVAL:
+        background_tasks.append(asyncio.create_task(metrics.log_summary(METRICS_LOG_INTERVAL)))
+
+@dp.shutdown()
+async def on_shutdown():
+    scheduler.shutdown(wait=False)
+    for task in background_tasks:
+        task.cancel()
+    background_tasks.clear()
+    await edits.close()
+    charts.close()
+    await storage.close()
+
+@cbs.action("back")
 async def go_back(cb: types.CallbackQuery, state: FSMContext):
     await state.clear()
     await cb.message.answer("⬅️ Повертаємось у меню", reply_markup=main_menu())
-    await cb.answer()
+    return cb.answer()
+
+# Єдиний вхід для всіх callback'ів: розбір коду й пошук хендлера в таблиці cbs
+@dp.callback_query()
+async def route_callback(cb: types.CallbackQuery, state: FSMContext):
+    return await cbs.dispatch(cb, state)
+
+# ===== ЗАПУСК =====
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")                 # публічна адреса, напр. https://bot.example.com
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or None
+WEB_HOST = os.getenv("WEB_HOST", "0.0.0.0")
+WEB_PORT = int(os.getenv("PORT", os.getenv("WEB_PORT", "8080")))
+
+def web_app():
+    app = webhook.build_app(dp, bot, WEBHOOK_PATH, WEBHOOK_SECRET)
+    if METRICS_ENABLED:
+        # У кількох воркерах кожен віддає свої метрики на власному WORKER_PORT
+        metrics.add_routes(app)
+    return app
 
 async def main():
-    await on_startup()
-    await dp.start_polling(bot)
+    if BOT_MODE == "polling":
+        runner = await metrics.serve(WEB_HOST, METRICS_PORT) if METRICS_ENABLED else None
+        try:
+            await dp.start_polling(bot)
+        finally:
+            if runner:
+                await runner.cleanup()
+    elif BOT_MODE == "worker":
+        port = int(os.getenv("WORKER_PORT", "8081"))
+        await webhook.serve(web_app(), "127.0.0.1", port)
+    elif BOT_MODE == "webhook":
+        await webhook.set_webhook(bot, WEBHOOK_URL + WEBHOOK_PATH, WEBHOOK_SECRET, dp.resolve_used_update_types())
+        if WEB_WORKERS == 1:
+            await webhook.serve(web_app(), WEB_HOST, WEB_PORT)
+            return
+        await bot.session.close()
+        ports = [WEB_PORT + 1 + i for i in range(WEB_WORKERS)]
+        procs = [webhook.spawn_worker(i, WEB_WORKERS, port) for i, port in enumerate(ports)]
+        supervisor = asyncio.create_task(webhook.supervise(procs, ports))
+        try:
+            await webhook.serve(webhook.build_balancer(WEBHOOK_PATH, WEBHOOK_SECRET, ports), WEB_HOST, WEB_PORT)
+        finally:
+            supervisor.cancel()
+            for p in procs:
+                p.terminate()
+            for p in procs:
+                p.wait()
+    else:
+        raise ValueError(f"Unknown BOT_MODE: {BOT_MODE}")
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
     asyncio.run(main())
@@ -0,0 +1,240 @@
+import asyncio
+import functools
+import logging
+import time
+from bisect import bisect_left
+from typing import Any, Awaitable, Callable, Collection
+
+from aiohttp import web
+from aiogram import BaseMiddleware, Router
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.filters import Command
+from aiogram.types import BotCommand, CallbackQuery, InlineQuery, Message
+
+log = logging.getLogger(__name__)
+
+# ===== МЕТРИКИ =====
+# Лічильники й гістограми в пам'яті процесу, віддаються у текстовому форматі Prometheus.
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        # Оцінка за верхньою межею бакета — для логів цього досить
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank and c:
+                return BUCKETS[i] if i < len(BUCKETS) else float("inf")
+        return 0.0
+
+
+class Registry:
+    def __init__(self):
+        self.histograms: dict[str, dict[tuple, Histogram]] = {}
+        self.counters: dict[str, dict[tuple, int]] = {}
+        self.help: dict[str, str] = {}
+        # Лічильники, які модулі тримають у себе звичайними int (гарячий шлях без словників);
+        # читаються лише під час render()
+        self.collectors: list[Callable[[], dict[str, dict[tuple, int]]]] = []
+
+    def collect(self, fn: Callable[[], dict[str, dict[tuple, int]]]) -> None:
+        self.collectors.append(fn)
+
+    def observe(self, name: str, labels: tuple[tuple[str, str], ...], value: float) -> None:
+        series = self.histograms.setdefault(name, {})
+        h = series.get(labels)
+        if h is None:
+            h = series[labels] = Histogram()
+        h.observe(value)
+
+    def inc(self, name: str, labels: tuple[tuple[str, str], ...], value: int = 1) -> None:
+        series = self.counters.setdefault(name, {})
+        series[labels] = series.get(labels, 0) + value
+
+    @staticmethod
+    def _labels(labels: tuple) -> str:
+        if not labels:
+            return ""
+        parts = []
+        for k, v in labels:
+            v = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            parts.append(f'{k}="{v}"')
+        return "{" + ",".join(parts) + "}"
+
+    def render(self) -> str:
+        lines = []
+        counters = dict(self.counters)
+        for fn in self.collectors:
+            for name, series in fn().items():
+                counters[name] = {**counters.get(name, {}), **series}
+        for name, series in sorted(counters.items()):
+            if name in self.help:
+                lines.append(f"# HELP {name} {self.help[name]}")
+            lines.append(f"# TYPE {name} counter")
+            for labels, value in series.items():
+                lines.append(f"{name}{self._labels(labels)} {value}")
+        for name, series in sorted(self.histograms.items()):
+            if name in self.help:
+                lines.append(f"# HELP {name} {self.help[name]}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, h in series.items():
+                cumulative = 0
+                for bound, c in zip(BUCKETS + (float("inf"),), h.counts):
+                    cumulative += c
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{name}_bucket{self._labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{self._labels(labels)} {h.total}")
+                lines.append(f"{name}_count{self._labels(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self, name: str, top: int = 10) -> str:
+        series = sorted(self.histograms.get(name, {}).items(), key=lambda kv: -kv[1].total)[:top]
+        return "; ".join(
+            f"{','.join(str(v) for _, v in labels)}: n={h.count} p50={h.quantile(0.5) * 1000:.0f}ms "
+            f"p95={h.quantile(0.95) * 1000:.0f}ms"
+            for labels, h in series
+        )
+
+
+registry = Registry()
+registry.help.update({
+    "bot_handler_seconds": "Update handling time by route",
+    "bot_handler_errors_total": "Handler exceptions by route",
+    "bot_api_request_seconds": "Outbound Bot API call time by method",
+    "bot_api_errors_total": "Outbound Bot API errors by method and error type",
+    "bot_api_retry_after_total": "RetryAfter (429) responses by method",
+    "bot_job_seconds": "Scheduler job duration",
+    "bot_job_errors_total": "Scheduler job failures",
+})
+
+
+# ===== МАРШРУТИ =====
+# Callback'и групуються за назвою дії (callback_route, див. callbacks.CallbackRouter.route_name),
+# а не за сирими даними — інакше кожна дата й індекс кнопки стали б окремою серією.
+# Так само команди: окремий маршрут лише для зареєстрованих, будь-яка інша "/xyz" — "command"
+def registered_commands(router: Router) -> frozenset[str]:
+    names = set()
+    for r in router.chain_tail:
+        for h in r.message.handlers:
+            for f in h.filters or ():
+                if not isinstance(f.callback, Command):
+                    continue
+                for c in f.callback.commands:       # str, BotCommand або re.Pattern (шаблони не рахуємо)
+                    if isinstance(c, str):
+                        names.add(c)
+                    elif isinstance(c, BotCommand):
+                        names.add(c.command)
+    return frozenset(names)
+
+
+def event_route(event: Any, data: dict, callback_route: Callable[[str | None], str], commands: Collection[str] = ()) -> str:
+    if isinstance(event, CallbackQuery):
+        return callback_route(event.data)
+    if isinstance(event, Message):
+        state = data.get("raw_state")
+        if state:
+            return f"state:{state}"
+        text = event.text or ""
+        if text.startswith("/"):
+            name = text.split()[0].split("@")[0][1:]
+            return "/" + name if name in commands else "command"
+        return "message"
+    if isinstance(event, InlineQuery):
+        return "inline_query"
+    return type(event).__name__
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    # commands() — набір зареєстрованих команд; читається при першому апдейті, коли всі хендлери вже є
+    def __init__(self, callback_route: Callable[[str | None], str], commands: Callable[[], Collection[str]] = frozenset):
+        self.callback_route = callback_route
+        self.commands = commands
+        self._commands: Collection[str] | None = None
+
+    async def __call__(self, handler, event, data):
+        if self._commands is None:
+            self._commands = self.commands()
+        labels = (("route", event_route(event, data, self.callback_route, self._commands)),)
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            registry.inc("bot_handler_errors_total", labels)
+            raise
+        finally:
+            registry.observe("bot_handler_seconds", labels, time.perf_counter() - start)
+
+
+class APIMetricsMiddleware(BaseRequestMiddleware):
+    async def __call__(self, make_request, bot, method):
+        labels = (("method", method.__api_method__),)
+        start = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except TelegramRetryAfter:
+            registry.inc("bot_api_retry_after_total", labels)
+            raise
+        except Exception as e:
+            registry.inc("bot_api_errors_total", labels + (("error", type(e).__name__),))
+            raise
+        finally:
+            registry.observe("bot_api_request_seconds", labels, time.perf_counter() - start)
+
+
+def timed_job(name: str, fn: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    labels = (("job", name),)
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await fn(*args, **kwargs)
+        except Exception:
+            registry.inc("bot_job_errors_total", labels)
+            raise
+        finally:
+            registry.observe("bot_job_seconds", labels, time.perf_counter() - start)
+
+    return wrapper
+
+
+# ===== ЕКСПОРТ =====
+async def metrics_view(request: web.Request) -> web.Response:
+    return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8")
+
+
+def add_routes(app: web.Application) -> None:
+    app.router.add_get("/metrics", metrics_view)
+
+
+async def serve(host: str, port: int) -> web.AppRunner:
+    app = web.Application()
+    add_routes(app)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+async def log_summary(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        log.info("Handlers: %s", registry.summary("bot_handler_seconds") or "—")
+        log.info("Bot API: %s", registry.summary("bot_api_request_seconds") or "—")
+        if registry.histograms.get("bot_job_seconds"):
+            log.info("Jobs: %s", registry.summary("bot_job_seconds"))
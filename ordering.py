@@ -0,0 +1,72 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+
+from metrics import registry
+
+log = logging.getLogger(__name__)
+
+# ===== ПОРЯДОК АПДЕЙТІВ ОДНОГО КОРИСТУВАЧА =====
+# Апдейти обробляються паралельно (polling — кожен окремою задачею, webhook — кожен
+# окремим запитом), а хендлери роблять read-modify-write над станом користувача через await.
+# Middleware на рівні update:
+#  - апдейти одного from_user.id виконуються строго по черзі, у порядку надходження;
+#  - різні користувачі — паралельно, але не більше max_concurrency хендлерів разом;
+#    слот береться лише після черги користувача, тож один користувач тримає максимум
+#    один слот, а його наступний апдейт стає в кінець загальної черги (round-robin);
+#  - у черзі користувача не більше max_pending апдейтів: надлишок відкидається
+#    (натискання кнопки отримує коротку відповідь, щоб у клієнта не крутився годинник).
+registry.help["bot_updates_dropped_total"] = "Updates dropped because the user's queue was full"
+
+
+class _UserQueue:
+    __slots__ = ("lock", "pending")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()      # черга очікування asyncio.Lock — FIFO
+        self.pending = 0
+
+
+class UserOrderingMiddleware(BaseMiddleware):
+    def __init__(self, max_pending: int = 8, max_concurrency: int = 256):
+        self.max_pending = max_pending
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._users: dict[int, _UserQueue] = {}
+
+    def pending(self, uid: int) -> int:
+        queue = self._users.get(uid)
+        return queue.pending if queue else 0
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is None:
+            async with self._slots:
+                return await handler(event, data)
+
+        queue = self._users.get(user.id)
+        if queue is None:
+            queue = self._users[user.id] = _UserQueue()
+        if queue.pending >= self.max_pending:
+            registry.inc("bot_updates_dropped_total", ())
+            log.warning("User %s: %s updates queued, dropping update %s", user.id, queue.pending, event.update_id)
+            if event.callback_query is not None:
+                return event.callback_query.answer("⏳ Зачекай, обробляю попередні натискання")
+            return None
+
+        queue.pending += 1
+        try:
+            async with queue.lock:
+                async with self._slots:
+                    return await handler(event, data)
+        finally:
+            queue.pending -= 1
+            if not queue.pending:
+                del self._users[user.id]
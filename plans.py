@@ -0,0 +1,165 @@
+import asyncio
+import datetime as dt
+import json
+import logging
+import os
+from dataclasses import dataclass
+
+log = logging.getLogger(__name__)
+
+# ===== ПЛАНИ З data.json =====
+# data.json: {"monday": {"title", "workout": {"07:00": ...}, "exercises": [[назва, підходи]...],
+#             "meals": {"08:30": ...}}, ..., "rest": {"checklist": [...]}}
+# День тижня без exercises (або відсутній у файлі) — rest day.
+# Персональні плани (PLAN_OVERRIDES_PATH): {"<uid>": {"friday": {...} | null, "rest": {...}}} —
+# перекривають окремі дні загального плану, решта днів спільні з ним.
+# Файл компілюється в незмінні об'єкти з готовими заголовками й підписами кнопок.
+# Зміни підхоплюються за mtime: новий набір збирається поза event loop і підміняється
+# одним присвоєнням, тож хендлер завжди бачить або старий, або новий план цілком.
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+WEEKDAY_TITLES = ("Понеділок", "Вівторок", "Середа", "Четвер", "П’ятниця", "Субота", "Неділя")
+
+
+# eq=False: хеш за ідентичністю — дешевий ключ кешу клавіатур; після перезавантаження
+# плану це вже інший об'єкт, тож старі markup у кеші просто перестають використовуватись
+@dataclass(frozen=True, eq=False)
+class DayPlan:
+    weekday: int                                # 0 = понеділок; він же номер плану в callback'ах
+    title: str
+    header: str                                 # готовий текст над клавіатурою
+    exercises: tuple[tuple[str, str], ...]
+    labels: tuple[str, ...]                     # "Жим штанги лежачи (4×8)"
+    workout_times: tuple[tuple[str, str], ...]  # (HH:MM, опис), за часом
+    meals: tuple[tuple[str, str], ...]
+
+    @property
+    def key(self) -> str:
+        return WEEKDAYS[self.weekday]
+
+    @property
+    def is_workout(self) -> bool:
+        return bool(self.exercises)
+
+
+@dataclass(frozen=True, eq=False)
+class Checklist:
+    items: tuple[str, ...]
+
+
+@dataclass(frozen=True, eq=False)
+class PlanSet:
+    version: int
+    days: tuple[DayPlan, ...]                   # 7 днів, за d.weekday()
+    rest: Checklist
+
+    def for_date(self, d: dt.date) -> DayPlan:
+        return self.days[d.weekday()]
+
+    def workout(self, d: dt.date) -> DayPlan | None:
+        plan = self.days[d.weekday()]
+        return plan if plan.exercises else None
+
+
+def compile_day(weekday: int, raw: dict | None) -> DayPlan:
+    raw = raw or {}
+    exercises = tuple((str(name), str(sets)) for name, sets in raw.get("exercises", ()))
+    workout_times = tuple(sorted((str(t), str(v)) for t, v in (raw.get("workout") or {}).items()))
+    default_title = WEEKDAY_TITLES[weekday]
+    if workout_times:
+        default_title += " – " + workout_times[0][1]
+    title = raw.get("title") or default_title
+    if exercises:
+        header = f"<b>{title}</b>\nОбирай вправи та відмічай виконане:"
+    else:
+        header = "<b>Rest Day</b>\nЛегкий день відновлення. Відмічай виконане 👇"
+    return DayPlan(
+        weekday=weekday,
+        title=title,
+        header=header,
+        exercises=exercises,
+        labels=tuple(f"{name} ({sets})" for name, sets in exercises),
+        workout_times=workout_times,
+        meals=tuple(sorted((str(t), str(v)) for t, v in (raw.get("meals") or {}).items())),
+    )
+
+
+def compile_checklist(raw: dict | None) -> Checklist:
+    return Checklist(tuple(str(item) for item in (raw or {}).get("checklist", ())))
+
+
+def compile_plans(raw: dict, version: int) -> PlanSet:
+    return PlanSet(
+        version=version,
+        days=tuple(compile_day(i, raw.get(key)) for i, key in enumerate(WEEKDAYS)),
+        rest=compile_checklist(raw.get("rest")),
+    )
+
+
+def compile_override(base: PlanSet, raw: dict) -> PlanSet:
+    # Неперекриті дні — ті самі об'єкти, що й у загальному плані (спільний кеш клавіатур)
+    days = tuple(
+        compile_day(i, raw[key]) if key in raw else base.days[i]
+        for i, key in enumerate(WEEKDAYS)
+    )
+    rest = compile_checklist(raw["rest"]) if "rest" in raw else base.rest
+    return PlanSet(version=base.version, days=days, rest=rest)
+
+
+class PlanStore:
+    def __init__(self, path: str, overrides_path: str | None = None):
+        self.path = path
+        self.overrides_path = overrides_path
+        self.version = 0
+        self._mtimes: tuple = ()
+        self.plans: PlanSet = compile_plans({}, 0)
+        self._users: dict[int, PlanSet] = {}
+        self._apply(self._stat(), *self._load(1))
+
+    def for_user(self, uid: int) -> PlanSet:
+        return self._users.get(uid, self.plans)
+
+    def _stat(self) -> tuple:
+        out = []
+        for path in (self.path, self.overrides_path):
+            try:
+                out.append(os.stat(path).st_mtime_ns if path else None)
+            except FileNotFoundError:
+                out.append(None)
+        return tuple(out)
+
+    @staticmethod
+    def _read(path: str | None) -> dict:
+        if not path or not os.path.exists(path):
+            return {}
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _load(self, version: int) -> tuple[PlanSet, dict[int, PlanSet]]:
+        base = compile_plans(self._read(self.path), version)
+        users = {int(uid): compile_override(base, raw) for uid, raw in self._read(self.overrides_path).items()}
+        return base, users
+
+    def _apply(self, mtimes: tuple, base: PlanSet, users: dict[int, PlanSet]) -> None:
+        self._mtimes = mtimes
+        self.version = base.version
+        self.plans, self._users = base, users
+
+    async def check(self) -> bool:
+        mtimes = await asyncio.to_thread(self._stat)
+        if mtimes == self._mtimes:
+            return False
+        try:
+            base, users = await asyncio.to_thread(self._load, self.version + 1)
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            # Битий файл (напр. збережений наполовину) — лишаємо старий план до наступної зміни
+            log.warning("Plan reload failed (%s), keeping version %s", e, self.version)
+            self._mtimes = mtimes
+            return False
+        self._apply(mtimes, base, users)
+        log.info("Plans reloaded: version %s, %s personal", base.version, len(users))
+        return True
+
+    async def watch(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.check()
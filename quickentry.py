@@ -0,0 +1,99 @@
+import re
+from dataclasses import dataclass
+
+# ===== ШВИДКИЙ ВВІД ОДНИМ ПОВІДОМЛЕННЯМ =====
+# "омлет 360; гречка 200; протеїн 120 б30" -> три прийоми їжі + 30 г білка,
+# "біг 5 км 300" -> активність на 300 ккал. Розбір локальний, без зовнішніх сервісів.
+# Пункти розділяються ";" або новим рядком. У пункті:
+#  - число з одиницею (5 км, 200 г, 30 хв, 5%) — частина назви;
+#  - б30 / 30б / білок 30 — грами білка;
+#  - останнє число без одиниці (можна з "ккал") — калорії, решта чисел лишаються в назві;
+#  - пункт, що починається зі слова-активності (біг, ходьба, вело...) або з 🔥, — активність.
+# Страва без калорій повертається з kcal=None — їх підставляють з історії (autocomplete).
+MAX_ITEMS = 20
+MAX_KCAL = 5000
+
+UNITS = frozenset(("км", "м", "хв", "год", "г", "гр", "кг", "мл", "л", "шт", "кроків", "повт", "%"))
+KCAL_WORDS = frozenset(("ккал", "kcal", "кал"))
+ACTIVITY_PREFIXES = (
+    "біг", "пробіж", "ходьб", "прогулян", "кроки", "кроків", "вело", "плаван", "йога", "кардіо", "трену",
+    "зал", "скакал", "степ", "футбол", "тенніс", "бокс", "танц", "еліпс", "гребл", "лиж", "hiit",
+    "кросфіт", "розтяжк", "пілатес",
+)
+
+_SPLIT = re.compile(r"[;\n]+")
+_TOKEN = re.compile(r"\d+(?:[.,]\d+)?|[^\W\d_]+|%")
+# Білок вирізається до розбору решти: спершу "б30"/"білок 30", потім "30б" —
+# тож у "протеїн 120 б30" 120 лишається калоріями
+_PROTEIN_BEFORE = re.compile(r"(?<!\w)(?:б|p|білок|білка)\s?(\d+)(?!\w)", re.IGNORECASE)
+_PROTEIN_AFTER = re.compile(r"(?<![\w.,])(\d+)\s?(?:б|p)(?!\w)", re.IGNORECASE)
+
+
+@dataclass(slots=True)
+class Item:
+    kind: str               # "meal" | "activity" | "protein"
+    name: str
+    kcal: int | None = None
+    protein: int = 0
+
+
+class ParseError(ValueError):
+    # args[0] — текст пункту, який не вдалось розібрати
+    pass
+
+
+def parse_item(text: str) -> Item | None:
+    text = text.strip()
+    if not text:
+        return None
+    source = text
+    activity = text.startswith("🔥")
+    protein = 0
+    for pattern in (_PROTEIN_BEFORE, _PROTEIN_AFTER):
+        protein += sum(int(g) for g in pattern.findall(text))
+        text = pattern.sub(" ", text)
+    toks = _TOKEN.findall(text)
+    low = [t.lower() for t in toks]
+    name: list[str] = []
+    bare: list[int] = []          # позиції "голих" чисел у name
+    kcal: int | None = None
+    i = 0
+    while i < len(toks):
+        tok, nxt = low[i], (low[i + 1] if i + 1 < len(toks) else "")
+        if tok[0].isdigit():
+            value = int(float(tok.replace(",", ".")))
+            if nxt in UNITS:
+                name.append(toks[i] + nxt if nxt == "%" else f"{toks[i]} {toks[i + 1]}")
+            elif nxt in KCAL_WORDS:
+                kcal = value
+            else:
+                bare.append(len(name))
+                name.append(toks[i])
+                i += 1
+                continue
+            i += 2
+        else:
+            name.append(toks[i])
+            i += 1
+    if kcal is None and bare:
+        kcal = int(float(name.pop(bare[-1]).replace(",", ".")))
+    if not name:
+        if protein and kcal is None:
+            return Item("protein", "", protein=protein)
+        raise ParseError(source)
+    if kcal is not None and not 0 < kcal <= MAX_KCAL:
+        raise ParseError(source)
+    title = " ".join(name)
+    title = title[0].upper() + title[1:]
+    if activity or low[0].startswith(ACTIVITY_PREFIXES):
+        if kcal is None:
+            raise ParseError(source)
+        return Item("activity", title, kcal)
+    return Item("meal", title, kcal, protein)
+
+
+def parse(text: str) -> list[Item]:
+    items = [item for part in _SPLIT.split(text) if (item := parse_item(part)) is not None]
+    if len(items) > MAX_ITEMS:
+        raise ParseError(f"більше {MAX_ITEMS} пунктів")
+    return items
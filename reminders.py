@@ -0,0 +1,252 @@
+import asyncio
+import datetime as dt
+import heapq
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Awaitable, Callable
+from zoneinfo import ZoneInfo
+
+from metrics import registry
+from plans import DayPlan
+
+log = logging.getLogger(__name__)
+
+# ===== НАГАДУВАННЯ ЗА ПЛАНОМ =====
+# Час прийомів їжі й тренування — з data.json (DayPlan.meals / workout_times), у поясі
+# користувача. Один min-heap (час, uid, вид) на всіх користувачів воркера замість задачі
+# планувальника на кожне нагадування: у купі лише найближче нагадування кожного користувача
+# (+ відкладені), після спрацювання рахується наступне.
+#  - Запис у купі не видаляється при змінах — він звіряється при спрацюванні: звичайний
+#    дійсний, лише якщо це досі призначений час користувача (_next_at) і в актуальному плані
+#    на цей час є нагадування; відкладений — якщо він ще в списку користувача.
+#  - Зберігаються налаштування (які нагадування увімкнені) і відкладені нагадування; купа
+#    будується заново при старті. Пропущені за час простою звичайні нагадування не
+#    надсилаються, відкладені — надсилаються, якщо прострочені не більше ніж на grace.
+#  - Усе, що настало в межах batch_window, збирається в пакет; однакові тексти йдуть
+#    однією розсилкою send(текст, uids) — її обмежує Broadcaster.
+MEALS = 1
+WORKOUT = 2
+KINDS = {MEALS: "meals", WORKOUT: "workout"}
+MAX_SNOOZED = 3                 # відкладених на користувача; найстаріше витісняється
+REGULAR, SNOOZED = 0, 1
+registry.help["bot_reminders_due_total"] = "Reminders handed to the sender"
+
+
+@lru_cache(maxsize=4096)
+def day_reminders(plan: DayPlan, mask: int) -> tuple[tuple[int, str], ...]:
+    # (хвилина доби, текст) за часом; DayPlan хешується за ідентичністю — новий план, новий ключ
+    out = []
+    if mask & WORKOUT:
+        out += [(t, f"💪 <b>{t}</b> — тренування: {what}") for t, what in plan.workout_times]
+    if mask & MEALS:
+        out += [(t, f"🍽 <b>{t}</b> — {what}") for t, what in plan.meals]
+    by_minute: dict[int, list[str]] = {}
+    for t, text in out:
+        try:
+            hh, mm = t.split(":")
+            minute = int(hh) * 60 + int(mm)
+        except ValueError:
+            log.warning("Bad reminder time %r in plan %s", t, plan.key)
+            continue
+        by_minute.setdefault(minute, []).append(text)       # тренування й їжа в одну хвилину — одне повідомлення
+    return tuple((minute, "\n".join(texts)) for minute, texts in sorted(by_minute.items()))
+
+
+@dataclass
+class UserReminders:
+    mask: int = 0
+    snoozed: list[tuple[float, str]] = field(default_factory=list)     # (unix-час, текст)
+
+    def dump(self) -> str | None:
+        if not self.mask and not self.snoozed:
+            return None
+        return json.dumps({"on": self.mask, "snoozed": self.snoozed}, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, data: str) -> "UserReminders":
+        raw = json.loads(data)
+        return cls(raw.get("on", 0), [(float(ts), text) for ts, text in raw.get("snoozed", ())])
+
+
+class ReminderEngine:
+    def __init__(
+        self,
+        plan_for: Callable[[int, dt.date], DayPlan],
+        tz_for: Callable[[int], ZoneInfo],
+        send: Callable[[str, list[int]], Awaitable[object]],
+        persist: Callable[[int, str | None], None],
+        batch_window: float = 1.0,
+        grace: float = 6 * 3600,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.plan_for = plan_for
+        self.tz_for = tz_for
+        self.send = send
+        self.persist = persist
+        self.batch_window = batch_window
+        self.grace = grace
+        self.clock = clock
+        self.users: dict[int, UserReminders] = {}
+        self._heap: list[tuple[float, int, int]] = []
+        self._next_at: dict[int, float] = {}
+        self._wake: asyncio.Event | None = None
+        self._sending: set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    # ----- розклад -----
+    def next_fire(self, uid: int, after: float) -> tuple[float, str] | None:
+        prefs = self.users.get(uid)
+        if prefs is None or not prefs.mask:
+            return None
+        tz = self.tz_for(uid)
+        start = dt.datetime.fromtimestamp(after, tz).date()
+        for offset in range(8):
+            d = start + dt.timedelta(days=offset)
+            for minute, text in day_reminders(self.plan_for(uid, d), prefs.mask):
+                ts = dt.datetime(d.year, d.month, d.day, minute // 60, minute % 60, tzinfo=tz).timestamp()
+                if ts > after:
+                    return ts, text
+        return None
+
+    def _push(self, ts: float, uid: int, kind: int) -> None:
+        wake = not self._heap or ts < self._heap[0][0]
+        heapq.heappush(self._heap, (ts, uid, kind))
+        if wake and self._wake is not None:
+            self._wake.set()
+
+    def reschedule(self, uid: int, after: float | None = None) -> None:
+        # Після зміни налаштувань, поясу чи плану користувача; старий запис купи стає недійсним
+        nxt = self.next_fire(uid, self.clock() if after is None else after)
+        if nxt is None:
+            self._next_at.pop(uid, None)
+            return
+        if self._next_at.get(uid) != nxt[0]:
+            self._next_at[uid] = nxt[0]
+            self._push(nxt[0], uid, REGULAR)
+
+    # ----- налаштування -----
+    def load(self, stored: dict[int, str], owns: Callable[[int], bool] = lambda uid: True) -> None:
+        now = self.clock()
+        for uid, data in stored.items():
+            if not owns(uid):
+                continue
+            prefs = UserReminders.load(data)
+            fresh = [(ts, text) for ts, text in prefs.snoozed if ts > now - self.grace]
+            if len(fresh) != len(prefs.snoozed):
+                prefs.snoozed = fresh
+                self.persist(uid, prefs.dump())
+            if prefs.mask or prefs.snoozed:
+                self.users[uid] = prefs
+        for uid, prefs in self.users.items():
+            self.reschedule(uid, now)
+            for ts, _ in prefs.snoozed:
+                self._push(ts, uid, SNOOZED)
+        log.info("Reminders: %s users, %s scheduled", len(self.users), len(self._heap))
+
+    def mask(self, uid: int) -> int:
+        prefs = self.users.get(uid)
+        return prefs.mask if prefs else 0
+
+    def toggle(self, uid: int, kind: int) -> int:
+        prefs = self.users.setdefault(uid, UserReminders())
+        prefs.mask ^= kind
+        self._save(uid, prefs)
+        self.reschedule(uid)
+        return prefs.mask
+
+    def snooze(self, uid: int, text: str, minutes: int) -> float:
+        prefs = self.users.setdefault(uid, UserReminders())
+        ts = self.clock() + minutes * 60
+        prefs.snoozed.append((ts, text))
+        del prefs.snoozed[:-MAX_SNOOZED]
+        self._save(uid, prefs)
+        self._push(ts, uid, SNOOZED)
+        return ts
+
+    def forget(self, uid: int) -> None:
+        # Користувач заблокував бота — нагадування вимикаються повністю
+        if self.users.pop(uid, None) is not None:
+            self.persist(uid, None)
+        self._next_at.pop(uid, None)
+
+    def _save(self, uid: int, prefs: UserReminders) -> None:
+        if not prefs.mask and not prefs.snoozed:
+            del self.users[uid]
+        self.persist(uid, prefs.dump())
+
+    # ----- спрацювання -----
+    def pop_due(self, now: float, limit: int = 1000) -> dict[str, list[int]]:
+        # -> {текст: [uid]}; не більше limit записів за виклик, щоб не тримати event loop
+        heap = self._heap
+        groups: dict[str, list[int]] = {}
+        for _ in range(limit):
+            if not heap or heap[0][0] > now:
+                break
+            ts, uid, kind = heapq.heappop(heap)
+            if kind == SNOOZED:
+                text = self._take_snoozed(uid, ts)
+            elif self._next_at.get(uid) == ts:
+                del self._next_at[uid]
+                # Звірка з актуальним планом: він міг змінитися після постановки в купу
+                nxt = self.next_fire(uid, ts - 1)
+                text = nxt[1] if nxt and nxt[0] == ts else None
+                self.reschedule(uid, ts)
+            else:
+                continue
+            if text is not None:
+                groups.setdefault(text, []).append(uid)
+        return groups
+
+    def _take_snoozed(self, uid: int, ts: float) -> str | None:
+        prefs = self.users.get(uid)
+        if prefs is None:
+            return None
+        for i, (at, text) in enumerate(prefs.snoozed):
+            if at == ts:
+                del prefs.snoozed[i]
+                self._save(uid, prefs)
+                return text
+        return None
+
+    def _dispatch(self, groups: dict[str, list[int]]) -> None:
+        for text, uids in groups.items():
+            registry.inc("bot_reminders_due_total", (), len(uids))
+            task = asyncio.create_task(self.send(text, uids))
+            self._sending.add(task)
+            task.add_done_callback(self._sent)
+
+    def _sent(self, task: asyncio.Task) -> None:
+        self._sending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            log.error("Reminder batch failed", exc_info=task.exception())
+
+    async def run(self) -> None:
+        self._wake = asyncio.Event()
+        try:
+            while True:
+                now = self.clock()
+                groups: dict[str, list[int]] = {}
+                while self._heap and self._heap[0][0] <= now + self.batch_window:
+                    for text, uids in self.pop_due(now + self.batch_window).items():
+                        groups.setdefault(text, []).extend(uids)
+                    await asyncio.sleep(0)
+                if groups:
+                    log.info("Reminders due: %s to %s users", len(groups), sum(map(len, groups.values())))
+                    self._dispatch(groups)
+                # Прокидаємось до найближчого запису, але не рідше ніж раз на хвилину
+                # (годинник міг стрибнути); новий ранній запис будить одразу
+                delay = min(60.0, self._heap[0][0] - self.clock()) if self._heap else 60.0
+                self._wake.clear()
+                if delay > 0:
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            for task in self._sending:
+                task.cancel()
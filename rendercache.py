@@ -0,0 +1,52 @@
+from collections import OrderedDict
+from typing import Hashable
+
+from metrics import registry
+
+# ===== КЕШ ВІДРЕНДЕРЕНИХ ТЕКСТІВ ДНЯ =====
+# Екран харчування й підсумок закриття дня залежать лише від запису дня, тож текст
+# будується один раз на версію запису (DayRecord.version, збільшується в touch_day).
+# Один запис кешу на (вид, користувач, день) із відміткою версії: нова версія витісняє
+# стару на місці, застарілі версії не займають місця. Понад capacity — LRU.
+# Влучання/промахи — звичайні int; у /metrics їх віддає metrics() (див. Registry.collect).
+registry.help["bot_render_cache_total"] = "Rendered day texts served from cache (hit) or rebuilt (miss)"
+HIT = (("result", "hit"),)
+MISS = (("result", "miss"),)
+
+
+class RenderCache:
+    def __init__(self, kinds: tuple[str, ...], capacity: int = 20000):
+        self.kinds = kinds
+        self.capacity = capacity
+        self._texts: OrderedDict[tuple, tuple[Hashable, str]] = OrderedDict()   # (вид, uid, день) -> (відмітка, текст)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, kind: str, uid: int, day: int, stamp: Hashable) -> str | None:
+        key = (kind, uid, day)
+        entry = self._texts.get(key)
+        if entry is None or entry[0] != stamp:
+            self.misses += 1
+            return None
+        self._texts.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, kind: str, uid: int, day: int, stamp: Hashable, text: str) -> str:
+        key = (kind, uid, day)
+        self._texts[key] = (stamp, text)
+        self._texts.move_to_end(key)
+        if len(self._texts) > self.capacity:
+            self._texts.popitem(last=False)
+        return text
+
+    def forget(self, uid: int, day: int) -> None:
+        # Запис дня замінено цілком (довантаження зі сховища) — його версії починаються заново
+        for kind in self.kinds:
+            self._texts.pop((kind, uid, day), None)
+
+    def metrics(self) -> dict[str, dict[tuple, int]]:
+        return {"bot_render_cache_total": {HIT: self.hits, MISS: self.misses}}
+
+    def __len__(self) -> int:
+        return len(self._texts)
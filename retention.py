@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from daystate import DayRecord
+from storage import Storage
+
+log = logging.getLogger(__name__)
+
+# ===== РЕТЕНШН І КОМПАКТИЗАЦІЯ =====
+# Фонова задача, що раз на interval секунд проходить гарячий набір порціями не довше
+# slice_ms мілісекунд (між порціями віддає керування event loop):
+#  - дні, старші за keep_days, згортає до підсумків (DayRecord.compact) і позначає до запису;
+#  - користувачів без апдейтів idle_seconds вивантажує з пам'яті — наступний апдейт
+#    довантажить їх з бекенду (лише для бекендів, що зберігають стан на диск);
+#  - видаляє FSM-діалоги, не чіпані fsm_ttl секунд.
+# Нуль у будь-якому з параметрів вимикає відповідний крок.
+
+
+@dataclass
+class RetentionReport:
+    users: int = 0
+    compacted: int = 0
+    evicted: int = 0
+    fsm_expired: int = 0
+    seconds: float = 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"users={self.users} compacted={self.compacted} evicted={self.evicted} "
+            f"fsm_expired={self.fsm_expired} in {self.seconds:.2f}s"
+        )
+
+
+class Retention:
+    def __init__(
+        self,
+        user_days: dict[int, dict[int, DayRecord]],
+        storage: Storage,
+        fsm,
+        today: Callable[[int], int],
+        touch: Callable[[int, int], None],
+        keep_days: int = 90,
+        idle_seconds: float = 3600,
+        fsm_ttl: float = 86400,
+        interval: float = 300,
+        slice_ms: float = 10,
+        fsm_batch: int = 500,
+    ):
+        self.user_days = user_days
+        self.storage = storage
+        self.fsm = fsm
+        self.today = today
+        self.touch = touch
+        self.keep_days = keep_days
+        self.idle_seconds = idle_seconds
+        self.fsm_ttl = fsm_ttl
+        self.interval = interval
+        self.slice_budget = slice_ms / 1000
+        self.fsm_batch = fsm_batch
+        self._compacted_before: dict[int, int] = {}     # uid -> дні до цього ординала вже згорнуті
+
+    def compact_user(self, uid: int, days: dict[int, DayRecord]) -> int:
+        horizon = self.today(uid) - self.keep_days
+        if self._compacted_before.get(uid, 0) >= horizon:
+            return 0
+        n = 0
+        for day, record in days.items():
+            if day < horizon and record.compact():
+                self.touch(uid, day)
+                n += 1
+        self._compacted_before[uid] = horizon
+        return n
+
+    def evict(self, uid: int) -> None:
+        self.user_days.pop(uid, None)
+        self._compacted_before.pop(uid, None)
+        self.storage.forget(uid)
+
+    async def run_once(self) -> RetentionReport:
+        report = RetentionReport()
+        start = time.perf_counter()
+        uids = list(self.user_days)
+        if self.idle_seconds:
+            # Спершу дописуємо чергу, щоб неактивні користувачі не мали незаписаних змін
+            await self.storage.flush()
+        dirty = self.storage.dirty_users() if self.idle_seconds else set()
+        slice_end = time.perf_counter() + self.slice_budget
+        for uid in uids:
+            if time.perf_counter() > slice_end:
+                await asyncio.sleep(0)
+                dirty = self.storage.dirty_users() if self.idle_seconds else set()
+                slice_end = time.perf_counter() + self.slice_budget
+            days = self.user_days.get(uid)
+            if days is None:
+                continue
+            report.users += 1
+            if self.idle_seconds and self.storage.evictable(uid, self.idle_seconds, dirty):
+                self.evict(uid)
+                report.evicted += 1
+            elif self.keep_days:
+                report.compacted += self.compact_user(uid, days)
+        if self.fsm_ttl and hasattr(self.fsm, "expire"):
+            cutoff = time.time() - self.fsm_ttl
+            while n := await self.fsm.expire(cutoff, self.fsm_batch):
+                report.fsm_expired += n
+                await asyncio.sleep(0)
+        report.seconds = time.perf_counter() - start
+        return report
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                report = await self.run_once()
+            except Exception:
+                log.exception("Retention pass failed")
+                continue
+            if report.compacted or report.evicted or report.fsm_expired:
+                log.info("Retention: %s", report)
@@ -0,0 +1,336 @@
+import asyncio
+import datetime as dt
+import json
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator
+
+log = logging.getLogger(__name__)
+
+@dataclass
+class Batch:
+    days: list[tuple[int, str, str]] = field(default_factory=list)   # (uid, date, json)
+    subs_add: list[int] = field(default_factory=list)
+    subs_del: list[int] = field(default_factory=list)
+    timezones: list[tuple[int, str]] = field(default_factory=list)
+    reminders: list[tuple[int, str | None]] = field(default_factory=list)   # (uid, json | None — видалити)
+
+
+# ===== БЕКЕНДИ =====
+# Бекенд працює синхронно і викликається лише з одного потоку сховища.
+# StateBackend нічого не зберігає — стан живе лише в пам'яті процесу.
+class StateBackend:
+    persistent = False      # чи можна вивантажувати користувачів з пам'яті
+
+    def load_user(self, uid: int) -> dict[str, dict]:
+        return {}
+
+    def load_subscribers(self) -> set[int]:
+        return set()
+
+    def load_timezones(self) -> dict[int, str]:
+        return {}
+
+    def load_reminders(self) -> dict[int, str]:
+        return {}
+
+    def iter_days(self, uid: int | None = None) -> Iterator[tuple[int, str, str]]:
+        return iter(())
+
+    def load_day_rows(self, day: str, uids: set[int]) -> dict[int, dict]:
+        return {}
+
+    def write_batch(self, batch: Batch) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteBackend(StateBackend):
+    persistent = True
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS days ("
+            " uid INTEGER NOT NULL, day TEXT NOT NULL, data TEXT NOT NULL,"
+            " PRIMARY KEY (uid, day)) WITHOUT ROWID"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS days_by_day ON days (day)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS subscribers (uid INTEGER PRIMARY KEY)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS user_tz (uid INTEGER PRIMARY KEY, tz TEXT NOT NULL)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS reminders (uid INTEGER PRIMARY KEY, data TEXT NOT NULL)")
+
+    def load_user(self, uid: int) -> dict[str, dict]:
+        rows = self.conn.execute("SELECT day, data FROM days WHERE uid = ?", (uid,))
+        return {day: json.loads(data) for day, data in rows}
+
+    def load_subscribers(self) -> set[int]:
+        return {uid for (uid,) in self.conn.execute("SELECT uid FROM subscribers")}
+
+    def load_timezones(self) -> dict[int, str]:
+        return dict(self.conn.execute("SELECT uid, tz FROM user_tz"))
+
+    def load_reminders(self) -> dict[int, str]:
+        return dict(self.conn.execute("SELECT uid, data FROM reminders"))
+
+    def load_day_rows(self, day: str, uids: set[int]) -> dict[int, dict]:
+        # Один день заданих користувачів (через індекс days_by_day) — для пінгу тих, хто ще не в пам'яті
+        rows = self.conn.execute("SELECT uid, data FROM days WHERE day = ?", (day,))
+        return {uid: json.loads(data) for uid, data in rows if uid in uids}
+
+    def iter_days(self, uid: int | None = None, fetch: int = 5000) -> Iterator[tuple[int, str, str]]:
+        # Потоковий прохід у порядку ключа (uid, day) — для експорту, без завантаження всього
+        if uid is None:
+            cur = self.conn.execute("SELECT uid, day, data FROM days ORDER BY uid, day")
+        else:
+            cur = self.conn.execute("SELECT uid, day, data FROM days WHERE uid = ? ORDER BY day", (uid,))
+        try:
+            while rows := cur.fetchmany(fetch):
+                yield from rows
+        finally:
+            cur.close()
+
+    def write_batch(self, batch: Batch) -> None:
+        # Одна транзакція (і один fsync) на весь пакет
+        with self.conn:
+            self.conn.execute("BEGIN")
+            if batch.days:
+                self.conn.executemany("INSERT OR REPLACE INTO days (uid, day, data) VALUES (?, ?, ?)", batch.days)
+            if batch.subs_add:
+                self.conn.executemany("INSERT OR IGNORE INTO subscribers (uid) VALUES (?)", [(u,) for u in batch.subs_add])
+            if batch.subs_del:
+                self.conn.executemany("DELETE FROM subscribers WHERE uid = ?", [(u,) for u in batch.subs_del])
+            if batch.timezones:
+                self.conn.executemany("INSERT OR REPLACE INTO user_tz (uid, tz) VALUES (?, ?)", batch.timezones)
+            if batch.reminders:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO reminders (uid, data) VALUES (?, ?)",
+                    [r for r in batch.reminders if r[1] is not None],
+                )
+                self.conn.executemany("DELETE FROM reminders WHERE uid = ?", [(u,) for u, d in batch.reminders if d is None])
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def backend_from_env(kind: str, path: str, read_only: bool = False) -> StateBackend:
+    if kind == "memory":
+        return StateBackend()
+    if kind == "sqlite":
+        return SQLiteBackend(path)
+    if kind == "journal":
+        # Журнал і знімки — у каталозі поруч із базою: state.db -> state-journal/.
+        # Лише один процес: воркери (і процес-балансувальник, що теж імпортує main) писали б
+        # в один журнал і видаляли б знімки одне одного. read_only — офлайн-читач (analytics.py):
+        # файлів не змінює, тож може працювати поруч із живим ботом
+        if not read_only and int(os.getenv("WEB_WORKERS", "1")) > 1:
+            raise ValueError("STATE_BACKEND=journal works with a single process; use sqlite with WEB_WORKERS > 1")
+        from journal import JournalBackend
+        return JournalBackend(
+            os.getenv("JOURNAL_DIR") or os.path.splitext(path)[0] + "-journal",
+            snapshot_bytes=int(os.getenv("JOURNAL_SNAPSHOT_MB", "8")) << 20,
+            read_only=read_only,
+        )
+    raise ValueError(f"Unknown STATE_BACKEND: {kind}")
+
+
+# ===== ГАРЯЧИЙ НАБІР + ВІДКЛАДЕНИЙ ЗАПИС =====
+# Гарячий набір — це словники стану в main.py. Storage довантажує користувача
+# з бекенду при першому зверненні (read-through) і збирає змінені дні в пакети,
+# які пише окремий потік, не блокуючи event loop.
+# У пам'яті день — це ординал дати, на диску — ISO-рядок.
+class Storage:
+    def __init__(
+        self,
+        backend: StateBackend,
+        dump_day: Callable[[int, int], dict],
+        load_day: Callable[[int, int, dict], None],
+        flush_interval: float = 0.5,
+        max_batch: int = 1000,
+    ):
+        self.backend = backend
+        self._dump_day = dump_day
+        self._load_day = load_day
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="storage")
+        self._loaded: set[int] = set()
+        self._seen: dict[int, float] = {}                   # uid -> monotonic час останнього апдейту
+        self._loading: dict[int, asyncio.Future] = {}
+        self._dirty: set[tuple[int, int]] = set()
+        # Уже серіалізовані рядки: у записі зараз і ті, чий запис упав (повторюються як є,
+        # не перечитуючи пам'ять — користувача за цей час могли вивантажити)
+        self._writing: list[set[tuple[int, int]]] = []
+        self._failed: dict[tuple[int, int], tuple[int, str, str]] = {}
+        self._flush_lock = asyncio.Lock()                   # пакети пишуться по одному й по порядку
+        self.generation = 0                                 # росте з кожною зміною дня — ключ для кешів агрегатів
+        self._subs_add: set[int] = set()
+        self._subs_del: set[int] = set()
+        self._tz: dict[int, str] = {}
+        self._reminders: dict[int, str | None] = {}
+        self._wake: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def start(self) -> tuple[set[int], dict[int, str]]:
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._flush_loop())
+        subs = await self._run(self.backend.load_subscribers)
+        tzs = await self._run(self.backend.load_timezones)
+        return subs, tzs
+
+    async def hydrate(self, uid: int) -> None:
+        self._seen[uid] = time.monotonic()
+        if uid in self._loaded:
+            return
+        fut = self._loading.get(uid)
+        if fut is not None:
+            await fut
+            return
+        fut = asyncio.get_running_loop().create_future()
+        self._loading[uid] = fut
+        try:
+            days = await self._run(self.backend.load_user, uid)
+            for dstr, data in days.items():
+                self._load_day(uid, dt.date.fromisoformat(dstr).toordinal(), data)
+            self._loaded.add(uid)
+            fut.set_result(None)
+        except Exception as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            del self._loading[uid]
+
+    def is_loaded(self, uid: int) -> bool:
+        return uid in self._loaded
+
+    # ----- вивантаження неактивних -----
+    def dirty_users(self) -> set[int]:
+        # Змінені, у записі або з невдалим записом — такого користувача вивантажувати не можна
+        users = {uid for uid, _ in self._dirty}
+        users.update(uid for uid, _ in self._failed)
+        for keys in self._writing:
+            users.update(uid for uid, _ in keys)
+        return users
+
+    def evictable(self, uid: int, idle_seconds: float, dirty: set[int]) -> bool:
+        # Лише завантажений, давно неактивний і без незаписаних змін — його стан на диску актуальний
+        return (
+            self.backend.persistent
+            and uid in self._loaded
+            and uid not in dirty
+            and uid not in self._loading
+            and self._seen.get(uid, 0.0) < time.monotonic() - idle_seconds
+        )
+
+    def forget(self, uid: int) -> None:
+        # Наступний апдейт користувача знову довантажить його з бекенду
+        self._loaded.discard(uid)
+        self._seen.pop(uid, None)
+
+    async def load_day_rows(self, day: int, uids: set[int]) -> dict[int, dict]:
+        # День користувачів, яких ще не довантажено (для них бекенд — актуальне джерело)
+        return await self._run(self.backend.load_day_rows, dt.date.fromordinal(day).isoformat(), uids)
+
+    async def read(self, fn: Callable[[StateBackend], Any]) -> Any:
+        # Читання напряму з бекенду в його потоці (черга запису тим часом чекає)
+        return await self._run(fn, self.backend)
+
+    def mark_dirty(self, uid: int, day: int) -> None:
+        self.generation += 1
+        self._dirty.add((uid, day))
+        if len(self._dirty) >= self.max_batch and self._wake:
+            self._wake.set()
+
+    def subscribe(self, uid: int) -> None:
+        self._subs_del.discard(uid)
+        self._subs_add.add(uid)
+
+    def unsubscribe(self, uid: int) -> None:
+        self._subs_add.discard(uid)
+        self._subs_del.add(uid)
+
+    def set_timezone(self, uid: int, tz: str) -> None:
+        self._tz[uid] = tz
+
+    def set_reminders(self, uid: int, data: str | None) -> None:
+        self._reminders[uid] = data
+
+    async def load_reminders(self) -> dict[int, str]:
+        return await self._run(self.backend.load_reminders)
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            await self._flush()
+
+    async def _flush(self) -> None:
+        if not (self._dirty or self._failed or self._subs_add or self._subs_del or self._tz or self._reminders):
+            return
+        dirty, self._dirty = self._dirty, set()
+        failed, self._failed = self._failed, {}
+        adds, self._subs_add = self._subs_add, set()
+        dels, self._subs_del = self._subs_del, set()
+        tzs, self._tz = self._tz, {}
+        reminders, self._reminders = self._reminders, {}
+        # Серіалізуємо в event loop, щоб потік бачив узгоджений знімок кожного дня;
+        # великі пакети — порціями по max_batch, віддаючи керування між ними
+        batch = Batch(
+            subs_add=list(adds), subs_del=list(dels), timezones=list(tzs.items()), reminders=list(reminders.items()),
+        )
+        # Невдалий минулий запис іде як був серіалізований, якщо день відтоді не змінювався
+        rows = {key: row for key, row in failed.items() if key not in dirty}
+        keys = dirty | rows.keys()
+        self._writing.append(keys)
+        try:
+            for i, (uid, day) in enumerate(dirty, 1):
+                # Рядок, який не перетворюється на дату чи JSON, повтор не виправить — його
+                # відкидаємо, інакше він валив би кожен наступний пакет разом з усім іншим
+                try:
+                    rows[(uid, day)] = (
+                        uid, dt.date.fromordinal(day).isoformat(), json.dumps(self._dump_day(uid, day), ensure_ascii=False),
+                    )
+                except Exception:
+                    log.exception("Dropping unserializable day %s of user %s", day, uid)
+                if i % self.max_batch == 0:
+                    await asyncio.sleep(0)
+            batch.days = list(rows.values())
+            await self._run(self.backend.write_batch, batch)
+        except Exception:
+            log.exception("State flush failed, will retry")
+            self._failed = rows
+            self._subs_add |= adds - self._subs_del
+            self._subs_del |= dels - self._subs_add
+            self._tz = tzs | self._tz
+            self._reminders = reminders | self._reminders
+        finally:
+            self._writing.remove(keys)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+        await self._run(self.backend.close)
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,68 @@
+# Підроблені callback-и не змінюють стан: день поза вікном навколо сьогодні, скасування без запису дня.
+#   python -m pytest -q tests
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("BOT_TOKEN", "123456:TEST")
+os.environ.setdefault("STATE_BACKEND", "memory")
+
+import datetime as dt  # noqa: E402
+
+import pytest  # noqa: E402
+
+import main  # noqa: E402
+from callbacks import b36  # noqa: E402
+
+UID = 777_001
+
+
+class FakeQuery:
+    def __init__(self, data: str):
+        self.data = data
+        self.from_user = SimpleNamespace(id=UID)
+        self.message = None
+        self.answers: list[str | None] = []
+
+    def answer(self, text: str | None = None, **kwargs):
+        self.answers.append(text)
+        return text
+
+
+def forged(action: str, *args: int) -> str:
+    return "1" + main.cbs.codes[action] + "".join("." + b36(a) for a in args)
+
+
+@pytest.mark.parametrize("day", [0, dt.date.max.toordinal() + 1, 36 ** 8])
+@pytest.mark.parametrize("action, args", [
+    ("ex", lambda day: (day, 0, 0)),
+    ("rest", lambda day: (day, 0)),
+    ("quick:undo", lambda day: (day, 0, 0, 0, 0, 0, 0, 0)),
+])
+def test_out_of_range_day_is_rejected(action, args, day):
+    query = FakeQuery(forged(action, *args(day)))
+    asyncio.run(main.cbs.dispatch(query, None))
+    assert query.answers and "застаріла" in query.answers[0]
+    assert day not in main.user_days.get(UID, {})
+    assert not main.storage.dirty_users()
+
+
+def test_literal_day_zero_payload():
+    query = FakeQuery("1x.0.0.0")
+    asyncio.run(main.cbs.dispatch(query, None))
+    assert query.answers and "застаріла" in query.answers[0]
+    assert UID not in main.user_days
+    assert not main.storage.dirty_users()
+
+
+def test_undo_for_missing_day_leaves_empty_day_alone():
+    day = main.today_day(UID) - 1
+    version = main.EMPTY_DAY.version
+    digest = main.quick_digest(main.EMPTY_DAY, 0, 0, 0, 0)
+    query = FakeQuery(forged("quick:undo", day, 0, 0, 0, 0, 0, 0, digest))
+    asyncio.run(main.cbs.dispatch(query, None))
+    assert query.answers and "застаріла" in query.answers[0]
+    assert main.EMPTY_DAY.version == version
+    assert not main.storage.dirty_users()
@@ -0,0 +1,107 @@
+import asyncio
+import json
+import logging
+import os
+import signal
+import subprocess
+import sys
+
+from aiohttp import ClientConnectorError, ClientSession, ClientTimeout, web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+log = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+# ===== РЕЖИМ WEBHOOK =====
+# Один процес (WEB_WORKERS=1): aiohttp-сервер приймає апдейти сам.
+# Кілька процесів: головний процес — локальний балансувальник, який розкладає апдейти
+# по воркерах за user_id. Так гарячий стан користувача живе лише в одному процесі,
+# а FSM-діалоги лежать у спільному сховищі й переживають рестарти воркерів.
+# Хендлери можуть повертати метод (напр. cb.answer()) — він піде прямо в тілі відповіді.
+
+
+def update_user_id(update: dict) -> int | None:
+    for kind in ("message", "edited_message", "callback_query", "inline_query",
+                 "chosen_inline_result", "my_chat_member", "pre_checkout_query", "shipping_query"):
+        event = update.get(kind)
+        if event and event.get("from"):
+            return event["from"]["id"]
+    return None
+
+
+def build_app(dp: Dispatcher, bot: Bot, path: str, secret: str | None) -> web.Application:
+    app = web.Application()
+    # handle_in_background=False: чекаємо хендлер, щоб повернути його метод у відповіді
+    SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=secret, handle_in_background=False).register(app, path=path)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def serve(app: web.Application, host: str, port: int) -> None:
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    log.info("Listening on %s:%s", host, port)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        await runner.cleanup()
+
+
+async def set_webhook(bot: Bot, url: str, secret: str | None, allowed_updates: list[str]) -> None:
+    await bot.set_webhook(url, secret_token=secret, allowed_updates=allowed_updates, drop_pending_updates=False)
+    log.info("Webhook set to %s", url)
+
+
+# ===== БАЛАНСУВАЛЬНИК =====
+def spawn_worker(i: int, count: int, port: int) -> subprocess.Popen:
+    env = dict(os.environ, BOT_MODE="worker", WORKER_ID=str(i), WEB_WORKERS=str(count), WORKER_PORT=str(port))
+    return subprocess.Popen([sys.executable, sys.argv[0]], env=env)
+
+
+async def supervise(procs: list[subprocess.Popen], ports: list[int], interval: float = 5.0) -> None:
+    # Перезапускаємо воркер, що впав; його користувачі чекатимуть лише на рестарт
+    while True:
+        await asyncio.sleep(interval)
+        for i, p in enumerate(procs):
+            if p.poll() is not None:
+                log.warning("Worker %s exited with %s, restarting", i, p.returncode)
+                procs[i] = spawn_worker(i, len(procs), ports[i])
+
+
+def build_balancer(path: str, secret: str | None, worker_ports: list[int]) -> web.Application:
+    app = web.Application()
+    targets = [f"http://127.0.0.1:{port}{path}" for port in worker_ports]
+
+    async def on_startup(app: web.Application) -> None:
+        app["session"] = ClientSession(timeout=ClientTimeout(total=60))
+
+    async def on_cleanup(app: web.Application) -> None:
+        await app["session"].close()
+
+    async def forward(request: web.Request) -> web.Response:
+        if secret and request.headers.get(SECRET_HEADER) != secret:
+            return web.Response(status=401)
+        body = await request.read()
+        uid = update_user_id(json.loads(body))
+        shard = (uid if uid is not None else 0) % len(targets)
+        headers = {"Content-Type": "application/json", **({SECRET_HEADER: secret} if secret else {})}
+        try:
+            async with app["session"].post(targets[shard], data=body, headers=headers) as resp:
+                # Повертаємо відповідь воркера як є — разом із методом у тілі
+                ctype = resp.headers.get("Content-Type")
+                return web.Response(status=resp.status, body=await resp.read(), headers={"Content-Type": ctype} if ctype else None)
+        except ClientConnectorError:
+            # Воркер ще стартує або перезапускається — Telegram повторить апдейт пізніше
+            return web.Response(status=503)
+
+    app.router.add_post(path, forward)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app